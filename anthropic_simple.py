@@ -1,47 +1,299 @@
-import httpx
 import json
+import os
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+
+DEFAULT_API_BASE = "https://api.anthropic.com"
+ANTHROPIC_VERSION = "2023-06-01"
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# --- Lightweight response objects (same attribute shape as the anthropic SDK) ---
+
+class TextBlock:
+    __slots__ = ("type", "text")
+
+    def __init__(self, text, type="text"):
+        self.type = type
+        self.text = text
+
+
+class ToolUseBlock:
+    __slots__ = ("type", "id", "name", "input")
+
+    def __init__(self, id, name, input):
+        self.type = "tool_use"
+        self.id = id
+        self.name = name
+        self.input = input
+
+
+def _block(data: dict):
+    if data.get("type") == "tool_use":
+        return ToolUseBlock(data.get("id"), data.get("name"), data.get("input") or {})
+    return TextBlock(data.get("text", ""), data.get("type", "text"))
+
+
+class Usage:
+    __slots__ = ("input_tokens", "output_tokens")
+
+    def __init__(self, input_tokens, output_tokens):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+
+class Message:
+    __slots__ = ("id", "model", "content", "stop_reason", "usage")
+
+    def __init__(self, id, model, content, stop_reason, usage):
+        self.id = id
+        self.model = model
+        self.content = content
+        self.stop_reason = stop_reason
+        self.usage = usage
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            id=data.get("id"),
+            model=data.get("model"),
+            content=[_block(block) for block in data["content"]],
+            stop_reason=data.get("stop_reason"),
+            usage=Usage(data["usage"]["input_tokens"], data["usage"]["output_tokens"]),
+        )
+
+
+# --- Streaming (server-sent events) ---
+
+class SSEDecoder:
+    """Incremental SSE parser: feed lines, get ``(event, data)`` on each blank line."""
+
+    def __init__(self):
+        self._event = None
+        self._data = []
+
+    def feed(self, line):
+        if line:
+            if line.startswith("event:"):
+                self._event = line[6:].strip()
+            elif line.startswith("data:"):
+                self._data.append(line[5:].lstrip())
+            return None
+        return self.flush()
+
+    def flush(self):
+        event, data = self._event, self._data
+        self._event, self._data = None, []
+        return (event, json.loads("\n".join(data))) if data else None
+
+
+def iter_sse(lines):
+    """Yield ``(event, data)`` pairs from an iterable of SSE lines; ``data`` is decoded JSON."""
+    decoder = SSEDecoder()
+    for line in lines:
+        item = decoder.feed(line)
+        if item:
+            yield item
+    item = decoder.flush()
+    if item:
+        yield item
+
+
+async def aiter_sse(lines):
+    """``iter_sse`` for an async iterable of lines."""
+    decoder = SSEDecoder()
+    async for line in lines:
+        item = decoder.feed(line)
+        if item:
+            yield item
+    item = decoder.flush()
+    if item:
+        yield item
+
+
+class MessageStream:
+    """Accumulates a streamed message; mirrors the SDK's ``MessageStream`` surface.
+
+    Iterate ``text_stream`` for text deltas as they arrive, then call
+    ``get_final_message()`` for a ``Message`` with the full text and usage.
+    """
 
-class AnthropicClient:
-    """Simple Anthropic API client without using their SDK"""
-    
-    def __init__(self, api_key):
+    def __init__(self, events):
+        self._events = events
+        self._message = {}
+        self._blocks = {}   # content block index -> list of text parts
+        self.text_stream = self._text_stream()
+
+    def _handle(self, event, data):
+        """Apply one event; returns the text delta, if it carried one."""
+        kind = data.get("type", event)
+        if kind == "message_start":
+            self._message = dict(data["message"])
+        elif kind == "content_block_start":
+            self._blocks[data["index"]] = [data["content_block"].get("text", "")]
+        elif kind == "content_block_delta" and data["delta"].get("type") == "text_delta":
+            text = data["delta"]["text"]
+            self._blocks.setdefault(data["index"], []).append(text)
+            return text
+        elif kind == "message_delta":
+            self._message["stop_reason"] = data["delta"].get("stop_reason")
+            usage = dict(self._message.get("usage") or {})
+            usage.update(data.get("usage") or {})
+            self._message["usage"] = usage
+        elif kind == "error":
+            raise Exception(f"API Error: {data.get('error')}")
+        return None
+
+    def _final_message(self):
+        message = dict(self._message)
+        message["content"] = [{"type": "text", "text": "".join(self._blocks[i])} for i in sorted(self._blocks)]
+        return Message.from_dict(message)
+
+    def _text_stream(self):
+        for event, data in self._events:
+            text = self._handle(event, data)
+            if text:
+                yield text
+
+    def get_final_message(self):
+        for _ in self.text_stream:
+            pass
+        return self._final_message()
+
+
+class AsyncMessageStream(MessageStream):
+    """asyncio variant: ``async for text in stream.text_stream``."""
+
+    async def _text_stream(self):
+        async for event, data in self._events:
+            text = self._handle(event, data)
+            if text:
+                yield text
+
+    async def get_final_message(self):
+        async for _ in self.text_stream:
+            pass
+        return self._final_message()
+
+
+class _BaseClient:
+    def __init__(self, api_key, base_url=None, timeout=30.0, max_connections=20,
+                 max_keepalive_connections=10, keepalive_expiry=30.0, http2=None):
         self.api_key = api_key
-        self.base_url = "https://api.anthropic.com/v1/messages"
+        api_base = base_url or os.environ.get("ANTHROPIC_BASE_URL") or DEFAULT_API_BASE
+        self.base_url = api_base.rstrip("/") + "/v1/messages"
         self.headers = {
             "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
+            "anthropic-version": ANTHROPIC_VERSION,
             "content-type": "application/json"
         }
-    
-    def create_message(self, model, max_tokens, system, messages):
-        """Create a message using Anthropic API"""
-        
+        self._client_kwargs = {
+            "headers": self.headers,
+            "timeout": timeout,
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            "http2": _http2_available() if http2 is None else http2,
+        }
+
+    @staticmethod
+    def _payload(model, max_tokens, system, messages, extra):
         payload = {
             "model": model,
             "max_tokens": max_tokens,
-            "system": system,
             "messages": messages
         }
-        
-        response = httpx.post(
-            self.base_url,
-            headers=self.headers,
-            json=payload,
-            timeout=30.0
-        )
-        
+        if system is not None:
+            payload["system"] = system
+        payload.update(extra)
+        return payload
+
+    @staticmethod
+    def _parse(response):
         if response.status_code != 200:
             raise Exception(f"API Error {response.status_code}: {response.text}")
-        
-        result = response.json()
-        
-        # Create response object similar to anthropic SDK
-        class Response:
-            def __init__(self, data):
-                self.content = [type('obj', (object,), {'text': data['content'][0]['text']})]
-                self.usage = type('obj', (object,), {
-                    'input_tokens': data['usage']['input_tokens'],
-                    'output_tokens': data['usage']['output_tokens']
-                })
-        
-        return Response(result)
+        return Message.from_dict(response.json())
+
+
+class AnthropicClient(_BaseClient):
+    """Simple Anthropic API client without using their SDK.
+
+    Keeps one pooled keep-alive ``httpx.Client`` (HTTP/2 when ``h2`` is
+    installed) for its whole lifetime, so only the first request pays the
+    TCP+TLS handshake. Create it once and reuse it.
+    """
+
+    def __init__(self, api_key, **kwargs):
+        super().__init__(api_key, **kwargs)
+        self._http = httpx.Client(**self._client_kwargs)
+
+    def create_message(self, model, max_tokens, system=None, messages=None, **extra):
+        """Create a message using Anthropic API"""
+        payload = self._payload(model, max_tokens, system, messages, extra)
+        return self._parse(self._http.post(self.base_url, json=payload))
+
+    @contextmanager
+    def stream_message(self, model, max_tokens, system=None, messages=None, **extra):
+        """Stream a message (``stream=True``); yields a ``MessageStream``.
+
+        Same shape as the SDK's ``client.messages.stream(...)`` context manager.
+        """
+        payload = self._payload(model, max_tokens, system, messages, extra)
+        payload["stream"] = True
+        with self._http.stream("POST", self.base_url, json=payload) as response:
+            if response.status_code != 200:
+                response.read()
+                raise Exception(f"API Error {response.status_code}: {response.text}")
+            yield MessageStream(iter_sse(response.iter_lines()))
+
+    def close(self):
+        self._http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncAnthropicClient(_BaseClient):
+    """asyncio variant of ``AnthropicClient`` backed by a pooled ``httpx.AsyncClient``."""
+
+    def __init__(self, api_key, **kwargs):
+        super().__init__(api_key, **kwargs)
+        self._http = httpx.AsyncClient(**self._client_kwargs)
+
+    async def create_message(self, model, max_tokens, system=None, messages=None, **extra):
+        """Create a message using Anthropic API"""
+        payload = self._payload(model, max_tokens, system, messages, extra)
+        return self._parse(await self._http.post(self.base_url, json=payload))
+
+    @asynccontextmanager
+    async def stream_message(self, model, max_tokens, system=None, messages=None, **extra):
+        """Stream a message (``stream=True``); yields an ``AsyncMessageStream``."""
+        payload = self._payload(model, max_tokens, system, messages, extra)
+        payload["stream"] = True
+        async with self._http.stream("POST", self.base_url, json=payload) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise Exception(f"API Error {response.status_code}: {response.text}")
+            yield AsyncMessageStream(aiter_sse(response.aiter_lines()))
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
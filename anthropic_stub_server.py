@@ -0,0 +1,365 @@
+"""Local stand-in for the Anthropic Messages API.
+
+Answers ``POST /v1/messages`` with a canned BUY/HOLD/SELL style reply after a
+configurable delay, so clients and benchmarks can run offline without an
+API key. Keep-alive (HTTP/1.1) is supported, so connection reuse is visible.
+Requests with ``"stream": true`` get the reply as server-sent events, one
+word per ``content_block_delta``, with an optional delay per delta. A
+``models`` map gives each model its own latencies; other model IDs then get
+a 404 ``not_found_error`` like the real API.
+
+Packed prompts (``packed_recommendations``) get one ``TICKER|VERDICT|reason``
+line per row, of which ``malformed_rate`` are garbled or dropped. Replies
+longer than ``max_tokens`` are cut off with ``stop_reason: "max_tokens"``, and
+``output_token_ms`` adds generation time per output token (spread over the
+deltas when streaming). Requests with ``tools`` get a ``tool_use`` block for
+the chosen tool, filled in for ``record_verdict``
+(``recommendation_service.VERDICT_TOOL``). ``prose_tokens`` pads prose
+recommendations to about that many tokens, the length of a real answer.
+
+The Message Batches endpoints are served too (create, retrieve, results): a
+batch stays ``in_progress`` for ``batch_ms`` after it was created, then ends
+with one result per request, answered like ``POST /v1/messages``.
+
+Usage:
+    python anthropic_stub_server.py --port 8765 --latency-ms 50 --token-ms 20 --batch-ms 5000
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 python main.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_PACKED_ROW_RE = re.compile(r"^\s*([A-Z0-9.\-]+)\s*\|\s*(\d+(?:\.\d+)?)\s*\|\s*(\d+(?:\.\d+)?)", re.MULTILINE)
+_BATCH_PATH_RE = re.compile(r"^/v1/messages/batches/([\w-]+)(/results)?$")
+_PRICES_RE = re.compile(r"Ticker:\s*([A-Z0-9.\-]+),\s*Current price:\s*(\d+(?:\.\d+)?),\s*Target price:\s*(\d+(?:\.\d+)?)")
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def _verdict(current: float, target: float) -> tuple[str, float]:
+    upside = (target - current) / current * 100 if current else 0.0
+    return ("BUY" if upside > 15 else "SELL" if upside < -5 else "HOLD"), upside
+
+
+def _user_text(messages: list) -> str:
+    return " ".join(
+        m["content"] if isinstance(m["content"], str) else " ".join(b.get("text", "") for b in m["content"])
+        for m in messages if m.get("role") == "user"
+    )
+
+
+def canned_tool_input(messages: list) -> dict:
+    """``record_verdict`` arguments for a recommendation prompt."""
+    match = _PRICES_RE.search(_user_text(messages))
+    if not match:
+        return {"verdict": "HOLD", "confidence": 0.5, "short_rationale": "No prices given (stub)."}
+    verdict, upside = _verdict(float(match.group(2)), float(match.group(3)))
+    return {"verdict": verdict, "confidence": round(min(0.95, 0.5 + abs(upside) / 50), 2),
+            "short_rationale": f"{upside:+.1f}% to the analyst target (stub)."}
+
+
+_PROSE_FILLER = ("The analyst consensus, the distance to the 200-day average and the recent momentum all feed into "
+                 "this view, and the position size should reflect the stock's volatility. ")
+
+
+def canned_reply(system: str, messages: list, malformed_rate: float = 0.0, prose_tokens: int = 0) -> str:
+    """A reply shaped like the real one for the prompts this repo sends (deterministic
+    unless ``malformed_rate`` garbles packed rows)."""
+    user_text = _user_text(messages)
+    if "one line per stock" in system:
+        lines = []
+        for ticker, current, target in _PACKED_ROW_RE.findall(user_text):
+            verdict, upside = _verdict(float(current), float(target))
+            if malformed_rate and random.random() < malformed_rate:
+                if random.random() < 0.5:
+                    lines.append(f"{ticker} looks {verdict.lower()}")
+                continue
+            lines.append(f"{ticker}|{verdict}|{upside:+.1f}% to the analyst target (stub)")
+        return "\n".join(lines)
+    match = _PRICES_RE.search(user_text)
+    if match:
+        ticker, current, target = match.group(1), float(match.group(2)), float(match.group(3))
+        verdict, upside = _verdict(current, target)
+        text = (f"{verdict}\n\n{ticker} trades at ${current:.2f} against an analyst target of "
+                f"${target:.2f} ({upside:+.1f}%). This is a stub response from the local test server.")
+        while _estimate_tokens(text) < prose_tokens:
+            text += " " + _PROSE_FILLER.strip()
+        return text
+    if "ticker symbol" in user_text.lower():
+        return "NVDA"
+    return "OK"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, data: bytes):
+        # HTTP/1.1 chunked transfer encoding keeps the connection reusable
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_stream(self, message: dict, text: str, token_latency_s: float):
+        """Send ``message`` as the Messages API event stream, one word per delta."""
+        output_token_latency_s = self.server.output_token_latency_s
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+
+        usage = message["usage"]
+        self._send_chunk(_sse("message_start", {
+            "type": "message_start",
+            "message": dict(message, content=[], stop_reason=None,
+                            usage={"input_tokens": usage["input_tokens"], "output_tokens": 1}),
+        }))
+        self._send_chunk(_sse("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""},
+        }))
+        for i, piece in enumerate(re.findall(r"\S+\s*|\s+", text)):
+            if i and token_latency_s:
+                time.sleep(token_latency_s)
+            if output_token_latency_s:
+                time.sleep(output_token_latency_s * max(1, len(piece) / 4))
+            self._send_chunk(_sse("content_block_delta", {
+                "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece},
+            }))
+        self._send_chunk(_sse("content_block_stop", {"type": "content_block_stop", "index": 0}))
+        self._send_chunk(_sse("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": usage["output_tokens"]},
+        }))
+        self._send_chunk(_sse("message_stop", {"type": "message_stop"}))
+        self._send_chunk(b"")
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("content-length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _not_found(self, message: str):
+        self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": message}})
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/v1/messages/batches":
+            batch = self.server.create_batch(self._read_json().get("requests", []))
+            self._send_json(200, self.server.batch_status(batch, self._base_url()))
+            return
+        if path != "/v1/messages":
+            self._not_found(self.path)
+            return
+        request = self._read_json()
+        self.server.count_request()
+        latencies = self.server.latencies(request.get("model"))
+        if latencies is None:
+            self._not_found(f"model: {request.get('model')}")
+            return
+        latency_s, token_latency_s = latencies
+        time.sleep(latency_s)
+
+        message = self.server.reply(request)
+        if request.get("stream") and message["content"][0]["type"] == "text":
+            self._send_stream(message, message["content"][0]["text"], token_latency_s)
+        else:
+            if self.server.output_token_latency_s:
+                time.sleep(message["usage"]["output_tokens"] * self.server.output_token_latency_s)
+            self._send_json(200, message)
+
+    def do_GET(self):
+        match = _BATCH_PATH_RE.match(self.path.split("?", 1)[0].rstrip("/"))
+        batch = self.server.batches.get(match.group(1)) if match else None
+        if batch is None:
+            self._not_found(self.path)
+            return
+        status = self.server.batch_status(batch, self._base_url())
+        if not match.group(2):
+            self._send_json(200, status)
+            return
+        if status["processing_status"] != "ended":
+            self._send_json(400, {"type": "error", "error": {
+                "type": "invalid_request_error", "message": "Batch is still in progress"}})
+            return
+        data = "".join(json.dumps(result) + "\n" for result in batch["results"]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "application/binary")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _base_url(self) -> str:
+        return f"http://{self.headers.get('host') or '%s:%s' % self.server.server_address[:2]}"
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, latency_s: float = 0.0, token_latency_s: float = 0.0,
+                 models: dict | None = None, output_token_latency_s: float = 0.0, malformed_rate: float = 0.0,
+                 batch_s: float = 0.0, prose_tokens: int = 0):
+        super().__init__(address, StubHandler)
+        self.latency_s = latency_s
+        self.token_latency_s = token_latency_s
+        self.models = models    # model -> (latency_s, token_latency_s); None accepts any model
+        self.output_token_latency_s = output_token_latency_s
+        self.malformed_rate = malformed_rate
+        self.batch_s = batch_s
+        self.prose_tokens = prose_tokens
+        self.batches = {}
+        self.requests = 0
+        self.batch_requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def reply(self, request: dict) -> dict:
+        """The Messages API response body for ``request``."""
+        if request.get("tools"):
+            choice = request.get("tool_choice") or {}
+            name = choice.get("name") or request["tools"][0]["name"]
+            tool_input = canned_tool_input(request.get("messages", [])) if name == "record_verdict" else {}
+            prompt = json.dumps(request.get("system")) + json.dumps(request.get("messages")) + json.dumps(request["tools"])
+            return {
+                "id": f"msg_{uuid.uuid4().hex[:24]}",
+                "type": "message",
+                "role": "assistant",
+                "model": request.get("model"),
+                "content": [{"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}", "name": name,
+                             "input": tool_input}],
+                "stop_reason": "tool_use",
+                "stop_sequence": None,
+                "usage": {"input_tokens": _estimate_tokens(prompt),
+                          "output_tokens": _estimate_tokens(json.dumps(tool_input)) + 10},
+            }
+        text = canned_reply(request.get("system") or "", request.get("messages", []), self.malformed_rate,
+                            self.prose_tokens)
+        stop_reason = "end_turn"
+        max_tokens = request.get("max_tokens")
+        if max_tokens and _estimate_tokens(text) > max_tokens:
+            text, stop_reason = text[:max_tokens * 4], "max_tokens"
+        prompt = json.dumps(request.get("system")) + json.dumps(request.get("messages"))
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": {"input_tokens": _estimate_tokens(prompt), "output_tokens": _estimate_tokens(text)},
+        }
+
+    # --- Message Batches ---
+
+    def create_batch(self, requests: list[dict]) -> dict:
+        """Answer every request up front; the results are released ``batch_s`` later."""
+        results = []
+        for item in requests:
+            params = item.get("params", {})
+            if self.latencies(params.get("model")) is None:
+                result = {"type": "errored", "error": {"type": "error", "error": {
+                    "type": "not_found_error", "message": f"model: {params.get('model')}"}}}
+            else:
+                result = {"type": "succeeded", "message": self.reply(params)}
+            results.append({"custom_id": item.get("custom_id"), "result": result})
+        batch = {"id": f"msgbatch_{uuid.uuid4().hex[:24]}", "created_at": datetime.now(timezone.utc),
+                 "results": results}
+        with self._lock:
+            self.batches[batch["id"]] = batch
+            self.batch_requests += len(requests)
+        return batch
+
+    def batch_status(self, batch: dict, base_url: str) -> dict:
+        created_at = batch["created_at"]
+        ends_at = created_at + timedelta(seconds=self.batch_s)
+        ended = datetime.now(timezone.utc) >= ends_at
+        results = batch["results"]
+        succeeded = sum(1 for r in results if r["result"]["type"] == "succeeded") if ended else 0
+        return {
+            "id": batch["id"],
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else len(results), "succeeded": succeeded,
+                               "errored": len(results) - succeeded if ended else 0, "canceled": 0, "expired": 0},
+            "created_at": created_at.isoformat(),
+            "ended_at": ends_at.isoformat() if ended else None,
+            "expires_at": (created_at + timedelta(days=1)).isoformat(),
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{base_url}/v1/messages/batches/{batch['id']}/results" if ended else None,
+        }
+
+    def latencies(self, model: str) -> tuple[float, float] | None:
+        """``(latency_s, token_latency_s)`` for model, or None if the stub does not serve it."""
+        if self.models is None:
+            return self.latency_s, self.token_latency_s
+        return self.models.get(model)
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_stub_server(port: int = 0, latency_ms: float = 0.0, token_ms: float = 0.0,
+                      models: dict | None = None, output_token_ms: float = 0.0,
+                      malformed_rate: float = 0.0, batch_ms: float = 0.0, prose_tokens: int = 0) -> StubServer:
+    """Start the stub on a background thread; ``server.url`` is the API base URL.
+
+    ``latency_ms`` delays the response (time to first token when streaming);
+    ``token_ms`` is the delay between streamed deltas. ``models`` maps model
+    IDs to their own ``(latency_ms, token_ms)``; any other model is a 404.
+    ``output_token_ms``, ``malformed_rate``, ``batch_ms`` and ``prose_tokens``: see the module docstring.
+    """
+    models_s = ({model: (latency / 1000, token / 1000) for model, (latency, token) in models.items()}
+                if models is not None else None)
+    server = StubServer(("127.0.0.1", port), latency_ms / 1000, token_ms / 1000, models_s,
+                        output_token_ms / 1000, malformed_rate, batch_ms / 1000, prose_tokens)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Anthropic Messages API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--token-ms", type=float, default=20.0, help="Delay between streamed deltas")
+    parser.add_argument("--batch-ms", type=float, default=5000.0, help="Processing time of a message batch")
+    args = parser.parse_args()
+    server = StubServer(("127.0.0.1", args.port), args.latency_ms / 1000, args.token_ms / 1000,
+                        batch_s=args.batch_ms / 1000)
+    print(f"Stub Anthropic API listening on {server.url} "
+          f"(latency {args.latency_ms:.0f} ms, {args.token_ms:.0f} ms per streamed delta)")
+    server.serve_forever()
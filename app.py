@@ -1,32 +1,34 @@
+import importlib.util
 import os
+import time
 import streamlit as st
-import yfinance as yf
-try:
-    from anthropic import Anthropic
-    ANTHROPIC_SDK = True
-except ImportError:
-    from anthropic_simple import AnthropicClient
-    ANTHROPIC_SDK = False
 from dotenv import load_dotenv
 from datetime import datetime
-try:
-    import plotly.graph_objects as go
-    PLOTLY_AVAILABLE = True
-except ImportError:
-    PLOTLY_AVAILABLE = False
-try:
-    from pdf_generator import create_pdf_report
-    PDF_AVAILABLE = True
-except Exception as e:
-    PDF_AVAILABLE = False
-    # Silently disable PDF if reportlab not available
+from market_data import get_default_provider
+from prefetch import DEFAULT_TICKERS as PREFETCH_TICKERS, Prefetcher, format_age, get_default_prefetcher
+from pipeline import AnalysisPipeline, get_default_tracer, looks_like_ticker
+from quote_cache import get_default_cache
+from rate_limiter import get_default_limiter, is_rate_limit
+from recommendation_router import RecommendationRouter
+from recommendation_service import RECOMMENDATION_MODEL, RecommendationService, format_stream_timings
+
+# Heavy optional packages (anthropic, plotly, reportlab) are only looked up
+# here and imported on the code path that needs them, so the landing page
+# renders without loading them.
+ANTHROPIC_SDK = importlib.util.find_spec("anthropic") is not None
+PLOTLY_AVAILABLE = importlib.util.find_spec("plotly") is not None
+PDF_AVAILABLE = importlib.util.find_spec("reportlab") is not None
 
 # Load environment variables (for local dev)
 load_dotenv()
 
-# Initialize Anthropic client
-@st.cache_resource
-def get_ai_client():
+# Render the AI answer token by token (set STREAM_RECOMMENDATIONS=0 to wait for the whole answer)
+STREAM_RECOMMENDATIONS = os.environ.get("STREAM_RECOMMENDATIONS", "1") != "0"
+# Ask only for the structured verdict (tool call, ~50 output tokens); the prose rationale is
+# fetched when the user opens it or asks for the PDF (set STRUCTURED_RECOMMENDATIONS=0 for prose up front)
+STRUCTURED_RECOMMENDATIONS = os.environ.get("STRUCTURED_RECOMMENDATIONS", "1") != "0"
+
+def get_api_key():
     # Try multiple sources: Replit secrets, Streamlit secrets, env variable
     api_key = None
     
@@ -47,12 +49,125 @@ def get_ai_client():
         st.error("⚠️ ANTHROPIC_API_KEY nie je nastavený! Skontrolujte Replit Secrets alebo .env súbor.")
         st.stop()
     
+    return api_key
+
+# Fail fast on a missing key; the client itself is only built for an analysis
+get_api_key()
+
+# Initialize Anthropic client; every call is metered and held to the token budget
+@st.cache_resource
+def get_ai_client():
+    from llm_metering import MeteredClient
+    api_key = get_api_key()
     if ANTHROPIC_SDK:
-        return Anthropic(api_key=api_key)
+        from anthropic import Anthropic
+        return MeteredClient(Anthropic(api_key=api_key))
     else:
-        return AnthropicClient(api_key=api_key)
+        from anthropic_simple import AnthropicClient
+        return MeteredClient(AnthropicClient(api_key=api_key))
+
+# One recommendation service per server process, shared by all sessions
+@st.cache_resource
+def get_recommendation_service():
+    return RecommendationService(get_ai_client())
+
+# Every analysis stage (shared with main.py and main_demo.py), traced per stage
+@st.cache_resource
+def get_pipeline():
+    return AnalysisPipeline(get_ai_client(), service=get_recommendation_service())
+
+# Clear-cut cases are answered by the rule engine, only borderline ones by Claude
+# (ROUTER_MIN_CONFIDENCE); every routing decision is logged to ROUTER_LOG_FILE
+@st.cache_resource
+def get_router():
+    return RecommendationRouter(get_pipeline())
+
+# Quick-action tickers (PREFETCH_TICKERS) are kept warm in the background, one
+# refresher per server process, started when the first of them is analyzed
+def get_prefetcher(ticker=None):
+    """The running prefetcher or None; asking for a hot ``ticker`` starts it."""
+    if ticker is None or ticker.upper() not in PREFETCH_TICKERS:
+        return get_default_prefetcher()
+    # plotly only looks pandas up in sys.modules; it must not see the half-imported
+    # module while the refresher thread is importing it (via yfinance)
+    import pandas  # noqa: F401
+    return get_default_prefetcher(lambda: Prefetcher(get_router(), structured=STRUCTURED_RECOMMENDATIONS))
 
-client = get_ai_client()
+VERDICT_BADGES = {
+    "BUY": ("🟢", "recommendation-buy"),
+    "SELL": ("🔴", "recommendation-sell"),
+    "HOLD": ("🟡", "recommendation-hold"),
+}
+
+def session_memo(name, key, compute):
+    """``(value, hit)``: an open analysis can be rendered again by a full rerun, and must
+    not ask Claude again each time."""
+    memo = st.session_state.setdefault(name, {})
+    if key in memo:
+        return memo[key], True
+    memo[key] = compute()
+    return memo[key], False
+
+def render_verdict(slot, rec_type):
+    rec_emoji, rec_class = VERDICT_BADGES[rec_type]
+    slot.markdown(f"""
+    <div class="{rec_class}">
+        <h2 style="margin: 0;">{rec_emoji} ODPORÚČANIE: {rec_type}</h2>
+    </div>
+    """, unsafe_allow_html=True)
+
+def render_pdf_download(ticker, ticker_info, current_price, target_price, rec_type, recommendation_text,
+                        pdf_data=None):
+    st.markdown("---")
+    st.markdown("### 📄 Stiahnuť kompletný report")
+    
+    try:
+        if pdf_data is None:
+            pdf_data = get_pipeline().report_pdf(ticker, ticker_info, current_price, target_price,
+                                                 rec_type, recommendation_text)
+        
+        st.download_button(
+            label="📥 Download Full Report (PDF)",
+            data=pdf_data,
+            file_name=f"{ticker}_AI_Stock_Analysis_{datetime.now().strftime('%Y%m%d')}.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+            use_container_width=True,
+            type="primary"
+        )
+        
+        st.success("✅ PDF report je pripravený na stiahnutie!")
+        
+    except Exception as pdf_error:
+        st.warning(f"⚠️ PDF report momentálne nie je dostupný: {str(pdf_error)}")
+
+@st.fragment
+def render_details(ticker, ticker_info, current_price, target_price, technicals, rec_type, analysis_key):
+    """Prose rationale and PDF report of a structured verdict, fetched only when asked for.
+    The toggle and the PDF button rerun this fragment, not the whole analysis."""
+    # Both choices belong to this analysis: the same ticker at new prices starts closed again
+    show_details = st.toggle("📖 Detailné zdôvodnenie AI", key="details_" + "_".join(map(str, analysis_key)))
+    pdf_requested = st.session_state.setdefault("pdf_requested", set())
+    if PDF_AVAILABLE and analysis_key not in pdf_requested and st.button("📄 Pripraviť PDF report"):
+        pdf_requested.add(analysis_key)
+    details_slot = st.empty()
+    if not (show_details or analysis_key in pdf_requested
+            or analysis_key in st.session_state.get("details", {})):
+        return
+    (details, _, details_timings), details_hit = session_memo(
+        "details", analysis_key,
+        lambda: get_pipeline().recommend(
+            ticker, current_price, target_price, technicals,
+            stream=STREAM_RECOMMENDATIONS and show_details,
+            on_text=lambda text: details_slot.markdown(text + "▌")))
+    details_text = details.content[0].text.strip()
+    if show_details:
+        details_slot.markdown(details_text)
+    if not details_hit:
+        st.caption(f"📖 Detail: {details.usage.output_tokens} výstupných tokenov"
+                   + (f" | {format_stream_timings(details_timings)}" if details_timings else ""))
+    if PDF_AVAILABLE:
+        render_pdf_download(ticker, ticker_info, current_price, target_price, rec_type, details_text)
 
 # Page config
 st.set_page_config(
@@ -134,6 +249,14 @@ with st.sidebar:
     
     st.markdown("---")
     st.info("💡 **Premium služba** pre členov Trader 2.0 Club")
+    
+    cache_stats = get_default_cache().stats()["total"]
+    st.caption(f"🗄️ Cache kurzov: {cache_stats['hits']} zásahov / "
+               f"{cache_stats['price_refreshes']} obnovení ceny / {cache_stats['misses']} miss")
+    prefetcher = get_prefetcher()
+    if prefetcher:
+        st.caption(f"♨️ {prefetcher.format_summary()}")
+    st.caption(f"⏱️ Etapy: {get_default_tracer().format_summary()}")
 
 # Main content
 col1, col2 = st.columns([2, 1])
@@ -143,7 +266,8 @@ with col1:
     user_input = st.text_input(
         "Ticker symbol alebo názov firmy",
         placeholder="Napr. NVDA, Microsoft, Tesla...",
-        help="Môžete zadať priamo ticker (NVDA) alebo názov firmy (NVIDIA)"
+        help="Môžete zadať priamo ticker (NVDA) alebo názov firmy (NVIDIA)",
+        key="query"
     )
     
     analyze_button = st.button("🚀 Analyzovať", type="primary", use_container_width=True)
@@ -168,83 +292,72 @@ with col2:
 
 st.markdown("---")
 
+# The last analysis stays open across full reruns until a new search starts or the
+# input box is edited (the detail toggle and the PDF button only rerun their fragment)
+if analyze_button and user_input:
+    st.session_state["analysis_input"] = (user_input, st.session_state["query"])
+elif st.session_state.get("analysis_input"):
+    if st.session_state["analysis_input"][1] != st.session_state["query"]:
+        del st.session_state["analysis_input"]
+    elif STRUCTURED_RECOMMENDATIONS:
+        user_input, analyze_button = st.session_state["analysis_input"][0], True
+
 # Analysis section
 if analyze_button and user_input:
     with st.spinner("🔄 Analyzujem akciu..."):
         
         # Determine if input is ticker or company name
-        if user_input.isupper() and 1 <= len(user_input) <= 5:
+        if looks_like_ticker(user_input):
             ticker = user_input
             st.info(f"✅ Používam ticker: **{ticker}**")
         else:
-            # Use AI to get ticker
+            # Local symbol index first; AI only when it has no confident match
             st.info(f"🤖 Zisťujem ticker pre: **{user_input}**...")
+            
             try:
-                if ANTHROPIC_SDK:
-                    response = client.messages.create(
-                        model="claude-3-5-haiku-20241022",
-                        max_tokens=100,
-                        system="You are a financial assistant. Given a company name, return ONLY its exact stock ticker symbol. Return only the ticker text (e.g., 'NVDA'). No extra explanation.",
-                        messages=[{"role": "user", "content": f"What is the stock ticker symbol for {user_input}?"}]
-                    )
-                else:
-                    response = client.create_message(
-                        model="claude-3-5-haiku-20241022",
-                        max_tokens=100,
-                        system="You are a financial assistant. Given a company name, return ONLY its exact stock ticker symbol. Return only the ticker text (e.g., 'NVDA'). No extra explanation.",
-                        messages=[{"role": "user", "content": f"What is the stock ticker symbol for {user_input}?"}]
-                    )
-                ticker = response.content[0].text.strip().upper()
-                st.success(f"✅ Ticker identifikovaný: **{ticker}**")
+                resolved = get_pipeline().resolve(user_input)
+                ticker = resolved["ticker"]
+                source = "AI" if resolved["source"] == "llm" else "lokálny index"
+                st.success(f"✅ Ticker identifikovaný: **{ticker}** ({source})")
             except Exception as e:
                 st.error(f"❌ Chyba pri identifikácii tickeru: {str(e)}")
                 st.stop()
         
-        # Get stock data with caching
-        @st.cache_data(ttl=300)  # Cache for 5 minutes
-        def get_stock_info(ticker_symbol):
-            ticker_obj = yf.Ticker(ticker_symbol)
-            return ticker_obj.info, ticker_obj.history(period="1d")
-        
         st.info(f"📊 Získavam real-time dáta pre **{ticker}**...")
         
-        # Retry logic for rate limits
-        max_retries = 3
-        retry_delay = 2
-        
-        for attempt in range(max_retries):
-            try:
-                ticker_info, hist = get_stock_info(ticker)
-                break  # Success, exit retry loop
-            except Exception as retry_error:
-                if "Too Many Requests" in str(retry_error) and attempt < max_retries - 1:
-                    st.warning(f"⏳ Rate limit hit, čakám {retry_delay} sekúnd... (pokus {attempt + 1}/{max_retries})")
-                    import time
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                    continue
-                else:
-                    raise  # Re-raise if not rate limit or last attempt
+        # Hot tickers come from the background prefetch while it is fresh enough
+        analysis_start = time.perf_counter()
+        prefetcher = get_prefetcher(ticker)
+        snapshot = prefetcher.get(ticker) if prefetcher else None
         
         try:
+            if snapshot:
+                ticker_info, current_price = snapshot.ticker_info, snapshot.current_price
+            else:
+                # Shared on-disk quote cache: survives restarts and is shared with
+                # main.py and other app processes. Yahoo requests are paced and
+                # retried by the shared rate limiter; while Yahoo keeps rate
+                # limiting, the last cached quote is served instead.
+                quote = get_pipeline().quote(ticker)
+                ticker_info, current_price = quote["info"], quote["current_price"]
             
-            current_price = ticker_info.get("currentPrice")
             target_price = ticker_info.get("targetMeanPrice")
             
-            # Fallback
-            if current_price is None:
-                if not hist.empty:
-                    current_price = hist["Close"].iloc[-1]
-            
             if current_price is None or target_price is None:
                 st.error(f"❌ Nedostupné cenové dáta pre {ticker}")
                 st.stop()
             
+            if get_default_limiter().breaker.state != "closed":
+                st.warning("⏳ Yahoo Finance dočasne obmedzuje požiadavky, zobrazujú sa posledné uložené dáta.")
             st.success(f"✅ Dáta získané úspešne!")
+            if snapshot:
+                st.caption(f"♨️ Predpripravená analýza, dáta obnovené pred {format_age(snapshot.age)}")
+            if get_default_provider().name == "replay":
+                st.caption("🔁 Zdroj dát: lokálny replay (MARKET_DATA_PROVIDER=replay), nie živé dáta Yahoo Finance")
             
         except Exception as e:
             error_msg = str(e)
-            if "Too Many Requests" in error_msg or "Rate limit" in error_msg:
+            if is_rate_limit(e):
                 st.error("⏰ **Yahoo Finance Rate Limit**")
                 st.warning("""
                 Yahoo Finance API má limit na počet requestov. Skúste:
@@ -295,6 +408,7 @@ if analyze_button and user_input:
         st.markdown("### 📊 Porovnanie cien")
         
         if PLOTLY_AVAILABLE:
+            import plotly.graph_objects as go
             fig = go.Figure()
             
             fig.add_trace(go.Bar(
@@ -323,52 +437,42 @@ if analyze_button and user_input:
             }, index=['Aktuálna cena', 'Cieľová cena'])
             st.bar_chart(chart_data)
         
+        # One year of daily closes from the local history store (full history
+        # is downloaded once per ticker, afterwards only the new bars); the
+        # technical indicators are computed from the same bars
+        st.markdown("### 📈 Vývoj ceny (1 rok)")
+        technicals = None
+        try:
+            if snapshot:
+                technicals, bars = snapshot.technicals, snapshot.bars
+            else:
+                technicals, bars = get_pipeline().history(ticker)
+            if len(bars):
+                st.line_chart(bars.to_frame()["Close"], height=250)
+            else:
+                st.caption("Historické dáta nie sú dostupné.")
+        except Exception as history_error:
+            st.caption(f"⚠️ Historické dáta nie sú dostupné: {str(history_error)}")
+        
+        if technicals:
+            col_t1, col_t2, col_t3, col_t4 = st.columns(4)
+            with col_t1:
+                st.metric("RSI (14)", f"{technicals['rsi']:.0f}")
+            with col_t2:
+                sma_slow = technicals["sma_slow"]
+                st.metric("SMA 200", f"${sma_slow:.2f}" if sma_slow == sma_slow else "–")
+            with col_t3:
+                st.metric("Volatilita (ročná)", f"{technicals['volatility'] * 100:.0f}%")
+            with col_t4:
+                st.metric("Pokles od maxima", f"{technicals['drawdown'] * 100:.1f}%")
+        
         # Get AI recommendation
         st.markdown("### 🤖 AI Analýza")
         with st.spinner("⚡ Claude AI analyzuje..."):
             try:
-                if ANTHROPIC_SDK:
-                    response = client.messages.create(
-                        model="claude-3-5-haiku-20241022",
-                        max_tokens=500,
-                        system="You are a financial assistant. Make a BUY/HOLD/SELL recommendation: BUY if current price much lower than target price, HOLD if close, SELL if higher.",
-                        messages=[{
-                            "role": "user",
-                            "content": f"Ticker: {ticker}, Current price: {current_price}, Target price: {target_price}."
-                        }]
-                    )
-                else:
-                    response = client.create_message(
-                        model="claude-3-5-haiku-20241022",
-                        max_tokens=500,
-                        system="You are a financial assistant. Make a BUY/HOLD/SELL recommendation: BUY if current price much lower than target price, HOLD if close, SELL if higher.",
-                        messages=[{
-                            "role": "user",
-                            "content": f"Ticker: {ticker}, Current price: {current_price}, Target price: {target_price}."
-                        }]
-                    )
-                recommendation_text = response.content[0].text.strip()
-                
-                # Determine recommendation type
-                if "BUY" in recommendation_text.upper()[:50]:
-                    rec_type = "BUY"
-                    rec_emoji = "🟢"
-                    rec_class = "recommendation-buy"
-                elif "SELL" in recommendation_text.upper()[:50]:
-                    rec_type = "SELL"
-                    rec_emoji = "🔴"
-                    rec_class = "recommendation-sell"
-                else:
-                    rec_type = "HOLD"
-                    rec_emoji = "🟡"
-                    rec_class = "recommendation-hold"
-                
-                # Display recommendation with detailed breakdown
-                st.markdown(f"""
-                <div class="{rec_class}">
-                    <h2 style="margin: 0;">{rec_emoji} ODPORÚČANIE: {rec_type}</h2>
-                </div>
-                """, unsafe_allow_html=True)
+                # Placeholders in page order: the badge and the rationale are filled
+                # in while the answer streams; the summary does not wait for it
+                verdict_slot = st.empty()
                 
                 st.markdown("---")
                 
@@ -396,8 +500,68 @@ if analyze_button and user_input:
                 
                 st.markdown("---")
                 
-                st.markdown("#### 💡 Detailné zdôvodnenie AI:")
-                st.markdown(recommendation_text)
+                analysis_key = (ticker, round(current_price, 2), round(target_price, 2))
+                # The rules decide who answers; a prefetched snapshot was routed the same way
+                decision = snapshot.decision if snapshot else get_router().route(ticker, current_price,
+                                                                                  target_price, technicals)
+                if decision["route"] == "rules":
+                    st.markdown("#### 💡 Zdôvodnenie:")
+                    if snapshot:
+                        routed = {"verdict": snapshot.verdict, "text": snapshot.text}
+                    else:
+                        routed, _ = session_memo(
+                            "routed", analysis_key,
+                            lambda: get_router().serve(decision, current_price, target_price, technicals))
+                    response, response_source, timings = None, "rules", None
+                    rec_type = routed["verdict"]
+                    render_verdict(verdict_slot, rec_type)
+                    st.markdown(routed["text"])
+                    recommendation_text = routed["text"]
+                elif STRUCTURED_RECOMMENDATIONS and (not snapshot or snapshot.structured):
+                    st.markdown("#### 💡 Zdôvodnenie AI:")
+                    text_slot = st.empty()
+                    if snapshot:
+                        structured, response, response_source = snapshot.structured, snapshot.response, "prefetch"
+                    else:
+                        start = time.perf_counter()
+                        (structured, response, response_source), memo_hit = session_memo(
+                            "verdicts", analysis_key,
+                            lambda: get_pipeline().verdict(ticker, current_price, target_price, technicals))
+                        if memo_hit:
+                            response_source = "session"
+                        else:
+                            get_router().record(decision, time.perf_counter() - start, structured["verdict"],
+                                                response_source)
+                    rec_type = structured["verdict"]
+                    render_verdict(verdict_slot, rec_type)
+                    confidence = (f" _(istota {structured['confidence']:.0%})_"
+                                  if structured["confidence"] is not None else "")
+                    text_slot.markdown(f"**{structured['short_rationale']}**{confidence}")
+                    
+                    # The prose rationale (and the PDF built from it) only when asked for
+                    render_details(ticker, ticker_info, current_price, target_price, technicals, rec_type,
+                                   analysis_key)
+                    recommendation_text = None
+                    timings = None
+                else:
+                    st.markdown("#### 💡 Detailné zdôvodnenie AI:")
+                    text_slot = st.empty()
+                    
+                    # Shared across sessions: identical in-flight requests are coalesced
+                    if snapshot:
+                        response, response_source, timings = snapshot.response, "prefetch", None
+                        recommendation_text, rec_type = snapshot.text, snapshot.verdict
+                    else:
+                        routed = get_router().serve(
+                            decision, current_price, target_price, technicals,
+                            stream=STREAM_RECOMMENDATIONS,
+                            on_text=lambda text: text_slot.markdown(text + "▌"),
+                            on_verdict=lambda verdict: render_verdict(verdict_slot, verdict),
+                        )
+                        response, response_source, timings = routed["response"], routed["source"], routed["timings"]
+                        recommendation_text, rec_type = routed["text"], routed["verdict"]
+                    render_verdict(verdict_slot, rec_type)
+                    text_slot.markdown(recommendation_text)
                 
                 st.markdown("---")
                 
@@ -422,40 +586,21 @@ if analyze_button and user_input:
                         st.markdown("- Možné prekúpenie")
                     st.markdown("- Trhové podmienky sa menia")
                 
-                st.info(f"⚡ Claude AI - Token usage: {response.usage.input_tokens} vstup / {response.usage.output_tokens} výstup")
+                if response_source == "rules":
+                    st.info(f"🧭 Jednoznačný prípad ({decision['band']}, istota {decision['confidence']:.0%}): "
+                            f"rozhodnuté pravidlami bez volania Claude AI")
+                elif response_source == "llm":
+                    latency = f" | {format_stream_timings(timings)}" if timings else ""
+                    st.info(f"⚡ Claude AI ({RECOMMENDATION_MODEL}) - Token usage: {response.usage.input_tokens} vstup / {response.usage.output_tokens} výstup{latency}")
+                else:
+                    st.info(f"⚡ Claude AI - Zdieľaná odpoveď ({response_source}), ušetrené tokeny: "
+                            f"{response.usage.input_tokens} vstup / {response.usage.output_tokens} výstup")
+                st.caption(f"📊 Spotreba servera: {get_ai_client().meter.format_last_minute()}")
                 
-                # PDF Download Button
-                if PDF_AVAILABLE:
-                    st.markdown("---")
-                    st.markdown("### 📄 Stiahnuť kompletný report")
-                    
-                    try:
-                        pdf_data = create_pdf_report(
-                            ticker=ticker,
-                            company_name=company_name,
-                            sector=sector,
-                            industry=industry,
-                            current_price=current_price,
-                            target_price=target_price,
-                            recommendation=rec_type,
-                            recommendation_text=recommendation_text,
-                            ticker_info=ticker_info,
-                            price_diff_pct=price_diff_pct
-                        )
-                        
-                        st.download_button(
-                            label="📥 Download Full Report (PDF)",
-                            data=pdf_data,
-                            file_name=f"{ticker}_AI_Stock_Analysis_{datetime.now().strftime('%Y%m%d')}.pdf",
-                            mime="application/pdf",
-                            use_container_width=True,
-                            type="primary"
-                        )
-                        
-                        st.success("✅ PDF report je pripravený na stiahnutie!")
-                        
-                    except Exception as pdf_error:
-                        st.warning(f"⚠️ PDF report momentálne nie je dostupný: {str(pdf_error)}")
+                # PDF Download Button (in structured mode rendered with the details above)
+                if PDF_AVAILABLE and recommendation_text:
+                    render_pdf_download(ticker, ticker_info, current_price, target_price, rec_type,
+                                        recommendation_text, snapshot.pdf if snapshot else None)
                 
             except Exception as e:
                 st.error(f"❌ Chyba pri AI analýze: {str(e)}")
@@ -513,6 +658,9 @@ if analyze_button and user_input:
                 st.markdown(business_summary[:500] + "..." if len(business_summary) > 500 else business_summary)
             
             st.markdown(f"**Čas analýzy:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        if snapshot:
+            prefetcher.record_hit(time.perf_counter() - analysis_start)
 
 else:
     # Landing state
@@ -0,0 +1,329 @@
+"""Batch watchlist mode for the stock advisor.
+
+Runs the same three stages as ``main.agent_loop`` (ticker resolution, stock
+data, recommendation) for a whole watchlist in one process, with bounded
+concurrency per stage, and streams one JSON line per symbol.
+
+With ``--packed`` the recommend stage runs once for the whole watchlist
+instead: the symbols whose quotes succeeded go to Claude in packed
+multi-ticker calls (``packed_recommendations``), and the lines are written
+after that stage.
+
+Usage:
+    python batch.py watchlist.txt --output results.jsonl
+    python batch.py NVDA Microsoft TSLA --workers 8
+    python batch.py watchlist.txt --packed --pack-size 20
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from bulk_quotes import BulkQuoteProvider
+from main import (
+    format_recommendation,
+    get_recommendation,
+    get_stock_data,
+    looks_like_ticker,
+    pipeline,
+    resolve_ticker,
+    timestamp,
+)
+from symbol_index import get_default_index
+
+STAGES = ("prefetch", "resolve", "quote", "recommend")
+
+
+# --- Stage statistics ---
+
+class StageStats:
+    """Thread-safe counters for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            self.busy_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def summary(self, wall_seconds: float) -> dict:
+        return {
+            "stage": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "avg_latency_ms": round(1000 * self.busy_seconds / self.calls, 1) if self.calls else None,
+            "max_latency_ms": round(1000 * self.max_seconds, 1),
+            "throughput_per_s": round(self.calls / wall_seconds, 2) if wall_seconds > 0 else None,
+        }
+
+
+class _Stage:
+    """A stage slot: bounded concurrency plus timing."""
+
+    def __init__(self, name: str, concurrency: int):
+        self.stats = StageStats(name)
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+
+    def run(self, func, *args, **kwargs):
+        with self._slots:
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = func(*args, **kwargs)
+                ok = not (isinstance(result, dict) and result.get("error"))
+                return result
+            finally:
+                self.stats.record(time.perf_counter() - start, ok)
+
+
+# --- Watchlist input ---
+
+def read_watchlist(path: str) -> list[str]:
+    """Read tickers/company names, one per line or comma separated. '#' starts a comment."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            for item in line.split(","):
+                item = item.strip()
+                if item:
+                    entries.append(item)
+    return entries
+
+
+# --- Pipeline ---
+
+def analyze_entry(entry: str, stages: dict, recommend: bool = True) -> dict:
+    """Run resolve -> quote -> recommend for one watchlist entry (without recommend for ``--packed``)."""
+    record = {
+        "input": entry,
+        "ticker": None,
+        "current_price": None,
+        "target_price": None,
+        "recommendation": None,
+        "error": None,
+    }
+
+    try:
+        if looks_like_ticker(entry):
+            ticker = entry
+        else:
+            ticker = stages["resolve"].run(resolve_ticker, entry)["ticker"]
+            if not looks_like_ticker(ticker):
+                record["error"] = f"'{entry}' does not appear to have a valid stock ticker symbol."
+                return record
+        record["ticker"] = ticker
+
+        stock_data = stages["quote"].run(get_stock_data, ticker)
+        record["current_price"] = stock_data["current_price"]
+        record["target_price"] = stock_data["target_price"]
+        if stock_data["error"]:
+            record["error"] = stock_data["error"]
+            return record
+        if not recommend:
+            return record
+
+        reco_response = stages["recommend"].run(
+            get_recommendation,
+            ticker=ticker,
+            current_price=stock_data["current_price"],
+            target_price=stock_data["target_price"],
+            # Concurrent symbols would interleave their echoed tokens
+            stream=False,
+        )
+        record["recommendation"] = reco_response["recommendation"]
+    except Exception as e:
+        record["error"] = f"Error analyzing {entry}: {str(e)}"
+
+    return record
+
+
+def prefetch_quotes(entries: list[str], stage: "_Stage"):
+    """Warm the quote cache for all plain tickers with batched Yahoo requests.
+
+    The per-symbol quote stage then reads from the cache; symbols the bulk
+    fetch could not serve are simply fetched again there.
+    """
+    tickers = [entry for entry in entries if looks_like_ticker(entry)]
+    if not tickers:
+        return
+    provider = BulkQuoteProvider()
+    try:
+        stage.run(provider.get_quotes, tickers)
+    except Exception as e:
+        print(f"{timestamp()} ⚠️ Bulk quote prefetch failed, falling back to per-symbol requests: {e}")
+
+
+def recommend_packed(records: list[dict], stage: "_Stage", pack_size: int | None = None) -> dict:
+    """Fill in the recommendation of every quoted record with packed calls; returns the call stats."""
+    from packed_recommendations import PackedRecommender, PackSizer
+
+    recommender = PackedRecommender(pipeline.client, PackSizer() if pack_size is None else PackSizer(pack_size))
+    rows = [(r["ticker"], r["current_price"], r["target_price"], None) for r in records if not r["error"]]
+    if rows:
+        results = stage.run(pipeline.recommend_packed, rows, recommender)
+        for record in records:
+            result = results.get(record["ticker"]) if not record["error"] else None
+            if result is None:
+                continue
+            if result["error"]:
+                record["error"] = f"Error analyzing {record['input']}: {result['error']}"
+            else:
+                record["recommendation"] = format_recommendation(f"{result['verdict']} - {result['reason']}")
+    stats = dict(recommender.stats, cost_usd=round(recommender.stats["cost_usd"], 6))
+    sizes = stats.pop("pack_sizes")
+    stats["avg_pack_size"] = round(sum(sizes) / len(sizes), 1) if sizes else None
+    return stats
+
+
+def run_batch(entries: list[str], out, workers: int = 16, resolve_concurrency: int = 4,
+              quote_concurrency: int = 8, recommend_concurrency: int = 4, prefetch: bool = True,
+              packed: bool = False, pack_size: int | None = None) -> dict:
+    """Analyze all entries concurrently and write one JSON line per result to ``out``.
+
+    Results are written in completion order as soon as each symbol finishes
+    (with ``packed``, all of them after the packed recommend stage).
+    Returns a run summary with per-stage stats and the wall time compared to
+    the serial path (the sum of all stage latencies, i.e. what running the
+    same calls one after another would have cost).
+    """
+    stages = {
+        "prefetch": _Stage("prefetch", 1),
+        "resolve": _Stage("resolve", resolve_concurrency),
+        "quote": _Stage("quote", quote_concurrency),
+        "recommend": _Stage("recommend", recommend_concurrency),
+    }
+    succeeded = 0
+    packed_stats = None
+
+    def write(record):
+        nonlocal succeeded
+        if not record["error"]:
+            succeeded += 1
+        out.write(json.dumps(record, default=float, ensure_ascii=False) + "\n")
+        out.flush()
+
+    start = time.perf_counter()
+    if prefetch:
+        prefetch_quotes(entries, stages["prefetch"])
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(analyze_entry, entry, stages, not packed) for entry in entries]
+        records = []
+        for future in as_completed(futures):
+            if packed:
+                records.append(future.result())
+            else:
+                write(future.result())
+    if packed:
+        packed_stats = recommend_packed(records, stages["recommend"], pack_size)
+        for record in records:
+            write(record)
+    wall_seconds = time.perf_counter() - start
+
+    serial_seconds = sum(stage.stats.busy_seconds for stage in stages.values())
+    return {
+        "symbols": len(entries),
+        "succeeded": succeeded,
+        "failed": len(entries) - succeeded,
+        "workers": workers,
+        "wall_seconds": round(wall_seconds, 3),
+        "serial_seconds": round(serial_seconds, 3),
+        "speedup": round(serial_seconds / wall_seconds, 2) if wall_seconds > 0 else None,
+        "stages": [stages[name].stats.summary(wall_seconds) for name in STAGES],
+        "symbol_index": get_default_index().stats(),
+        "packed": packed_stats,
+    }
+
+
+def print_summary(summary: dict, file=sys.stderr):
+    print("\n" + "=" * 70, file=file)
+    print(f"{timestamp()} 📦 Batch finished: {summary['succeeded']}/{summary['symbols']} succeeded", file=file)
+    print("=" * 70, file=file)
+    for stage in summary["stages"]:
+        avg = f"{stage['avg_latency_ms']:.1f} ms" if stage["avg_latency_ms"] is not None else "n/a"
+        tput = f"{stage['throughput_per_s']:.2f}/s" if stage["throughput_per_s"] is not None else "n/a"
+        print(f"   • {stage['stage']:<10} calls={stage['calls']:<5} errors={stage['errors']:<4} "
+              f"avg={avg:<11} throughput={tput}", file=file)
+    index = summary["symbol_index"]
+    if index["lookups"]:
+        print(f"   • ticker index: hit rate {index['hit_rate']:.0%}, {index['llm_fallbacks']} LLM fallbacks, "
+              f"p50={index['p50_ms']:.2f} ms p99={index['p99_ms']:.2f} ms", file=file)
+    packed = summary.get("packed")
+    if packed and packed["calls"]:
+        print(f"   • packed: {packed['calls']} calls (avg {packed['avg_pack_size']} symbols), "
+              f"tokens in={packed['input_tokens']} out={packed['output_tokens']}, ~${packed['cost_usd']:.4f}, "
+              f"{packed['retries']} single-symbol retries", file=file)
+    print(f"\n⏱️  Wall time:   {summary['wall_seconds']:.2f}s with {summary['workers']} workers", file=file)
+    print(f"⏱️  Serial path: {summary['serial_seconds']:.2f}s (sum of stage latencies)", file=file)
+    if summary["speedup"] is not None:
+        print(f"🚀 Speedup:     {summary['speedup']:.1f}x", file=file)
+    print("=" * 70, file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a watchlist of tickers or company names.")
+    parser.add_argument("symbols", nargs="+",
+                        help="Watchlist file(s) or tickers/company names given directly")
+    parser.add_argument("-o", "--output", default="-", help="JSON lines output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=16, help="Symbols in flight at once")
+    parser.add_argument("--resolve-concurrency", type=int, default=4)
+    parser.add_argument("--quote-concurrency", type=int, default=8)
+    parser.add_argument("--recommend-concurrency", type=int, default=4)
+    parser.add_argument("--no-prefetch", action="store_true",
+                        help="Skip the batched quote prefetch and fetch each symbol on its own")
+    parser.add_argument("--packed", action="store_true",
+                        help="Recommend all symbols in packed multi-ticker calls instead of one call each")
+    parser.add_argument("--pack-size", type=int, help="Most symbols per packed call (default LLM_PACK_SIZE)")
+    parser.add_argument("--serial", action="store_true",
+                        help="Run one symbol at a time (baseline for comparing wall time)")
+    args = parser.parse_args(argv)
+
+    entries = []
+    for item in args.symbols:
+        if os.path.isfile(item):
+            entries.extend(read_watchlist(item))
+        else:
+            entries.append(item)
+
+    if args.serial:
+        args.workers = args.resolve_concurrency = args.quote_concurrency = args.recommend_concurrency = 1
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        # Tool functions print progress lines; keep them off the JSON stream.
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = run_batch(
+                entries,
+                out,
+                workers=args.workers,
+                resolve_concurrency=args.resolve_concurrency,
+                quote_concurrency=args.quote_concurrency,
+                recommend_concurrency=args.recommend_concurrency,
+                prefetch=not args.no_prefetch,
+                packed=args.packed,
+                pack_size=args.pack_size,
+            )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print_summary(summary)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Benchmark: per-symbol quote fetching vs. BulkQuoteProvider.
+
+Runs offline against the recorded fixture in fixtures/yahoo_quotes.json.
+Network time is simulated on a virtual clock (a fixed round-trip per request
+plus a small per-symbol payload cost), so 500 tickers finish in seconds; the
+reported latency is simulated network time plus the real CPU time spent.
+
+Usage:
+    python bench_bulk_quotes.py [--rtt-ms 120] [--sizes 10 100 500]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from bulk_quotes import BulkQuoteProvider
+from quote_cache import QuoteCache
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "yahoo_quotes.json")
+
+
+class FixtureYahoo:
+    """Fake Yahoo endpoints serving recorded data for synthetic symbols.
+
+    Symbol ``SYM0007`` is served from the 7th fixture record (cycled), so any
+    universe size can be simulated. ``missing_every`` drops every Nth symbol
+    from bulk responses to exercise the single-symbol fallback.
+    """
+
+    def __init__(self, fixture: dict, rtt_s: float, per_symbol_s: float, missing_every: int = 50):
+        self.records = list(fixture.values())
+        self.rtt_s = rtt_s
+        self.per_symbol_s = per_symbol_s
+        self.missing_every = missing_every
+        self.requests = 0
+        self.network_s = 0.0
+
+    def _record(self, ticker: str) -> dict:
+        return self.records[int(ticker[3:]) % len(self.records)]
+
+    def _charge(self, symbols: int):
+        self.requests += 1
+        self.network_s += self.rtt_s + symbols * self.per_symbol_s
+
+    def info(self, ticker: str) -> dict:
+        self._charge(1)
+        return dict(self._record(ticker)["info"])
+
+    def last_close(self, ticker: str) -> float | None:
+        self._charge(1)
+        return self._record(ticker)["history"][-1]["Close"]
+
+    def download_closes(self, tickers: list[str]) -> dict[str, float]:
+        self._charge(len(tickers))
+        return {
+            t: self._record(t)["history"][-1]["Close"]
+            for t in tickers
+            if int(t[3:]) % self.missing_every != self.missing_every - 1
+        }
+
+
+def per_symbol_path(tickers: list[str], yahoo: FixtureYahoo) -> dict:
+    """Today's path: .info per symbol, plus history when currentPrice is missing."""
+    results = {}
+    for ticker in tickers:
+        info = yahoo.info(ticker)
+        current_price = info.get("currentPrice")
+        if current_price is None:
+            current_price = yahoo.last_close(ticker)
+        results[ticker] = {"ticker": ticker, "current_price": current_price,
+                           "target_price": info.get("targetMeanPrice"), "error": None}
+    return results
+
+
+def run(label: str, tickers: list[str], yahoo: FixtureYahoo, func) -> dict:
+    start = time.perf_counter()
+    results = func()
+    cpu_s = time.perf_counter() - start
+    ok = sum(1 for r in results.values() if not r["error"])
+    return {
+        "path": label,
+        "symbols": len(tickers),
+        "ok": ok,
+        "requests": yahoo.requests,
+        "requests_per_symbol": round(yahoo.requests / len(tickers), 3),
+        "latency_s": round(yahoo.network_s + cpu_s, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--rtt-ms", type=float, default=120.0, help="Simulated round-trip per request")
+    parser.add_argument("--per-symbol-ms", type=float, default=0.5, help="Simulated payload cost per symbol")
+    args = parser.parse_args(argv)
+
+    with open(FIXTURE_PATH, encoding="utf-8") as f:
+        fixture = json.load(f)
+
+    def new_yahoo():
+        return FixtureYahoo(fixture, args.rtt_ms / 1000, args.per_symbol_ms / 1000)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            tickers = [f"SYM{i:04d}" for i in range(size)]
+
+            yahoo = new_yahoo()
+            rows.append(run("per-symbol", tickers, yahoo, lambda: per_symbol_path(tickers, yahoo)))
+
+            cache = QuoteCache(os.path.join(tmp, f"cold_{size}.sqlite3"), max_entries=10 * size)
+            yahoo = new_yahoo()
+            provider = BulkQuoteProvider(cache, yahoo.download_closes, yahoo.info, yahoo.last_close)
+            rows.append(run("bulk (cold cache)", tickers, yahoo, lambda: provider.get_quotes(tickers)))
+
+            # Intraday refresh: fundamentals still fresh, every price expired
+            cache.price_ttl = 0
+            yahoo = new_yahoo()
+            provider = BulkQuoteProvider(cache, yahoo.download_closes, yahoo.info, yahoo.last_close)
+            rows.append(run("bulk (stale prices)", tickers, yahoo, lambda: provider.get_quotes(tickers)))
+
+            # Everything fresh: no requests at all
+            cache.price_ttl = 3600
+            yahoo = new_yahoo()
+            provider = BulkQuoteProvider(cache, yahoo.download_closes, yahoo.info, yahoo.last_close)
+            rows.append(run("bulk (warm cache)", tickers, yahoo, lambda: provider.get_quotes(tickers)))
+
+    print("=" * 78)
+    print(f"QUOTE FETCH BENCHMARK (simulated RTT {args.rtt_ms:.0f} ms)")
+    print("=" * 78)
+    print(f"{'path':<22}{'symbols':>8}{'ok':>6}{'requests':>10}{'req/symbol':>12}{'latency':>12}")
+    for row in rows:
+        print(f"{row['path']:<22}{row['symbols']:>8}{row['ok']:>6}{row['requests']:>10}"
+              f"{row['requests_per_symbol']:>12.3f}{row['latency_s']:>11.2f}s")
+    print("=" * 78)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark: bulk PDF rendering throughput with 1/2/4/8 worker processes.
+
+Renders N reports (default 500) from the sample quotes in
+fixtures/yahoo_quotes.json through ``bulk_reports.render_reports`` into a
+temporary ZIP archive. Each worker count runs in a fresh subprocess so the
+peak RSS of the parent and of the largest worker are measured independently.
+Throughput scales with worker count only up to the number of CPU cores.
+
+Usage:
+    python bench_bulk_reports.py [--count 500] [--workers 1 2 4 8]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from bench_pdf import report_jobs
+
+
+def child(workers: int, count: int):
+    from bulk_reports import ZipSink, render_reports
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = ZipSink(os.path.join(tmp, "reports.zip"))
+        try:
+            # Generator, so the parent holds only the in-flight jobs
+            summary = render_reports((job for job in report_jobs(count)), sink, workers=workers)
+        finally:
+            sink.close()
+        zip_mb = os.path.getsize(sink.path) / 1024 / 1024
+    # ru_maxrss is KiB on Linux
+    summary["parent_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    summary["worker_rss_mb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    summary["zip_mb"] = zip_mb
+    print(json.dumps(summary))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.count)
+        return
+
+    rows = []
+    for workers in args.workers:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(workers),
+                              "--count", str(args.count)],
+                             capture_output=True, text=True, check=True)
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    base = rows[0]["reports_per_s"]
+    print("=" * 78)
+    print(f"BULK PDF BENCHMARK ({args.count} reports, {os.cpu_count()} CPUs)")
+    print("=" * 78)
+    print(f"{'workers':>8}{'seconds':>10}{'reports/s':>12}{'scaling':>10}{'parent RSS':>13}"
+          f"{'worker RSS':>13}{'zip':>10}")
+    for row in rows:
+        print(f"{row['workers']:>8}{row['wall_seconds']:>10.2f}{row['reports_per_s']:>12.1f}"
+              f"{row['reports_per_s'] / base:>9.2f}x{row['parent_rss_mb']:>11.1f}MB"
+              f"{row['worker_rss_mb']:>11.1f}MB{row['zip_mb']:>8.1f}MB")
+    print("=" * 78)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark: app.py cold start, rerun cost and baseline RSS.
+
+Each run starts a fresh Python process that renders app.py once with
+Streamlit's ``AppTest`` harness (the same script execution ``streamlit run``
+does for the first page view, without a browser) and then reruns it, as
+Streamlit does on every widget interaction. Reported per run:
+
+- ``first render``: process start -> first script run finished, i.e. all
+  module imports plus the first paint of the landing page;
+- ``rerun``: a second script run in the same process;
+- ``RSS``: peak resident memory after the first render;
+- which heavy optional modules were imported to render the landing page.
+
+``--importtime`` additionally prints the slowest imports of one cold start
+from ``python -X importtime`` (cumulative microseconds, as CPython reports
+them), which is where to look when the first number regresses.
+
+Usage:
+    python bench_cold_start.py [--runs 5] [--importtime] [--top 25]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+HEAVY_MODULES = ("anthropic", "yfinance", "pandas", "plotly", "reportlab", "numpy", "httpx")
+
+
+def child(app_path: str):
+    import resource
+
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app_path, default_timeout=120)
+    at.run()
+    first_render = time.perf_counter()
+    # ru_maxrss is KiB on Linux
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    start = time.perf_counter()
+    at.run()
+    rerun = time.perf_counter() - start
+
+    print(json.dumps({"first_render_at": first_render, "rerun_s": rerun, "rss_mb": rss_mb,
+                      "loaded": loaded, "exception": bool(at.exception)}))
+
+
+def _child_env() -> dict:
+    env = dict(os.environ)
+    # The landing page stops with an error banner without a key; any value renders it
+    env.setdefault("ANTHROPIC_API_KEY", "bench-cold-start")
+    return env
+
+
+def run_once(app_path: str) -> dict:
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", app_path],
+                         capture_output=True, text=True, check=True, env=_child_env())
+    row = json.loads(out.stdout.strip().splitlines()[-1])
+    # perf_counter is CLOCK_MONOTONIC on Linux, so both processes share the clock
+    row["first_render_s"] = row.pop("first_render_at") - start
+    return row
+
+
+def import_profile(app_path: str, top: int):
+    """Cold start under ``-X importtime``; print the slowest top-level imports."""
+    out = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", app_path],
+                         capture_output=True, text=True, check=True, env=_child_env())
+    rows = []
+    # "import time: self [us] | cumulative | imported package", nesting shown by indentation
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if name.startswith("  "):
+            continue  # imported by another module; counted in its parent's cumulative time
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+
+    print(f"{'cumulative':>12}{'self':>10}  module")
+    for cumulative_us, self_us, name in rows[:top]:
+        print(f"{cumulative_us / 1000:>10.1f}ms{self_us / 1000:>8.1f}ms  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app", default=APP_PATH, help="Script to render (default: app.py)")
+    parser.add_argument("--importtime", action="store_true", help="Also print a -X importtime profile")
+    parser.add_argument("--top", type=int, default=25, help="Rows in the import profile")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child)
+        return
+
+    rows = [run_once(args.app) for _ in range(args.runs)]
+    if any(row["exception"] for row in rows):
+        print("⚠️ The script raised an exception while rendering; numbers are not comparable.")
+
+    first = [row["first_render_s"] for row in rows]
+    rerun = [row["rerun_s"] for row in rows]
+    rss = [row["rss_mb"] for row in rows]
+    print("=" * 70)
+    print(f"COLD START BENCHMARK ({args.runs} fresh processes, {os.path.basename(args.app)})")
+    print("=" * 70)
+    print(f"first render   median {statistics.median(first) * 1000:8.0f} ms   min {min(first) * 1000:8.0f} ms")
+    print(f"rerun          median {statistics.median(rerun) * 1000:8.1f} ms   min {min(rerun) * 1000:8.1f} ms")
+    print(f"peak RSS       median {statistics.median(rss):8.1f} MB")
+    print(f"heavy modules loaded for the landing page: {', '.join(rows[0]['loaded']) or 'none'}")
+    print("=" * 70)
+
+    if args.importtime:
+        print()
+        import_profile(args.app, args.top)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""Benchmark: end-to-end pipeline latency and throughput against local stubs.
+
+Runs the two real request paths with no network:
+
+- ``cli``: what ``main.agent_loop`` does per query (ticker resolution,
+  ``get_stock_data``, technicals, ``get_recommendation``);
+- ``app``: the Streamlit analysis path through ``pipeline.AnalysisPipeline``
+  (resolution, quote, price history + indicators, streamed recommendation
+  through the shared ``RecommendationService``, PDF report).
+
+Claude is the local stub server (``anthropic_stub_server``) and Yahoo is the
+``market_data.ReplayProvider`` with simulated latency. Caches are cold: the
+quote and LLM response caches expire immediately, so every query pays for
+every stage. The CLI's recommendation router is pinned to escalate every
+query (``ROUTER_MIN_CONFIDENCE=2``), so ``recommend`` always measures the
+Claude path (``bench_router.py`` measures the routing itself), and its log
+goes to the run's temporary directory. Each concurrency level runs in a
+fresh process, so its peak RSS is its own.
+
+Reported per flow and concurrency level: throughput (queries/s), p50/p95/p99
+per stage and peak RSS. Results are written as JSON (by default
+``.cache/bench/e2e-<commit>.json``); ``--compare`` prints the change against
+an earlier result file.
+
+Usage:
+    python bench_e2e.py [--flows cli app] [--concurrency 1 4 16] [--requests 32]
+    python bench_e2e.py --compare .cache/bench/e2e-1d0cf35.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from percentiles import percentile
+
+SCRIPT = os.path.abspath(__file__)
+ROOT = os.path.dirname(SCRIPT)
+# Tickers, names the symbol index knows, and names only the LLM can resolve
+QUERIES = ["NVDA", "AAPL", "MSFT", "TSLA", "AMZN", "META", "NVIDIA", "Microsoft", "Apple Inc",
+           "Coca-Cola", "JPMorgan Chase", "Walt Disney", "Gamestop Corp", "Netflix", "Oracle", "Nike"]
+STAGES = ("resolve", "quote", "technicals", "recommend", "ttft", "pdf", "total")
+
+
+class StageTimer:
+    """Thread-safe per-stage latency samples."""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "n": len(samples),
+        "mean_ms": round(1000 * sum(samples) / len(samples), 2),
+        "p50_ms": round(1000 * percentile(samples, 50), 2),
+        "p95_ms": round(1000 * percentile(samples, 95), 2),
+        "p99_ms": round(1000 * percentile(samples, 99), 2),
+    }
+
+
+# --- Flows (run inside the child process) ---
+
+def cli_flow(query: str, timer: StageTimer):
+    from indicators import ticker_technicals
+    from main import get_recommendation, get_stock_data, looks_like_ticker, resolve_ticker
+
+    with timer.stage("resolve"):
+        ticker = query if looks_like_ticker(query) else resolve_ticker(query)["ticker"]
+    with timer.stage("quote"):
+        stock_data = get_stock_data(ticker)
+    if stock_data["error"]:
+        raise RuntimeError(stock_data["error"])
+    with timer.stage("technicals"):
+        technicals = ticker_technicals(ticker)
+    with timer.stage("recommend"):
+        get_recommendation(ticker, stock_data["current_price"], stock_data["target_price"], stream=False,
+                           technicals=technicals)
+
+
+def app_flow(query: str, timer: StageTimer, pipeline):
+    from recommendation_service import parse_verdict
+
+    with timer.stage("resolve"):
+        ticker = pipeline.resolve(query)["ticker"]
+    with timer.stage("quote"):
+        quote = pipeline.quote(ticker)
+    current_price, target_price = quote["current_price"], quote["target_price"]
+    if current_price is None or target_price is None:
+        raise RuntimeError(f"No price data for {ticker}")
+    with timer.stage("technicals"):
+        technicals, _ = pipeline.history(ticker)
+    with timer.stage("recommend"):
+        response, source, timings = pipeline.recommend(ticker, current_price, target_price, technicals,
+                                                       stream=True)
+    if timings:
+        timer.add("ttft", timings["ttft_s"])
+    text = response.content[0].text.strip()
+    with timer.stage("pdf"):
+        pipeline.report_pdf(ticker, quote["info"], current_price, target_price, parse_verdict(text, final=True), text)
+
+
+def child(flow: str, concurrency: int, requests: int):
+    import resource
+
+    # Isolated, cold caches for this run; set before the repo modules read them
+    tmp = tempfile.mkdtemp(prefix="bench-e2e-")
+    os.environ.update({
+        "QUOTE_CACHE_PATH": os.path.join(tmp, "quotes.sqlite3"),
+        "QUOTE_CACHE_PRICE_TTL": "0",
+        "QUOTE_CACHE_FUNDAMENTALS_TTL": "0",
+        "LLM_CACHE_PATH": os.path.join(tmp, "llm.sqlite3"),
+        "LLM_CACHE_TTL": "0",
+        "PRICE_HISTORY_DIR": os.path.join(tmp, "history"),
+        "SYMBOL_INDEX_LEARNED_PATH": os.path.join(tmp, "learned.csv"),
+        "ROUTER_LOG_FILE": os.path.join(tmp, "routing.jsonl"),
+        "ROUTER_MIN_CONFIDENCE": "2",
+        "MARKET_DATA_PROVIDER": "replay",
+        "MARKET_DATA_REPLAY_SYNTHESIZE": "1",
+        "ANTHROPIC_API_KEY": os.environ.get("ANTHROPIC_API_KEY") or "stub",
+    })
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+    timer = StageTimer()
+    if flow == "app":
+        from main import client
+        from pipeline import AnalysisPipeline
+        from recommendation_service import RecommendationService
+
+        pipeline = AnalysisPipeline(client, service=RecommendationService(client, max_workers=concurrency,
+                                                                          result_ttl=0))
+        run_one = lambda query, t: app_flow(query, t, pipeline)
+    else:
+        run_one = cli_flow
+
+    errors = []
+
+    def run(query, t=timer):
+        start = time.perf_counter()
+        try:
+            run_one(query, t)
+        except Exception as e:
+            errors.append(f"{query}: {e}")
+            return
+        t.add("total", time.perf_counter() - start)
+
+    queries = [QUERIES[i % len(QUERIES)] for i in range(requests)]
+    # main.py logs every step to stdout; keep the JSON result clean
+    with contextlib.redirect_stdout(io.StringIO()):
+        run(QUERIES[0], StageTimer())   # warm-up: imports, PDF styles, connections
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(run, queries))
+        wall = time.perf_counter() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result = {
+        "flow": flow,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "wall_s": round(wall, 3),
+        "throughput_qps": round((requests - len(errors)) / wall, 2),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+        "stages": {stage: summarize(timer.samples[stage]) for stage in STAGES if timer.samples.get(stage)},
+    }
+    sys.stdout.write(json.dumps(result))
+
+
+# --- Parent ---
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD", "--", "*.py"], cwd=ROOT).returncode != 0
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(runs: list[dict], baseline: dict | None = None):
+    base = {(r["flow"], r["concurrency"]): r for r in (baseline or {}).get("runs", [])}
+
+    def delta(new, old):
+        return f" ({(new - old) / old:+.0%})" if old else ""
+
+    print("=" * 100)
+    print("END-TO-END BENCHMARK" + (f"  vs {baseline['commit']}" if baseline else ""))
+    print("=" * 100)
+    for run in runs:
+        old = base.get((run["flow"], run["concurrency"]))
+        print(f"\n{run['flow']} flow, concurrency {run['concurrency']}: {run['requests']} queries in "
+              f"{run['wall_s']:.2f}s -> {run['throughput_qps']:.2f} q/s"
+              f"{delta(run['throughput_qps'], old['throughput_qps']) if old else ''}, "
+              f"peak RSS {run['peak_rss_mb']:.0f} MB, errors {run['errors']}")
+        for sample in run["error_samples"]:
+            print(f"   ! {sample}")
+        print(f"   {'stage':<12}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}")
+        for stage, stats in run["stages"].items():
+            cells = []
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                change = delta(stats[key], old["stages"][stage][key]) if old and stage in old["stages"] else ""
+                cells.append(f"{stats[key]:.1f}{change}")
+            print(f"   {stage:<12}" + "".join(f"{cell:>18}" for cell in cells))
+    print("=" * 100)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flows", nargs="+", default=["cli", "app"], choices=["cli", "app"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="Queries per flow and concurrency level")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Stub time to first token")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="Stub delay per streamed word")
+    parser.add_argument("--yahoo-latency-ms", type=float, default=80.0, help="Replay latency per Yahoo request")
+    parser.add_argument("--output", help="Result JSON (default .cache/bench/e2e-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result JSON to compare against")
+    parser.add_argument("--child", nargs=3, metavar=("FLOW", "CONCURRENCY", "REQUESTS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child[0], int(args.child[1]), int(args.child[2]))
+        return
+
+    from anthropic_stub_server import start_stub_server
+
+    server = start_stub_server(latency_ms=args.llm_latency_ms, token_ms=args.token_ms)
+    env = dict(os.environ, ANTHROPIC_BASE_URL=server.url,
+               MARKET_DATA_REPLAY_LATENCY_MS=str(args.yahoo_latency_ms))
+    runs = []
+    for flow in args.flows:
+        for concurrency in args.concurrency:
+            proc = subprocess.run([sys.executable, SCRIPT, "--child", flow, str(concurrency), str(args.requests)],
+                                  capture_output=True, text=True, env=env, cwd=ROOT)
+            if proc.returncode != 0:
+                print(proc.stderr, file=sys.stderr)
+                raise SystemExit(f"{flow} flow at concurrency {concurrency} failed")
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    server.shutdown()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.machine()}, {os.cpu_count()} CPU",
+        "config": {key: value for key, value in vars(args).items() if key not in ("child", "compare", "output")},
+        "runs": runs,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(runs, baseline)
+
+    output = args.output or os.path.join(ROOT, ".cache", "bench", f"e2e-{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark: indicator engine over 10 years x 1,000 tickers within a time budget.
+
+Synthetic random-walk OHLC bars (2,520 per ticker by default). Measures:
+
+- ``full compute``: every indicator over the whole universe from scratch
+  (``indicators.compute``), checked against ``--budget`` seconds;
+- ``incremental``: one new bar for every ticker via ``IndicatorState.update``
+  plus a ``snapshot()``, i.e. the daily refresh;
+- ``pandas``: the same indicators with per-ticker pandas rolling/ewm calls on
+  a subset, extrapolated to the full universe, as the baseline.
+
+Usage:
+    python bench_indicators.py [--tickers 1000] [--years 10] [--budget 2.0]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import indicators as ind
+
+
+def make_universe(n_tickers: int, n_bars: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, (n_tickers, n_bars)), axis=1))
+    spread = close * rng.uniform(0.002, 0.02, (n_tickers, n_bars))
+    return close + spread, close - spread, close
+
+
+def pandas_indicators(high, low, close):
+    import pandas as pd
+
+    h, l, c = pd.Series(high), pd.Series(low), pd.Series(close)
+    delta = c.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / ind.RSI_PERIOD, adjust=False).mean()
+    loss = (-delta).clip(lower=0).ewm(alpha=1 / ind.RSI_PERIOD, adjust=False).mean()
+    prev = c.shift()
+    tr = pd.concat([h - l, (h - prev).abs(), (l - prev).abs()], axis=1).max(axis=1)
+    return {
+        "sma_fast": c.rolling(ind.SMA_FAST).mean().iloc[-1],
+        "sma_slow": c.rolling(ind.SMA_SLOW).mean().iloc[-1],
+        "ema": c.ewm(span=ind.EMA_SPAN, adjust=False).mean().iloc[-1],
+        "rsi": (100 - 100 / (1 + gain / loss)).iloc[-1],
+        "atr": tr.ewm(alpha=1 / ind.ATR_PERIOD, adjust=False).mean().iloc[-1],
+        "volatility": np.log(c).diff().rolling(ind.VOLATILITY_WINDOW).std().iloc[-1] * np.sqrt(ind.TRADING_DAYS),
+        "max_drawdown": (c / c.cummax() - 1).min(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=1000)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=2.0, help="Seconds allowed for the full compute")
+    parser.add_argument("--new-bars", type=int, default=250, help="Incremental updates to time")
+    parser.add_argument("--pandas-sample", type=int, default=50, help="Tickers for the pandas baseline")
+    args = parser.parse_args(argv)
+
+    n_bars = args.years * ind.TRADING_DAYS
+    high, low, close = make_universe(args.tickers, n_bars + args.new_bars)
+    hist = (high[:, :n_bars], low[:, :n_bars], close[:, :n_bars])
+
+    start = time.perf_counter()
+    state = ind.compute(*hist)
+    snapshot = state.snapshot()
+    full_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for t in range(n_bars, n_bars + args.new_bars):
+        state.update(high[:, t], low[:, t], close[:, t])
+        state.snapshot()
+    incremental_s = (time.perf_counter() - start) / args.new_bars
+
+    sample = min(args.pandas_sample, args.tickers)
+    start = time.perf_counter()
+    baseline = [pandas_indicators(hist[0][i], hist[1][i], hist[2][i]) for i in range(sample)]
+    pandas_s = (time.perf_counter() - start) / sample * args.tickers
+
+    # Same numbers as the pandas reference (last bar of the history)
+    worst = max(abs(baseline[i][name] - snapshot[name][i]) / max(abs(baseline[i][name]), 1e-9)
+                for i in range(sample) for name in baseline[i])
+
+    bars = args.tickers * n_bars
+    ok = full_s <= args.budget
+    print("=" * 76)
+    print(f"INDICATOR BENCHMARK ({args.tickers} tickers x {n_bars} bars = {bars:,} bars)")
+    print("=" * 76)
+    print(f"full compute   {full_s:8.3f}s   {bars / full_s:>14,.0f} bars/s   budget {args.budget:.1f}s "
+          f"{'✅' if ok else '❌'}")
+    print(f"incremental    {incremental_s * 1000:8.3f}ms per new bar for all {args.tickers} tickers")
+    print(f"pandas loop    {pandas_s:8.2f}s   (extrapolated from {sample} tickers)  "
+          f"speedup {pandas_s / full_s:.0f}x")
+    print(f"max relative difference vs pandas: {worst:.2e}")
+    print("=" * 76)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
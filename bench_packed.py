@@ -0,0 +1,148 @@
+"""Benchmark: packed multi-ticker recommendations against one Claude call per ticker.
+
+Both paths ask the local stub server (``anthropic_stub_server``) for a
+verdict on the same ``--tickers`` synthetic symbols (prices and technicals),
+with ``--concurrency`` requests in flight:
+
+- ``per ticker``: the request ``pipeline.AnalysisPipeline.recommend`` sends,
+  once per symbol;
+- ``packed``: ``packed_recommendations.PackedRecommender`` with at most
+  ``--pack-size`` symbols per call and single-symbol retries for malformed
+  rows (``--malformed-rate`` makes the stub garble or drop that share).
+
+The stub charges ``--latency-ms`` per request plus ``--output-token-ms`` per
+generated token, so the wall time reflects what the output length costs.
+Reported per path and normalized to 100 tickers: calls, input and output
+tokens, estimated cost (``llm_metering.PRICING``) and wall time, plus the
+share of packed verdicts that agree with the per-ticker ones.
+
+Usage:
+    python bench_packed.py [--tickers 100] [--pack-size 25] [--concurrency 4] [--malformed-rate 0.05]
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from indicators import format_technicals
+from llm_metering import estimate_cost
+from packed_recommendations import PackedRecommender, PackSizer
+from pipeline import RECOMMENDATION_MAX_TOKENS
+from recommendation_service import (RECOMMENDATION_MODEL, RECOMMENDATION_SYSTEM, create_message, parse_verdict,
+                                    recommendation_prompt)
+
+
+def synthetic_rows(count: int, seed: int = 7) -> list[tuple]:
+    """``(ticker, current_price, target_price, technicals line)`` with a spread of upsides."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        current = round(rng.uniform(5, 800), 2)
+        technicals = {
+            "sma_fast": current * rng.uniform(0.85, 1.15),
+            "sma_slow": current * rng.uniform(0.75, 1.25),
+            "rsi": rng.uniform(20, 85),
+            "atr_pct": rng.uniform(0.8, 6),
+            "volatility": rng.uniform(0.15, 0.9),
+            "drawdown": -rng.uniform(0, 0.5),
+            "max_drawdown": -rng.uniform(0.2, 0.8),
+        }
+        rows.append((f"S{i:03d}", current, round(current * rng.uniform(0.8, 1.4), 2), format_technicals(technicals)))
+    return rows
+
+
+def run_per_ticker(client, rows: list[tuple], concurrency: int) -> dict:
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+
+    def one(row):
+        response = create_message(client, model=RECOMMENDATION_MODEL, max_tokens=RECOMMENDATION_MAX_TOKENS,
+                                  system=RECOMMENDATION_SYSTEM,
+                                  messages=[{"role": "user", "content": recommendation_prompt(*row)}])
+        return row[0], response
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        responses = list(pool.map(one, rows))
+    wall = time.perf_counter() - start
+    verdicts = {}
+    for ticker, response in responses:
+        verdicts[ticker] = parse_verdict(response.content[0].text, final=True)
+        usage["calls"] += 1
+        usage["input_tokens"] += response.usage.input_tokens
+        usage["output_tokens"] += response.usage.output_tokens
+        usage["cost_usd"] += estimate_cost(RECOMMENDATION_MODEL, response.usage.input_tokens,
+                                           response.usage.output_tokens)
+    return dict(usage, wall_s=wall, verdicts=verdicts, failed=0)
+
+
+def run_packed(client, rows: list[tuple], concurrency: int, pack_size: int) -> dict:
+    recommender = PackedRecommender(client, PackSizer(pack_size), concurrency=concurrency)
+    start = time.perf_counter()
+    results = recommender.recommend_many(rows)
+    wall = time.perf_counter() - start
+    stats = recommender.stats
+    return {
+        "calls": stats["calls"],
+        "input_tokens": stats["input_tokens"],
+        "output_tokens": stats["output_tokens"],
+        "cost_usd": stats["cost_usd"],
+        "wall_s": wall,
+        "verdicts": {ticker: result["verdict"] for ticker, result in results.items()},
+        "failed": sum(1 for result in results.values() if result["error"]),
+        "retries": stats["retries"],
+        "truncated": stats["truncated"],
+        "avg_pack": sum(stats["pack_sizes"]) / len(stats["pack_sizes"]) if stats["pack_sizes"] else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument("--pack-size", type=int, default=25, help="Most symbols per packed call")
+    parser.add_argument("--concurrency", type=int, default=4, help="Calls in flight on both paths")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Stub latency per request")
+    parser.add_argument("--output-token-ms", type=float, default=10.0, help="Stub generation time per output token")
+    parser.add_argument("--malformed-rate", type=float, default=0.05,
+                        help="Share of packed rows the stub garbles or drops")
+    args = parser.parse_args(argv)
+
+    from anthropic import Anthropic
+    from anthropic_stub_server import start_stub_server
+
+    server = start_stub_server(latency_ms=args.latency_ms, output_token_ms=args.output_token_ms,
+                               malformed_rate=args.malformed_rate)
+    client = Anthropic(api_key="stub", base_url=server.url)
+    rows = synthetic_rows(args.tickers)
+    create_message(client, model=RECOMMENDATION_MODEL, max_tokens=10, system="",
+                   messages=[{"role": "user", "content": "ping"}])   # warm-up: connection
+
+    single = run_per_ticker(client, rows, args.concurrency)
+    packed = run_packed(client, rows, args.concurrency, args.pack_size)
+    server.shutdown()
+
+    agree = sum(1 for ticker, verdict in packed["verdicts"].items()
+                if verdict is not None and verdict == single["verdicts"].get(ticker))
+    scale = 100 / len(rows)
+    print("=" * 78)
+    print(f"PACKED RECOMMENDATIONS: {len(rows)} tickers, {args.concurrency} calls in flight, "
+          f"stub {args.latency_ms:.0f} ms + {args.output_token_ms:g} ms/token")
+    print("=" * 78)
+    print(f"{'per 100 tickers':<16}{'calls':>8}{'input tok':>12}{'output tok':>12}{'cost $':>10}{'wall s':>10}"
+          f"{'failed':>8}")
+    for name, run in (("per ticker", single), ("packed", packed)):
+        print(f"{name:<16}{run['calls'] * scale:>8.0f}{run['input_tokens'] * scale:>12.0f}"
+              f"{run['output_tokens'] * scale:>12.0f}{run['cost_usd'] * scale:>10.4f}{run['wall_s'] * scale:>10.2f}"
+              f"{run['failed']:>8}")
+    print("-" * 78)
+    print(f"packed: avg {packed['avg_pack']:.1f} symbols per call, {packed['retries']} single-symbol retries, "
+          f"{packed['truncated']} truncated replies")
+    print(f"packed verdicts agreeing with per-ticker: {agree}/{len(rows)}")
+    for key, label in (("calls", "calls"), ("input_tokens", "input tokens"), ("output_tokens", "output tokens"),
+                       ("cost_usd", "cost"), ("wall_s", "wall time")):
+        if packed[key]:
+            print(f"   {label:<14} per ticker / packed = {single[key] / packed[key]:.1f}x")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
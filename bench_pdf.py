@@ -0,0 +1,100 @@
+"""Benchmark: PDF report generation throughput and peak memory.
+
+Renders N reports (default 1,000) from the sample quotes in
+fixtures/yahoo_quotes.json in two modes, each in a fresh subprocess so peak
+RSS is measured independently:
+
+- ``per-call``: a new ReportBuilder for every report, i.e. rebuilding the
+  stylesheet, styles and table styles each time as ``create_pdf_report`` used to;
+- ``shared``: one ReportBuilder reused for all reports.
+
+Usage:
+    python bench_pdf.py [--count 1000]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "yahoo_quotes.json")
+
+SAMPLE_TEXT = (
+    "BUY\n\nThe stock trades well below the analyst consensus target, which suggests meaningful upside. "
+    "Momentum and fundamentals are supportive, though valuation and sector volatility remain risks."
+)
+
+
+def report_jobs(count: int) -> list[dict]:
+    with open(FIXTURE_PATH, encoding="utf-8") as f:
+        records = list(json.load(f).values())
+    jobs = []
+    for i in range(count):
+        info = records[i % len(records)]["info"]
+        current = info.get("currentPrice") or records[i % len(records)]["history"][-1]["Close"]
+        target = info["targetMeanPrice"]
+        pct = (target - current) / current * 100
+        jobs.append({
+            "ticker": info["symbol"],
+            "company_name": info["longName"],
+            "sector": info.get("sector", "N/A"),
+            "industry": info.get("industry", "N/A"),
+            "current_price": current,
+            "target_price": target,
+            "recommendation": "BUY" if pct > 15 else "SELL" if pct < -5 else "HOLD",
+            "recommendation_text": SAMPLE_TEXT,
+            "ticker_info": info,
+            "price_diff_pct": pct,
+        })
+    return jobs
+
+
+def child(mode: str, count: int):
+    from pdf_generator import ReportBuilder
+
+    jobs = report_jobs(count)
+    shared = ReportBuilder() if mode == "shared" else None
+    start = time.perf_counter()
+    total_bytes = 0
+    for job in jobs:
+        builder = shared or ReportBuilder()
+        total_bytes += len(builder.build(**job))
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"mode": mode, "reports": count, "seconds": elapsed,
+                      "reports_per_s": count / elapsed, "peak_rss_mb": peak_rss_mb,
+                      "avg_kb": total_bytes / count / 1024}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--child", choices=["per-call", "shared"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.count)
+        return
+
+    rows = []
+    for mode in ("per-call", "shared"):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, "--count", str(args.count)],
+                             capture_output=True, text=True, check=True)
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print("=" * 70)
+    print(f"PDF REPORT BENCHMARK ({args.count} reports)")
+    print("=" * 70)
+    print(f"{'mode':<12}{'seconds':>10}{'reports/s':>12}{'peak RSS':>12}{'avg size':>12}")
+    for row in rows:
+        print(f"{row['mode']:<12}{row['seconds']:>10.2f}{row['reports_per_s']:>12.1f}"
+              f"{row['peak_rss_mb']:>10.1f}MB{row['avg_kb']:>10.1f}KB")
+    print("=" * 70)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
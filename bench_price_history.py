@@ -0,0 +1,129 @@
+"""Benchmark: price history store, cold fill vs. incremental refresh vs. queries.
+
+Runs against a synthetic Yahoo stand-in (seeded random walks of business-day
+bars, ~10 years per ticker by default, generated before timing starts) so
+only the store's own cost is measured; ``requests``/``bars fetched`` show
+what would go over the network.
+
+- ``cold fill``: empty store, full history for every ticker;
+- ``incremental``: the clock moves one trading day on, every ticker is
+  refreshed (one request each, only the last stored day and the new bar);
+- ``query``: random one-year range queries served from the memory maps.
+
+Usage:
+    python bench_price_history.py [--tickers 500] [--years 10] [--queries 20000]
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from percentiles import percentile
+from price_history import PriceHistoryStore, to_timestamp
+
+DAY = 86400
+
+
+class SyntheticHistory:
+    """Deterministic daily bars per ticker up to ``self.today``; injectable as ``fetch_history``."""
+
+    def __init__(self, years: int, today: str = "2026-10-16", horizon_days: int = 30):
+        self.today = to_timestamp(today)
+        self.first = self.today - years * 365 * DAY
+        self.horizon = self.today + horizon_days * DAY
+        self._series = {}
+
+    def advance(self, days: int = 1):
+        self.today += days * DAY
+
+    def _generate(self, ticker: str) -> dict:
+        days = np.arange(self.first, self.horizon + DAY, DAY, dtype=np.int64)
+        days = days[(days // DAY + 3) % 7 < 5]     # weekdays; 1970-01-01 was a Thursday
+        rng = np.random.default_rng(int.from_bytes(ticker.encode(), "little") % (2 ** 32))
+        close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(days))))
+        spread = close * rng.uniform(0.002, 0.02, len(days))
+        return {
+            "ts": days,
+            "open": close + rng.normal(0, 1, len(days)) * spread / 2,
+            "high": close + spread,
+            "low": close - spread,
+            "close": close,
+            "volume": rng.integers(100_000, 10_000_000, len(days)).astype(np.float64),
+        }
+
+    def __call__(self, ticker: str, start: int | None = None) -> dict:
+        series = self._series.get(ticker)
+        if series is None:
+            series = self._series[ticker] = self._generate(ticker)
+        ts = series["ts"]
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = int(np.searchsorted(ts, self.today, side="right"))
+        return {column: values[lo:hi] for column, values in series.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    tickers = [f"SYM{i:04d}" for i in range(args.tickers)]
+    source = SyntheticHistory(args.years)
+    root = tempfile.mkdtemp(prefix="price-history-")
+    try:
+        store = PriceHistoryStore(root, fetch_history=source)
+        for ticker in tickers:
+            source(ticker)
+
+        start = time.perf_counter()
+        store.update_many(tickers, workers=args.workers)
+        cold_s = time.perf_counter() - start
+        cold = (store.requests, store.bars_fetched)
+        rows = store.rows(tickers[0])
+
+        source.advance(1 if (source.today // DAY + 3) % 7 < 4 else 3)
+        store.requests = store.bars_fetched = 0
+        start = time.perf_counter()
+        added = store.update_many(tickers, workers=args.workers)
+        incremental_s = time.perf_counter() - start
+        incremental = (store.requests, store.bars_fetched)
+        assert all(n == 1 for n in added.values()), added
+
+        rng = random.Random(7)
+        latencies = []
+        checksum = 0.0
+        for _ in range(args.queries):
+            ticker = rng.choice(tickers)
+            begin = source.first + rng.randrange(0, (args.years - 1) * 365) * DAY
+            t0 = time.perf_counter()
+            bars = store.bars(ticker, begin, begin + 365 * DAY)
+            latencies.append(time.perf_counter() - t0)
+            checksum += bars.close[-1]
+        full_scan = time.perf_counter()
+        for ticker in tickers:
+            checksum += store.bars(ticker).close.sum()
+        full_scan_s = time.perf_counter() - full_scan
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    total_bars = args.tickers * rows
+    print("=" * 78)
+    print(f"PRICE HISTORY BENCHMARK ({args.tickers} tickers x {rows} bars = {total_bars:,} bars)")
+    print("=" * 78)
+    print(f"cold fill      {cold_s:8.2f}s   {cold[0]:>6} requests {cold[1]:>12,} bars fetched"
+          f"   {total_bars / cold_s:>12,.0f} bars/s written")
+    print(f"incremental    {incremental_s:8.2f}s   {incremental[0]:>6} requests {incremental[1]:>12,} bars fetched"
+          f"   {args.tickers / incremental_s:>12,.0f} tickers/s")
+    print(f"range query    p50 {percentile(latencies, 50) * 1e6:7.1f}us   p99 {percentile(latencies, 99) * 1e6:7.1f}us"
+          f"   ({args.queries:,} one-year queries, zero-copy views)")
+    print(f"full scan      {full_scan_s * 1000:8.1f}ms  close.sum() over every stored bar")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Benchmark: adaptive rate limiter against a simulated Yahoo that returns 429s.
+
+``FakeYahoo`` enforces its own hidden token bucket (``--allowed`` requests/s)
+and raises yfinance's "Too Many Requests" error for anything above it, after
+``--latency-ms`` of simulated network time. Workers (threads, or asyncio
+tasks) then fetch as fast as they can for ``--duration`` seconds:
+
+- ``naive``: the old app.py loop, up to 3 attempts with 2 s / 4 s sleeps;
+- ``limiter (threads)`` / ``limiter (asyncio)``: through ``RateLimiter``,
+  which starts at ``--start-rate`` and has to find the allowed rate itself.
+
+Reports successful requests/s as a fraction of the allowed rate (the server's
+initial burst allowance lets this slightly exceed 100%), the share of
+requests that hit a 429, and where the adaptive rate ended up.
+
+Usage:
+    python bench_rate_limiter.py [--allowed 20] [--start-rate 40] [--duration 10] [--workers 16]
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+from rate_limiter import CircuitBreaker, RateLimiter
+
+
+class FakeYahoo:
+    """Quote endpoint with a hidden rate limit; counts what it served and refused."""
+
+    def __init__(self, allowed_rate: float, burst: float = 5, latency_s: float = 0.02):
+        self.allowed_rate = allowed_rate
+        self.burst = burst
+        self.latency_s = latency_s
+        self.served = 0
+        self.refused = 0
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _admit(self) -> bool:
+        # Unlike the client's bucket this one never goes into debt: over the limit is refused
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.allowed_rate)
+            self._updated = now
+            if self._tokens < 1:
+                self.refused += 1
+                return False
+            self._tokens -= 1
+            self.served += 1
+            return True
+
+    def fetch(self, ticker: str) -> dict:
+        time.sleep(self.latency_s)
+        if not self._admit():
+            raise Exception("Too Many Requests. Rate limited. Try after a while.")
+        return {"symbol": ticker, "currentPrice": 100.0}
+
+    async def afetch(self, ticker: str) -> dict:
+        await asyncio.sleep(self.latency_s)
+        if not self._admit():
+            raise Exception("Too Many Requests. Rate limited. Try after a while.")
+        return {"symbol": ticker, "currentPrice": 100.0}
+
+
+def run_naive(yahoo: FakeYahoo, workers: int, duration: float) -> dict:
+    stop = time.monotonic() + duration
+    ok = [0] * workers
+    failed = [0] * workers
+
+    def worker(i):
+        while time.monotonic() < stop:
+            delay = 2
+            for attempt in range(3):
+                try:
+                    yahoo.fetch("NVDA")
+                    ok[i] += 1
+                    break
+                except Exception:
+                    if attempt == 2:
+                        failed[i] += 1
+                        break
+                    time.sleep(delay)
+                    delay *= 2
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"ok": sum(ok), "failed": sum(failed), "rate": None}
+
+
+def make_limiter(start_rate: float) -> RateLimiter:
+    return RateLimiter(rate=start_rate, burst=5, max_rate=start_rate * 4, retry_base=0.25, retry_max=4,
+                       breaker=CircuitBreaker(threshold=20, reset_timeout=2))
+
+
+def run_threads(yahoo: FakeYahoo, workers: int, duration: float, start_rate: float) -> dict:
+    limiter = make_limiter(start_rate)
+    stop = time.monotonic() + duration
+    ok = [0] * workers
+    failed = [0] * workers
+
+    def worker(i):
+        while time.monotonic() < stop:
+            try:
+                limiter.call(yahoo.fetch, "NVDA")
+                ok[i] += 1
+            except Exception:
+                failed[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"ok": sum(ok), "failed": sum(failed), "rate": limiter.rate, "stats": limiter.stats}
+
+
+def run_asyncio(yahoo: FakeYahoo, workers: int, duration: float, start_rate: float) -> dict:
+    limiter = make_limiter(start_rate)
+    counts = {"ok": 0, "failed": 0}
+
+    async def worker(stop):
+        while time.monotonic() < stop:
+            try:
+                await limiter.acall(yahoo.afetch, "NVDA")
+                counts["ok"] += 1
+            except Exception:
+                counts["failed"] += 1
+
+    async def main():
+        stop = time.monotonic() + duration
+        await asyncio.gather(*(worker(stop) for _ in range(workers)))
+
+    asyncio.run(main())
+    return dict(counts, rate=limiter.rate, stats=limiter.stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--allowed", type=float, default=20.0, help="Hidden server limit, requests/s")
+    parser.add_argument("--start-rate", type=float, default=40.0, help="Limiter's initial rate, requests/s")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    scenarios = [
+        ("naive (3 tries, 2s/4s sleeps)", lambda y: run_naive(y, args.workers, args.duration)),
+        ("limiter (threads)", lambda y: run_threads(y, args.workers, args.duration, args.start_rate)),
+        ("limiter (asyncio)", lambda y: run_asyncio(y, args.workers, args.duration, args.start_rate)),
+    ]
+
+    print("=" * 92)
+    print(f"RATE LIMITER BENCHMARK (server allows {args.allowed:.0f} req/s, {args.workers} workers, "
+          f"{args.duration:.0f}s per scenario)")
+    print("=" * 92)
+    print(f"{'scenario':<32}{'ok/s':>8}{'of allowed':>12}{'429 share':>11}{'failed':>8}{'final rate':>12}")
+    for name, run in scenarios:
+        yahoo = FakeYahoo(args.allowed, latency_s=args.latency_ms / 1000)
+        start = time.perf_counter()
+        result = run(yahoo)
+        # Wall time includes requests still in flight (and backoffs) at the deadline
+        ok_per_s = result["ok"] / (time.perf_counter() - start)
+        attempts = yahoo.served + yahoo.refused
+        rate = f"{result['rate']:.1f}/s" if result["rate"] is not None else "-"
+        print(f"{name:<32}{ok_per_s:>8.1f}{ok_per_s / args.allowed:>11.0%}"
+              f"{yahoo.refused / max(attempts, 1):>11.0%}{result['failed']:>8}{rate:>12}")
+    print("=" * 92)
+
+
+if __name__ == "__main__":
+    main()
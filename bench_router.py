@@ -0,0 +1,165 @@
+"""Benchmark: tiered routing (rule engine first) against asking Claude for every recommendation.
+
+A sample universe is analyzed one request after another, as the app and
+the CLI do: ``--universe synthetic`` (default) is ``--requests`` symbols with
+analyst upsides around +8% ± 15%, as in ``bench_rule_engine``, and
+technicals; ``--universe replay`` the recorded quotes in
+``fixtures/yahoo_quotes.json`` (with technicals where the recorded history
+is long enough). Two paths answer it:
+
+- ``always Claude``: ``AnalysisPipeline.recommend`` for every symbol;
+- ``routed``: ``recommendation_router.RecommendationRouter``, which answers
+  from the rule engine when its confidence is at least ``--min-confidence``
+  and escalates the rest to the same ``recommend`` call.
+
+Claude is the local stub server (``--latency-ms`` per request plus
+``--output-token-ms`` per generated token, no result caching). The stub
+decides on the upside alone, so escalated cases capped by RSI or the
+downtrend rule show up as disagreements with the rules.
+
+Reported: escalation rate, Claude calls, tokens and cost per 1,000
+requests, p50/p95 and total latency per path and the latency saved; the
+routing log of the run, per confidence band; and the escalation rate and
+estimated latency saved at other ``min_confidence`` settings.
+
+Usage:
+    python bench_router.py [--requests 60] [--min-confidence 0.5] [--universe replay]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from indicators import bars_technicals
+from llm_metering import estimate_cost
+from percentiles import percentile
+from pipeline import AnalysisPipeline
+from recommendation_router import RecommendationRouter, summarize_log
+from recommendation_service import RECOMMENDATION_MODEL, RecommendationService
+
+THRESHOLDS = (0.25, 0.5, 0.75, 1.0)
+
+
+def sample_universe(count: int, seed: int = 42) -> list[tuple]:
+    """``(ticker, current_price, target_price, technicals)`` rows; ``technicals`` as
+    ``indicators.bars_technicals`` returns them."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        current = round(rng.uniform(5, 500), 2)
+        technicals = {
+            "close": current,
+            "sma_fast": current * rng.uniform(0.9, 1.1),
+            "sma_slow": current * rng.uniform(0.8, 1.2),
+            "rsi": rng.uniform(25, 80),
+            "atr_pct": rng.uniform(0.8, 6),
+            "volatility": rng.uniform(0.15, 0.9),
+            "drawdown": -rng.uniform(0, 0.45),
+            "max_drawdown": -rng.uniform(0.2, 0.8),
+        }
+        rows.append((f"SYM{i:04d}", current, round(current * rng.gauss(1.08, 0.15), 2), technicals))
+    return rows
+
+
+def replay_universe() -> list[tuple]:
+    """The same rows for the recorded quotes of the replay fixture."""
+    from market_data import ReplayProvider
+
+    provider = ReplayProvider(latency_ms=0, jitter_ms=0, error_rate=0, rate_limit_rate=0)
+    rows = []
+    for ticker in sorted(provider.records):
+        info = provider.info(ticker)
+        current, target = info.get("currentPrice") or info.get("regularMarketPrice"), info.get("targetMeanPrice")
+        if current and target:
+            rows.append((ticker, current, target, bars_technicals(provider.history(ticker))))
+    return rows
+
+
+def run_always(pipeline: AnalysisPipeline, rows: list[tuple]) -> dict:
+    samples, usage = [], {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+    for ticker, current_price, target_price, technicals in rows:
+        start = time.perf_counter()
+        response, _, _ = pipeline.recommend(ticker, current_price, target_price, technicals)
+        samples.append(time.perf_counter() - start)
+        usage["calls"] += 1
+        usage["input_tokens"] += response.usage.input_tokens
+        usage["output_tokens"] += response.usage.output_tokens
+    return dict(usage, latency=samples)
+
+
+def run_routed(router: RecommendationRouter, rows: list[tuple]) -> dict:
+    samples, usage = [], {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+    for ticker, current_price, target_price, technicals in rows:
+        start = time.perf_counter()
+        result = router.recommend(ticker, current_price, target_price, technicals)
+        samples.append(time.perf_counter() - start)
+        if result["response"] is not None:
+            usage["calls"] += 1
+            usage["input_tokens"] += result["response"].usage.input_tokens
+            usage["output_tokens"] += result["response"].usage.output_tokens
+    return dict(usage, latency=samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--universe", choices=("synthetic", "replay"), default="synthetic")
+    parser.add_argument("--requests", type=int, default=60, help="Symbols in the synthetic universe")
+    parser.add_argument("--min-confidence", type=float, default=0.5,
+                        help="Rule confidence at or above which Claude is not asked")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Stub latency per request")
+    parser.add_argument("--output-token-ms", type=float, default=10.0, help="Stub generation time per output token")
+    args = parser.parse_args(argv)
+
+    from anthropic import Anthropic
+    from anthropic_stub_server import start_stub_server
+
+    server = start_stub_server(latency_ms=args.latency_ms, output_token_ms=args.output_token_ms)
+    client = Anthropic(api_key="stub", base_url=server.url)
+    pipeline = AnalysisPipeline(client, service=RecommendationService(client, result_ttl=0))
+    rows = sample_universe(args.requests) if args.universe == "synthetic" else replay_universe()
+    pipeline.recommend(*rows[0])   # warm-up: connection
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = os.path.join(tmp, "routing.jsonl")
+        router = RecommendationRouter(pipeline, min_confidence=args.min_confidence, log_file=log_file)
+        always = run_always(pipeline, rows)
+        routed = run_routed(router, rows)
+        router.close()
+        server.shutdown()
+        log = summarize_log(log_file)
+
+    llm_p50 = percentile(always["latency"], 50)
+    scale = 1000 / len(rows)
+    print("=" * 88)
+    print(f"TIERED ROUTING: {len(rows)} {args.universe} requests one after another, "
+          f"min confidence {args.min_confidence:g}, stub {args.latency_ms:.0f} ms + {args.output_token_ms:g} ms/token")
+    print("=" * 88)
+    print(f"{'path':<16}{'Claude calls/1k':>16}{'output tok/1k':>15}{'$/1k':>9}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'total s':>10}")
+    for name, run in (("always Claude", always), ("routed", routed)):
+        print(f"{name:<16}{run['calls'] * scale:>16.0f}{run['output_tokens'] * scale:>15.0f}"
+              f"{estimate_cost(RECOMMENDATION_MODEL, run['input_tokens'], run['output_tokens']) * scale:>9.3f}"
+              f"{1000 * percentile(run['latency'], 50):>10.1f}{1000 * percentile(run['latency'], 95):>10.1f}"
+              f"{sum(run['latency']):>10.2f}")
+    print("-" * 88)
+    saved = sum(always["latency"]) - sum(routed["latency"])
+    print(f"escalation rate: {log['escalation_rate']:.0%} ({log['escalated']}/{log['decisions']}); "
+          f"latency saved: {saved:.1f} s ({saved / sum(always['latency']):.0%}, "
+          f"{1000 * saved / len(rows):.0f} ms per request)")
+    print(f"routed latency p50: rules {log['rules_p50_ms'] or 0:.2f} ms, "
+          f"Claude {log['llm_p50_ms'] or 0:.0f} ms")
+    print("decisions per band: " + ", ".join(f"{band} {count}" for band, count in sorted(log["bands"].items())))
+    if log["agreement"] is not None:
+        print(f"escalated cases where Claude gave the rules' verdict: {log['agreement']:.0%}")
+    print("-" * 88)
+    print(f"{'min confidence':<16}{'escalated':>12}{'est. latency saved per request':>34}")
+    for threshold in THRESHOLDS:
+        router.min_confidence = threshold
+        escalated = sum(router.route(*row)["route"] == "llm" for row in rows) / len(rows)
+        print(f"{threshold:<16g}{escalated:>12.0%}{1000 * (1 - escalated) * llm_p50:>31.0f} ms")
+    print("=" * 88)
+
+
+if __name__ == "__main__":
+    main()
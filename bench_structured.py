@@ -0,0 +1,119 @@
+"""Benchmark: structured verdict (tool call) against the streamed prose recommendation.
+
+Per analysis the app used to stream the whole prose answer (up to 500 output
+tokens) to show a BUY/HOLD/SELL badge. With ``STRUCTURED_RECOMMENDATIONS``
+it asks for ``{verdict, confidence, short_rationale}`` through the
+``record_verdict`` tool (``VERDICT_MAX_TOKENS``) and fetches the prose only
+when the user opens it or asks for the PDF.
+
+Both paths go through ``RecommendationService`` (no result caching) against
+the local stub server, which charges ``--latency-ms`` per request plus
+``--output-token-ms`` per generated token and pads the prose answers to
+``--prose-tokens``. The stub's input tokens include the tool schema, but not
+the tool-use system prompt the real API adds.
+
+Reported per analysis: output and input tokens, time to the verdict and to
+the complete answer (p50/p95), and the cost per 1,000 analyses; the
+structured path also with the prose fetched for ``--open-rate`` of the
+analyses.
+
+Usage:
+    python bench_structured.py [--requests 20] [--output-token-ms 10] [--open-rate 0.2]
+"""
+import argparse
+import time
+
+from bench_packed import synthetic_rows
+from llm_metering import estimate_cost
+from percentiles import percentile
+from recommendation_service import RECOMMENDATION_MODEL, RecommendationService
+
+
+def run_prose(service: RecommendationService, rows: list[tuple]) -> dict:
+    samples = []
+    for ticker, current_price, target_price, technicals in rows:
+        response, _, timings = service.stream(ticker, current_price, target_price, technicals=technicals)
+        samples.append({"verdict_s": timings["ttv_s"], "total_s": timings["total_s"],
+                        "input_tokens": response.usage.input_tokens, "output_tokens": response.usage.output_tokens})
+    return summarize(samples)
+
+
+def run_structured(service: RecommendationService, rows: list[tuple]) -> dict:
+    samples = []
+    for ticker, current_price, target_price, technicals in rows:
+        start = time.perf_counter()
+        _, response, _ = service.verdict(ticker, current_price, target_price, technicals=technicals)
+        elapsed = time.perf_counter() - start
+        samples.append({"verdict_s": elapsed, "total_s": elapsed, "input_tokens": response.usage.input_tokens,
+                        "output_tokens": response.usage.output_tokens})
+    return summarize(samples)
+
+
+def summarize(samples: list[dict]) -> dict:
+    count = len(samples)
+    input_tokens = sum(s["input_tokens"] for s in samples) / count
+    output_tokens = sum(s["output_tokens"] for s in samples) / count
+    verdict = [s["verdict_s"] for s in samples]
+    total = [s["total_s"] for s in samples]
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "verdict_p50_ms": 1000 * percentile(verdict, 50),
+        "verdict_p95_ms": 1000 * percentile(verdict, 95),
+        "total_p50_ms": 1000 * percentile(total, 50),
+        "total_p95_ms": 1000 * percentile(total, 95),
+        "cost_per_1k_usd": 1000 * estimate_cost(RECOMMENDATION_MODEL, input_tokens, output_tokens),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20, help="Analyses per path (run one after another)")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Stub latency per request")
+    parser.add_argument("--output-token-ms", type=float, default=10.0, help="Stub generation time per output token")
+    parser.add_argument("--prose-tokens", type=int, default=350, help="Length of the stub's prose answers")
+    parser.add_argument("--open-rate", type=float, default=0.2,
+                        help="Share of analyses whose prose rationale is opened (or exported to PDF)")
+    args = parser.parse_args(argv)
+
+    from anthropic import Anthropic
+    from anthropic_stub_server import start_stub_server
+
+    server = start_stub_server(latency_ms=args.latency_ms, output_token_ms=args.output_token_ms,
+                               prose_tokens=args.prose_tokens)
+    client = Anthropic(api_key="stub", base_url=server.url)
+    service = RecommendationService(client, result_ttl=0)
+    rows = synthetic_rows(args.requests)
+    service.verdict(*rows[0][:3])   # warm-up: connection
+
+    prose = run_prose(service, rows)
+    structured = run_structured(service, rows)
+    server.shutdown()
+
+    rate = args.open_rate
+    lazy = {
+        "input_tokens": structured["input_tokens"] + rate * prose["input_tokens"],
+        "output_tokens": structured["output_tokens"] + rate * prose["output_tokens"],
+        "cost_per_1k_usd": structured["cost_per_1k_usd"] + rate * prose["cost_per_1k_usd"],
+    }
+    print("=" * 96)
+    print(f"STRUCTURED VERDICT vs PROSE: {len(rows)} analyses per path, model {RECOMMENDATION_MODEL}, "
+          f"stub {args.latency_ms:.0f} ms + {args.output_token_ms:g} ms/token")
+    print("=" * 96)
+    print(f"{'per analysis':<28}{'output tok':>11}{'input tok':>11}{'verdict p50/p95 ms':>22}"
+          f"{'total p50/p95 ms':>20}{'$/1k':>9}")
+    for name, run in (("prose (streamed, today)", prose), ("structured verdict", structured)):
+        print(f"{name:<28}{run['output_tokens']:>11.0f}{run['input_tokens']:>11.0f}"
+              f"{run['verdict_p50_ms']:>13.0f} / {run['verdict_p95_ms']:<6.0f}"
+              f"{run['total_p50_ms']:>11.0f} / {run['total_p95_ms']:<6.0f}{run['cost_per_1k_usd']:>9.3f}")
+    print(f"{f'structured + {rate:.0%} opened':<28}{lazy['output_tokens']:>11.0f}{lazy['input_tokens']:>11.0f}"
+          f"{'':>42}{lazy['cost_per_1k_usd']:>9.3f}")
+    print("-" * 96)
+    print(f"output tokens per analysis: {prose['output_tokens'] / structured['output_tokens']:.1f}x fewer "
+          f"({prose['output_tokens'] / lazy['output_tokens']:.1f}x with {rate:.0%} opened); "
+          f"complete answer p50 {prose['total_p50_ms'] / structured['total_p50_ms']:.1f}x faster")
+    print("=" * 96)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark: company-name resolution through the local symbol index.
+
+Replays a sample of realistic user inputs (names, lowercase, aliases, typos,
+unknown companies) and reports the index hit rate, how often the LLM
+fallback was needed, and p50/p99 resolution latency. The LLM is simulated by
+a stub that sleeps ``--llm-ms`` and answers from a small table, so the run
+is offline and free.
+
+Usage:
+    python bench_symbol_index.py [--rounds 20] [--llm-ms 400]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from symbol_index import SymbolIndex
+
+SAMPLE_QUERIES = [
+    "Microsoft", "NVIDIA Corporation", "Apple", "Tesla", "Amazon", "Google", "Alphabet Inc.",
+    "Meta Platforms", "facebook", "JPMorgan Chase", "jp morgan", "Visa", "Johnson & Johnson",
+    "Walmart", "Exxon Mobil", "Coca-Cola", "coke", "Pepsi", "Procter & Gamble", "Home Depot",
+    "Netflix", "Disney", "Intel", "Advanced Micro Devices", "Boeing", "Pfizer", "Nike",
+    "Oracle", "Salesforce", "Costco", "Berkshire Hathaway", "Goldman Sachs", "Starbucks",
+    "McDonald's", "AT&T", "Verizon", "Ford", "General Motors", "Toyota", "Uber", "Airbnb",
+    "nvid", "berksh", "palanti", "crowdstr",
+    "microsofft", "nvidiaa", "gogle", "facebok", "amazn", "starbuks", "netflx",
+    "Nestle", "LVMH", "Siemens", "Samsung Electronics",
+]
+
+STUB_LLM_ANSWERS = {"Nestle": "NSRGY", "LVMH": "LVMUY", "Siemens": "SIEGY", "Samsung Electronics": "SSNLF"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20, help="Times the sample is replayed")
+    parser.add_argument("--llm-ms", type=float, default=400.0, help="Simulated LLM lookup latency")
+    args = parser.parse_args(argv)
+
+    llm_calls = []
+
+    def stub_llm(query):
+        llm_calls.append(query)
+        time.sleep(args.llm_ms / 1000)
+        return STUB_LLM_ANSWERS.get(query, "UNKNOWN")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_start = time.perf_counter()
+        index = SymbolIndex(learned_path=os.path.join(tmp, "learned.csv"))
+        build_ms = (time.perf_counter() - build_start) * 1000
+
+        first_round_fallbacks = None
+        for round_no in range(args.rounds):
+            for query in SAMPLE_QUERIES:
+                index.resolve(query, stub_llm)
+            if round_no == 0:
+                first_round_fallbacks = len(llm_calls)
+
+    stats = index.stats()
+    total = stats["lookups"]
+    print("=" * 70)
+    print("SYMBOL INDEX BENCHMARK")
+    print("=" * 70)
+    print(f"Index build:          {build_ms:.1f} ms for {len(index)} symbols")
+    print(f"Lookups:              {total} ({len(SAMPLE_QUERIES)} queries x {args.rounds} rounds)")
+    print(f"Index hits:           {stats['index_hits']}")
+    print(f"Hit rate:             {stats['hit_rate']:.1%}")
+    print(f"LLM fallbacks:        {stats['llm_fallbacks']} "
+          f"({first_round_fallbacks} in the first round; later rounds ask again only for names "
+          f"the LLM could not resolve)")
+    print(f"Latency p50 / p99:    {stats['p50_ms']:.3f} ms / {stats['p99_ms']:.3f} ms")
+    print(f"LLM-only baseline:    {total} calls, ~{total * args.llm_ms / 1000:.1f} s of lookup latency")
+    print("=" * 70)
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Batched Yahoo Finance quote provider.
+
+``get_stock_data`` costs one ``.info`` request per symbol plus a
+``history(period="1d")`` request whenever ``currentPrice`` is missing.
+``BulkQuoteProvider`` instead fetches prices for up to ``chunk_size`` symbols
+per ``yf.download`` request and only goes per-symbol where Yahoo leaves no
+choice:
+
+- ``targetMeanPrice`` lives in the per-symbol quoteSummary (``.info``), so
+  fundamentals are fetched per symbol, but only when the quote cache's
+  fundamentals entry (long TTL) is missing or stale;
+- symbols missing from a bulk response fall back to a single-symbol
+  history request.
+
+Results use the same ``{"ticker", "current_price", "target_price", "error"}``
+shape as ``main.get_stock_data``. By default the requests go to the
+``market_data`` provider (Yahoo through the shared ``rate_limiter``, or a
+replay); single endpoints can be injected instead.
+"""
+from market_data import MarketDataProvider, get_default_provider
+from quote_cache import QuoteCache, fetch_error_message, get_default_cache
+from rate_limiter import is_rate_limit
+
+CHUNK_SIZE = 100
+
+
+def _quote(ticker: str, current_price: float | None, info: dict | None) -> dict:
+    target_price = info.get("targetMeanPrice") if info else None
+    return {
+        "ticker": ticker,
+        "current_price": current_price,
+        "target_price": target_price,
+        "error": None if current_price is not None and target_price is not None
+        else "Price data unavailable or ticker not supported.",
+    }
+
+
+def _error(ticker: str, message: str) -> dict:
+    return {"ticker": ticker, "current_price": None, "target_price": None, "error": message}
+
+
+class BulkQuoteProvider:
+    """Fetch quotes for many tickers with as few Yahoo requests as possible.
+
+    The calls default to ``provider``'s (``market_data.get_default_provider()``)
+    and are individually injectable (``download_closes``, ``fetch_info``,
+    ``fetch_last_close``) so the provider can run against recorded fixtures.
+    ``requests`` counts the calls made through each of them.
+    """
+
+    def __init__(self, cache: QuoteCache | None = None, download_closes=None, fetch_info=None,
+                 fetch_last_close=None, chunk_size: int = CHUNK_SIZE, provider: MarketDataProvider | None = None):
+        self.cache = cache or get_default_cache()
+        self.chunk_size = chunk_size
+        provider = provider or get_default_provider()
+        self._download_closes = download_closes or provider.download_closes
+        self._fetch_info = fetch_info or provider.info
+        self._fetch_last_close = fetch_last_close or provider.last_close
+        self.requests = {"download": 0, "info": 0, "history": 0}
+
+    def get_quotes(self, tickers: list[str]) -> dict[str, dict]:
+        """Return ``{ticker: stock_data}`` for every requested ticker, in input order."""
+        tickers = list(dict.fromkeys(tickers))
+        results = {}
+        infos = {}
+        fetched_info = set()
+        need_price = []
+
+        # Serve what the cache can; note what is missing
+        need_info = []
+        for ticker in tickers:
+            entry = self.cache.get(ticker)
+            if entry and entry["info_fresh"]:
+                infos[ticker] = entry["info"]
+                if entry["price_fresh"]:
+                    self.cache.count("hits")
+                    results[ticker] = _quote(ticker, entry["current_price"], entry["info"])
+                else:
+                    need_price.append(ticker)
+            else:
+                need_info.append(ticker)
+
+        # Fundamentals (targetMeanPrice) only exist per symbol
+        for ticker in need_info:
+            self.cache.count("misses")
+            self.requests["info"] += 1
+            try:
+                info = self._fetch_info(ticker)
+            except Exception as e:
+                results[ticker] = _error(ticker, fetch_error_message(ticker, e))
+                continue
+            infos[ticker] = info
+            fetched_info.add(ticker)
+            current_price = info.get("currentPrice")
+            if current_price is None:
+                need_price.append(ticker)
+            else:
+                self.cache.put_info(ticker, info, current_price)
+                results[ticker] = _quote(ticker, current_price, info)
+
+        # Prices: one request per chunk of symbols
+        failed = []
+        for start in range(0, len(need_price), self.chunk_size):
+            chunk = need_price[start:start + self.chunk_size]
+            self.requests["download"] += 1
+            try:
+                closes = self._download_closes(chunk)
+            except Exception as e:
+                if is_rate_limit(e):
+                    # Falling back per symbol would only make the rate limit worse
+                    for ticker in chunk:
+                        results[ticker] = _error(ticker, fetch_error_message(ticker, e))
+                    continue
+                closes = {}
+            for ticker in chunk:
+                if ticker in closes:
+                    results[ticker] = self._store_price(ticker, closes[ticker], infos, fetched_info)
+                else:
+                    failed.append(ticker)
+
+        # Single-symbol fallback only for the symbols the bulk request missed
+        for ticker in failed:
+            self.requests["history"] += 1
+            try:
+                current_price = self._fetch_last_close(ticker)
+            except Exception as e:
+                results[ticker] = _error(ticker, fetch_error_message(ticker, e))
+                continue
+            results[ticker] = self._store_price(ticker, current_price, infos, fetched_info)
+
+        return {ticker: results[ticker] for ticker in tickers}
+
+    def _store_price(self, ticker: str, current_price: float | None, infos: dict, fetched_info: set) -> dict:
+        if ticker in fetched_info:
+            self.cache.put_info(ticker, infos[ticker], current_price)
+        elif current_price is not None:
+            self.cache.count("price_refreshes")
+            self.cache.put_price(ticker, current_price)
+        return _quote(ticker, current_price, infos.get(ticker))
+
+
+def get_stock_data_bulk(tickers: list[str], provider: BulkQuoteProvider | None = None) -> dict[str, dict]:
+    """Bulk counterpart of ``main.get_stock_data`` for a list of tickers."""
+    return (provider or BulkQuoteProvider()).get_quotes(tickers)
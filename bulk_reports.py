@@ -0,0 +1,245 @@
+"""Bulk PDF reports for batch results.
+
+Renders ``create_pdf_report`` for every successful record of a batch.py JSON
+lines file across a process pool (reportlab is CPU-bound Python and holds the
+GIL, so threads would not help) and streams each finished PDF into a ZIP
+archive or a directory as soon as it completes.
+
+Only a bounded number of reports is in flight at once and input records are
+read lazily, so memory stays flat however large the batch is.
+
+Usage:
+    python batch.py watchlist.txt -o results.jsonl
+    python bulk_reports.py results.jsonl -o reports.zip --workers 4
+    python bulk_reports.py results.jsonl -o reports/
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from quote_cache import get_default_cache
+
+# main.get_recommendation wraps the model's answer as
+# "[ts] Recommendation: <body>\n\n⚠️ Disclaimer: ..."; the PDF has its own disclaimer.
+RECOMMENDATION_PREFIX = "Recommendation: "
+DISCLAIMER_MARKER = "\n\n⚠️ Disclaimer:"
+
+
+# --- Input ---
+
+def recommendation_body(text: str) -> str:
+    """The model's answer without main.py's timestamp prefix and disclaimer."""
+    head, sep, body = text.partition(RECOMMENDATION_PREFIX)
+    if sep and head.startswith("["):
+        text = body
+    return text.split(DISCLAIMER_MARKER, 1)[0].strip()
+
+
+def verdict_from_text(text: str) -> str:
+    """BUY/SELL/HOLD, decided the same way app.py labels its answer."""
+    head = text.upper()[:50]
+    if "BUY" in head:
+        return "BUY"
+    if "SELL" in head:
+        return "SELL"
+    return "HOLD"
+
+
+def report_job(record: dict, cache=None) -> dict | None:
+    """``create_pdf_report`` arguments for one batch record, or None to skip it.
+
+    Batch records carry only prices and the recommendation; company name,
+    sector and the metrics come from the quote cache the batch run filled
+    (stale entries are fine here, nothing is fetched).
+    """
+    if record.get("error") or not record.get("recommendation"):
+        return None
+    ticker = record["ticker"]
+    current_price = record["current_price"]
+    target_price = record["target_price"]
+    if not current_price or target_price is None:
+        return None
+
+    info = record.get("info")
+    if info is None:
+        entry = (cache or get_default_cache()).get(ticker)
+        info = (entry or {}).get("info") or {}
+
+    text = recommendation_body(record["recommendation"])
+    return {
+        "ticker": ticker,
+        "company_name": info.get("longName") or ticker,
+        "sector": info.get("sector", "N/A"),
+        "industry": info.get("industry", "N/A"),
+        "current_price": current_price,
+        "target_price": target_price,
+        "recommendation": verdict_from_text(text),
+        "recommendation_text": text,
+        "ticker_info": info,
+        "price_diff_pct": (target_price - current_price) / current_price * 100,
+    }
+
+
+def read_jobs(path: str, cache=None):
+    """Yield report jobs from a JSON lines file, one line at a time."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            job = report_job(json.loads(line), cache)
+            if job is not None:
+                yield job
+
+
+# --- Output ---
+
+class ZipSink:
+    """Writes each PDF as a member of a ZIP archive as soon as it arrives."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def write(self, name: str, data: bytes):
+        self._zip.writestr(name, data)
+
+    def close(self):
+        self._zip.close()
+
+
+class DirectorySink:
+    """Writes each PDF as a file in a directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, name: str, data: bytes):
+        with open(os.path.join(self.path, name), "wb") as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+
+def open_sink(path: str):
+    return ZipSink(path) if path.lower().endswith(".zip") else DirectorySink(path)
+
+
+# --- Rendering ---
+
+def _render(job: dict) -> tuple[str, bytes]:
+    # Runs in a worker process; the module-level ReportBuilder is created on
+    # the first report and reused for the rest of that worker's share.
+    from pdf_generator import create_pdf_report
+
+    return job["ticker"], create_pdf_report(**job)
+
+
+def render_reports(jobs, sink, workers: int = 4, max_in_flight: int | None = None,
+                   progress=None) -> dict:
+    """Render all jobs on a process pool and write each PDF to ``sink`` on completion.
+
+    At most ``max_in_flight`` jobs (default ``2 * workers``) are submitted at
+    a time; the next one is read from ``jobs`` only when a report is done.
+    ``progress(done, ticker, elapsed)`` is called after every written report.
+    """
+    workers = max(1, workers)
+    max_in_flight = max(workers, max_in_flight or 2 * workers)
+    stamp = datetime.now().strftime("%Y%m%d")
+    used_names = {}
+    written = failed = total_bytes = 0
+    errors = []
+
+    jobs = iter(jobs)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                else:
+                    future = pool.submit(_render, job)
+                    future.ticker = job["ticker"]
+                    pending.add(future)
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    ticker, pdf = future.result()
+                except Exception as e:
+                    failed += 1
+                    errors.append({"ticker": future.ticker, "error": str(e)})
+                    continue
+                # A watchlist can list the same ticker twice; keep both reports
+                count = used_names.get(ticker, 0)
+                used_names[ticker] = count + 1
+                suffix = f"_{count + 1}" if count else ""
+                sink.write(f"{ticker}_AI_Stock_Analysis_{stamp}{suffix}.pdf", pdf)
+                written += 1
+                total_bytes += len(pdf)
+                if progress is not None:
+                    progress(written, ticker, time.perf_counter() - start)
+    wall_seconds = time.perf_counter() - start
+
+    return {
+        "reports": written,
+        "failed": failed,
+        "errors": errors,
+        "workers": workers,
+        "wall_seconds": round(wall_seconds, 3),
+        "reports_per_s": round(written / wall_seconds, 2) if wall_seconds > 0 else None,
+        "total_bytes": total_bytes,
+    }
+
+
+def print_progress(done: int, ticker: str, elapsed: float, file=sys.stderr):
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"\r📄 {done} reports written ({rate:.1f}/s) — last: {ticker:<8}", end="", file=file, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render PDF reports for batch.py results.")
+    parser.add_argument("results", help="JSON lines file written by batch.py")
+    parser.add_argument("-o", "--output", default="reports.zip",
+                        help="ZIP archive (*.zip) or directory to write the PDFs to (default: reports.zip)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Reports submitted but not yet written (default: 2 x workers)")
+    parser.add_argument("--quiet", action="store_true", help="No per-report progress line")
+    args = parser.parse_args(argv)
+
+    sink = open_sink(args.output)
+    try:
+        summary = render_reports(
+            read_jobs(args.results),
+            sink,
+            workers=args.workers,
+            max_in_flight=args.max_in_flight,
+            progress=None if args.quiet else print_progress,
+        )
+    finally:
+        sink.close()
+
+    if not args.quiet:
+        print(file=sys.stderr)
+    for error in summary["errors"]:
+        print(f"❌ {error['ticker']}: {error['error']}", file=sys.stderr)
+    print(f"✅ {summary['reports']} reports written to {args.output} in {summary['wall_seconds']:.2f}s "
+          f"({summary['reports_per_s']} reports/s, {summary['workers']} workers, "
+          f"{summary['total_bytes'] / 1024 / 1024:.1f} MB)", file=sys.stderr)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
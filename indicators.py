@@ -0,0 +1,343 @@
+"""Vectorized technical indicators for many tickers at once.
+
+All kernels take ``(tickers, bars)`` float arrays (1-D works too, as one
+ticker) and run along the last axis without per-bar Python loops:
+
+- SMA and rolling volatility from cumulative sums;
+- EMA and Wilder smoothing (RSI, ATR) in closed form, block by block: within
+  a block ``y[j] = d**(j+1) * (y_prev + a * cumsum(x[i] / d**(i+1)))``, with the
+  block length capped so ``d**-L`` stays far from overflow;
+- drawdown from ``np.maximum.accumulate``.
+
+``compute`` runs them over whole histories and returns an ``IndicatorState``
+that ``update`` moves forward one bar at a time in O(tickers), without
+recomputing the series. ``snapshot()`` is what feeds the recommendation prompt
+(``format_technicals``) and the rule engine.
+"""
+import math
+
+import numpy as np
+
+SMA_FAST = 50
+SMA_SLOW = 200
+EMA_SPAN = 20
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+VOLATILITY_WINDOW = 20
+TRADING_DAYS = 252
+# Bars needed for every indicator to be defined
+WARMUP_BARS = SMA_SLOW
+
+# exp(27.6) ~ 1e12: keeps the block weights well inside float64 precision
+_MAX_LOG_WEIGHT = 27.6
+
+
+# --- Kernels ---
+
+def sma(x: np.ndarray, n: int) -> np.ndarray:
+    """Simple moving average; the first ``n - 1`` bars are NaN."""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] < n:
+        return out
+    c = np.cumsum(x, axis=-1)
+    out[..., n - 1] = c[..., n - 1]
+    out[..., n:] = c[..., n:] - c[..., :-n]
+    out[..., n - 1:] /= n
+    return out
+
+
+def ewm(x: np.ndarray, alpha: float, init: np.ndarray | None = None) -> np.ndarray:
+    """``y[t] = (1 - alpha) * y[t-1] + alpha * x[t]``, seeded with ``init`` or ``x[..., 0]``.
+
+    Inputs are expected to be non-negative (prices, gains, true ranges), so
+    the weighted cumulative sums within a block never cancel.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = np.empty(x.shape)
+    if x.shape[-1] == 0:
+        return out
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        out[...] = x
+        return out
+
+    prev = np.array(x[..., 0] if init is None else init, dtype=np.float64)
+    block = max(1, int(_MAX_LOG_WEIGHT / -math.log(decay)))
+    steps = np.arange(1, min(block, x.shape[-1]) + 1, dtype=np.float64)
+    growth = decay ** -steps      # d**-(j+1)
+    shrink = decay ** steps       # d**(j+1)
+    for start in range(0, x.shape[-1], block):
+        chunk = x[..., start:start + block]
+        width = chunk.shape[-1]
+        acc = np.cumsum(chunk * (alpha * growth[:width]), axis=-1)
+        acc += prev[..., None]
+        acc *= shrink[:width]
+        out[..., start:start + width] = acc
+        prev = acc[..., -1]
+    return out
+
+
+def ema(x: np.ndarray, span: int) -> np.ndarray:
+    return ewm(x, 2.0 / (span + 1))
+
+
+def wilder(x: np.ndarray, period: int) -> np.ndarray:
+    """Wilder's smoothing (RMA), the average used by RSI and ATR."""
+    return ewm(x, 1.0 / period)
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    """Relative strength index (0-100); the first ``period`` bars are NaN."""
+    close = np.asarray(close, dtype=np.float64)
+    delta = np.diff(close, axis=-1)
+    avg_gain = wilder(np.maximum(delta, 0.0), period)
+    avg_loss = wilder(np.maximum(-delta, 0.0), period)
+    out = np.full(close.shape, np.nan)
+    out[..., 1:] = _rsi_from_averages(avg_gain, avg_loss)
+    out[..., :period] = np.nan
+    return out
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    # No losses at all: fully overbought (or flat, 50, when nothing moved)
+    value = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), value)
+    return value
+
+
+def true_range(high, low, close) -> np.ndarray:
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    tr = high - low
+    prev_close = close[..., :-1]
+    tr[..., 1:] = np.maximum(tr[..., 1:], np.maximum(np.abs(high[..., 1:] - prev_close),
+                                                     np.abs(low[..., 1:] - prev_close)))
+    return tr
+
+
+def atr(high, low, close, period: int = ATR_PERIOD) -> np.ndarray:
+    """Average true range; the first ``period - 1`` bars are NaN."""
+    out = wilder(true_range(high, low, close), period)
+    out[..., :period - 1] = np.nan
+    return out
+
+
+def volatility(close: np.ndarray, window: int = VOLATILITY_WINDOW, annualize: bool = True) -> np.ndarray:
+    """Rolling standard deviation of daily log returns (annualized by default)."""
+    close = np.asarray(close, dtype=np.float64)
+    returns = np.diff(np.log(close), axis=-1)
+    out = np.full(close.shape, np.nan)
+    if returns.shape[-1] < window:
+        return out
+    s1 = np.cumsum(returns, axis=-1)
+    s2 = np.cumsum(returns * returns, axis=-1)
+    sum1 = s1[..., window - 1:].copy()
+    sum2 = s2[..., window - 1:].copy()
+    sum1[..., 1:] -= s1[..., :-window]
+    sum2[..., 1:] -= s2[..., :-window]
+    var = np.maximum(sum2 - sum1 * sum1 / window, 0.0) / (window - 1)
+    out[..., window:] = np.sqrt(var)
+    if annualize:
+        out *= math.sqrt(TRADING_DAYS)
+    return out
+
+
+def drawdown(close: np.ndarray) -> np.ndarray:
+    """Fraction below the running peak (0 at a new high, -0.25 = 25% below)."""
+    close = np.asarray(close, dtype=np.float64)
+    return close / np.maximum.accumulate(close, axis=-1) - 1.0
+
+
+# --- Universe state ---
+
+def _backfill_leading(x: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Fill each row's leading NaNs with its first value; returns (filled, valid bar counts).
+
+    Rows are right-aligned histories of different lengths; padding with a
+    flat price keeps the kernels NaN-free, and ``counts`` says which
+    indicators have enough real bars behind them.
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    finite = np.isfinite(x)
+    counts = finite.sum(axis=-1)
+    first = np.argmax(finite, axis=-1)
+    if not (counts < x.shape[-1]).any():
+        return x, counts
+    rows = np.arange(x.shape[0])
+    seed = np.where(counts > 0, x[rows, np.minimum(first, x.shape[-1] - 1)], np.nan)
+    filled = np.where(np.arange(x.shape[-1]) < first[:, None], seed[:, None], x)
+    return filled, counts
+
+
+class IndicatorState:
+    """Latest indicator values plus what ``update`` needs to advance them one bar.
+
+    Rows are tickers. ``count`` is the number of real bars seen per ticker;
+    ``snapshot`` reports NaN for an indicator until its window is filled.
+    """
+
+    __slots__ = ("tickers", "count", "close", "closes", "close_pos", "sum_fast", "sum_slow",
+                 "ema", "avg_gain", "avg_loss", "atr", "returns", "returns_pos", "peak", "max_drawdown")
+
+    def update(self, high, low, close):
+        """Advance by one bar; rows whose ``close`` is NaN (no new bar) are left as they are."""
+        high = np.asarray(high, dtype=np.float64)
+        low = np.asarray(low, dtype=np.float64)
+        close = np.asarray(close, dtype=np.float64)
+        rows = np.flatnonzero(np.isfinite(close))
+        if not rows.size:
+            return
+        h, l, c = high[rows], low[rows], close[rows]
+        prev = self.close[rows]
+
+        # SMA ring buffer of the last SMA_SLOW closes; close_pos points at the oldest
+        pos = self.close_pos[rows]
+        leaving_slow = self.closes[rows, pos]
+        leaving_fast = self.closes[rows, (pos + SMA_SLOW - SMA_FAST) % SMA_SLOW]
+        self.sum_slow[rows] += c - leaving_slow
+        self.sum_fast[rows] += c - leaving_fast
+        self.closes[rows, pos] = c
+        self.close_pos[rows] = (pos + 1) % SMA_SLOW
+
+        alpha = 2.0 / (EMA_SPAN + 1)
+        self.ema[rows] += alpha * (c - self.ema[rows])
+
+        delta = c - prev
+        self.avg_gain[rows] += (np.maximum(delta, 0.0) - self.avg_gain[rows]) / RSI_PERIOD
+        self.avg_loss[rows] += (np.maximum(-delta, 0.0) - self.avg_loss[rows]) / RSI_PERIOD
+
+        tr = np.maximum(h - l, np.maximum(np.abs(h - prev), np.abs(l - prev)))
+        self.atr[rows] += (tr - self.atr[rows]) / ATR_PERIOD
+
+        rpos = self.returns_pos[rows]
+        self.returns[rows, rpos] = np.log(c / prev)
+        self.returns_pos[rows] = (rpos + 1) % VOLATILITY_WINDOW
+
+        self.peak[rows] = np.maximum(self.peak[rows], c)
+        self.max_drawdown[rows] = np.minimum(self.max_drawdown[rows], c / self.peak[rows] - 1.0)
+
+        self.close[rows] = c
+        self.count[rows] += 1
+
+    def snapshot(self) -> dict:
+        """Latest values per ticker as arrays (NaN where a window is not yet filled)."""
+        count = self.count
+
+        def ready(values, bars):
+            return np.where(count >= bars, values, np.nan)
+
+        vol = self.returns.std(axis=-1, ddof=1) * math.sqrt(TRADING_DAYS)
+        atr_now = ready(self.atr, ATR_PERIOD)
+        return {
+            "close": self.close.copy(),
+            "sma_fast": ready(self.sum_fast / SMA_FAST, SMA_FAST),
+            "sma_slow": ready(self.sum_slow / SMA_SLOW, SMA_SLOW),
+            "ema": ready(self.ema, EMA_SPAN),
+            "rsi": ready(_rsi_from_averages(self.avg_gain, self.avg_loss), RSI_PERIOD + 1),
+            "atr": atr_now,
+            "atr_pct": atr_now / self.close * 100,
+            "volatility": ready(vol, VOLATILITY_WINDOW + 1),
+            "drawdown": self.close / self.peak - 1.0,
+            "max_drawdown": self.max_drawdown.copy(),
+            "bars": count.copy(),
+        }
+
+    def row(self, i: int) -> dict:
+        """``snapshot`` for one ticker as plain floats."""
+        return {name: (int(values[i]) if name == "bars" else float(values[i]))
+                for name, values in self.snapshot().items()}
+
+
+def compute(high, low, close, tickers=None) -> IndicatorState:
+    """Run every indicator over full histories and return the state at the last bar.
+
+    ``high``/``low``/``close`` are ``(tickers, bars)`` arrays, right-aligned;
+    shorter histories are padded with leading NaN. Each ticker needs at
+    least ``VOLATILITY_WINDOW + 1`` columns.
+    """
+    close, counts = _backfill_leading(close)
+    high, _ = _backfill_leading(high)
+    low, _ = _backfill_leading(low)
+    n_tickers, n_bars = close.shape
+    if n_bars < VOLATILITY_WINDOW + 1:
+        raise ValueError(f"need at least {VOLATILITY_WINDOW + 1} bars, got {n_bars}")
+
+    state = IndicatorState()
+    state.tickers = list(tickers) if tickers is not None else None
+    state.count = counts.astype(np.int64)
+    state.close = close[:, -1].copy()
+
+    # Ring buffer of the last SMA_SLOW closes, oldest first (flat-padded if shorter)
+    if n_bars >= SMA_SLOW:
+        state.closes = close[:, -SMA_SLOW:].copy()
+    else:
+        state.closes = np.concatenate([np.repeat(close[:, :1], SMA_SLOW - n_bars, axis=1), close], axis=1)
+    state.close_pos = np.zeros(n_tickers, dtype=np.int64)
+    state.sum_slow = state.closes.sum(axis=1)
+    state.sum_fast = state.closes[:, -SMA_FAST:].sum(axis=1)
+
+    state.ema = ema(close, EMA_SPAN)[:, -1]
+
+    delta = np.diff(close, axis=-1)
+    state.avg_gain = wilder(np.maximum(delta, 0.0), RSI_PERIOD)[:, -1]
+    state.avg_loss = wilder(np.maximum(-delta, 0.0), RSI_PERIOD)[:, -1]
+    state.atr = wilder(true_range(high, low, close), ATR_PERIOD)[:, -1]
+
+    state.returns = np.diff(np.log(close[:, -(VOLATILITY_WINDOW + 1):]), axis=-1)
+    state.returns_pos = np.zeros(n_tickers, dtype=np.int64)
+
+    state.peak = np.max(close, axis=1)
+    state.max_drawdown = np.min(drawdown(close), axis=1)
+    return state
+
+
+# --- Single ticker helpers ---
+
+def ticker_technicals(ticker: str, store=None, lookback_days: int = 400) -> dict | None:
+    """Latest indicators for one ticker from the price history store, or None if unavailable.
+
+    ``lookback_days`` calendar days (~275 bars) cover the SMA_SLOW warmup;
+    drawdowns are measured over that same window.
+    """
+    from datetime import datetime, timedelta
+
+    from price_history import get_default_store
+
+    try:
+        bars = (store or get_default_store()).history(ticker, start=datetime.now() - timedelta(days=lookback_days))
+    except Exception:
+        return None
+    return bars_technicals(bars)
+
+
+def bars_technicals(bars) -> dict | None:
+    """Latest indicators for a ``price_history.PriceBars``, or None if there are too few bars."""
+    if len(bars) < VOLATILITY_WINDOW + 1:
+        return None
+    return compute(bars.high[None, :], bars.low[None, :], bars.close[None, :], [bars.ticker]).row(0)
+
+
+def format_technicals(tech: dict | None) -> str:
+    """One compact, rounded line for the LLM prompt ('' when nothing is known).
+
+    Values are rounded coarsely so the prompt (and its cache key) does not
+    change with every tick.
+    """
+    if not tech:
+        return ""
+    parts = []
+    if math.isfinite(tech["sma_fast"]):
+        parts.append(f"SMA{SMA_FAST}={tech['sma_fast']:.0f}")
+    if math.isfinite(tech["sma_slow"]):
+        parts.append(f"SMA{SMA_SLOW}={tech['sma_slow']:.0f}")
+    if math.isfinite(tech["rsi"]):
+        parts.append(f"RSI{RSI_PERIOD}={tech['rsi']:.0f}")
+    if math.isfinite(tech["atr_pct"]):
+        parts.append(f"ATR{ATR_PERIOD}={tech['atr_pct']:.1f}% of price")
+    if math.isfinite(tech["volatility"]):
+        parts.append(f"volatility={tech['volatility'] * 100:.0f}% annualized")
+    parts.append(f"drawdown={tech['drawdown'] * 100:.0f}% (max {tech['max_drawdown'] * 100:.0f}%)")
+    return "Technicals: " + ", ".join(parts) + "."
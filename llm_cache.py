@@ -0,0 +1,209 @@
+"""Deterministic LLM response cache keyed by prompt hash.
+
+The key is a SHA-256 of the canonical JSON of everything that determines the
+answer (model, system prompt, messages, max_tokens), so an identical request
+is answered from the cache instead of paying for the same tokens again.
+Prices should be passed through ``quantize_price`` before being put into the
+prompt, so that a $0.01 tick does not produce a new key.
+
+Backends are pluggable: ``MemoryBackend`` (per process) and ``SQLiteBackend``
+(a file shared by processes and runs). Both support TTL and LRU eviction.
+SQLite hits stay reads, as in ``quote_cache``: the LRU timestamp is refreshed
+only once it is ``LLM_CACHE_TOUCH_INTERVAL`` old, and expired entries are
+misses left for eviction, which runs with each insert on an index.
+"""
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = float(os.environ.get("LLM_CACHE_TTL", 3600))               # seconds
+DEFAULT_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 10000))
+DEFAULT_BACKEND = os.environ.get("LLM_CACHE_BACKEND", "sqlite")           # "sqlite" | "memory"
+DEFAULT_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join(".cache", "llm_responses.sqlite3"))
+# Relative width of a price bucket: 0.005 = prices within ~0.5% share a key (0 disables)
+PRICE_BUCKET = float(os.environ.get("LLM_CACHE_PRICE_BUCKET", 0.005))
+# A hit refreshes an entry's LRU timestamp only when it is older than this, so hits take no write lock
+TOUCH_INTERVAL = float(os.environ.get("LLM_CACHE_TOUCH_INTERVAL", 60))    # seconds
+
+
+def quantize_price(price: float, bucket: float = PRICE_BUCKET) -> float:
+    """Snap a price onto a log-spaced grid of relative width ``bucket``.
+
+    The grid is relative so the same setting works for a $3 and a $3,000
+    stock; the result is rounded to cents for the prompt.
+    """
+    if not bucket or price is None or price <= 0:
+        return price
+    step = math.log1p(bucket)
+    return round(math.exp(round(math.log(price) / step) * step), 2)
+
+
+def prompt_key(model: str, system: str | None, messages: list, max_tokens: int, **extra) -> str:
+    """``extra`` (``tools``, ``tool_choice``) only enters the key when given, so plain keys stay stable."""
+    canonical = json.dumps(
+        {"model": model, "system": system, "messages": messages, "max_tokens": max_tokens,
+         **{name: value for name, value in extra.items() if value is not None}},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# --- Backends ---
+
+class MemoryBackend:
+    """In-process LRU dict with per-entry expiry."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, value: dict, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteBackend:
+    """SQLite file shared by processes; LRU by last access time (to within ``touch_interval``)."""
+
+    def __init__(self, path: str = DEFAULT_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 touch_interval: float = TOUCH_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> dict | None:
+        """An expired entry is a miss; it is left to be replaced by ``set`` or evicted as least recently used."""
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        if now - row[2] >= self.touch_interval:
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict, ttl: float):
+        """Write the entry and evict in the same transaction, so the file never grows past ``max_entries``."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+# --- Cache ---
+
+class LLMResponseCache:
+    """Content-addressed cache of ``{"text", "input_tokens", "output_tokens"}`` records
+    (plus ``"tool_use": {"name", "input"}`` for tool call answers)."""
+
+    def __init__(self, backend=None, ttl: float = DEFAULT_TTL):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_input_tokens = 0
+        self.saved_output_tokens = 0
+
+    def get(self, model: str, system: str | None, messages: list, max_tokens: int, tools: list | None = None,
+            tool_choice: dict | None = None) -> dict | None:
+        record = self.backend.get(prompt_key(model, system, messages, max_tokens, tools=tools,
+                                            tool_choice=tool_choice))
+        with self._lock:
+            if record is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.saved_input_tokens += record["input_tokens"]
+                self.saved_output_tokens += record["output_tokens"]
+        return record
+
+    def put(self, model: str, system: str | None, messages: list, max_tokens: int, response,
+            tools: list | None = None, tool_choice: dict | None = None) -> dict:
+        """Store an SDK/AnthropicClient response and return its cache record."""
+        block = response.content[0]
+        record = {
+            "text": getattr(block, "text", ""),
+            "input_tokens": response.usage.input_tokens,
+            "output_tokens": response.usage.output_tokens,
+        }
+        if getattr(block, "type", None) == "tool_use":
+            record["tool_use"] = {"name": block.name, "input": block.input}
+        self.backend.set(prompt_key(model, system, messages, max_tokens, tools=tools, tool_choice=tool_choice),
+                         record, self.ttl)
+        return record
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "saved_input_tokens": self.saved_input_tokens,
+                "saved_output_tokens": self.saved_output_tokens,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_response_cache() -> LLMResponseCache:
+    """Process-wide cache using the backend selected by ``LLM_CACHE_BACKEND``."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            backend = SQLiteBackend() if DEFAULT_BACKEND == "sqlite" else MemoryBackend()
+            _default_cache = LLMResponseCache(backend)
+        return _default_cache
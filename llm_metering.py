@@ -0,0 +1,427 @@
+"""Token, latency and cost metering for every Claude call, with per-minute budgets.
+
+Wrap a client once (``MeteredClient(Anthropic(...))`` or
+``MeteredClient(AnthropicClient(...))``) and every ``messages.create`` /
+``messages.stream`` call through it is recorded by the process-wide
+``LLMMeter``: model, input/output tokens, latency and estimated cost, kept as
+per-minute aggregates for the last ``LLM_METER_MINUTES`` minutes.
+
+Budgets: with ``LLM_INPUT_TPM`` / ``LLM_OUTPUT_TPM`` set, a call first
+reserves its estimated tokens (prompt size / 4, and ``max_tokens`` for the
+output) in a sliding 60 s window. When the window is full the call queues
+until enough tokens age out (``LLM_BUDGET_MODE=queue``, at most
+``LLM_BUDGET_MAX_WAIT`` seconds) or fails at once with
+``TokenBudgetExceeded`` (``shed``), instead of running into 429s. The
+reservation is corrected to the real usage when the answer arrives.
+
+Export: ``LLM_METRICS_FILE`` is rewritten at most every
+``LLM_METRICS_INTERVAL`` seconds and at exit, in Prometheus text format
+(for the node_exporter textfile collector) or, for a ``.json`` path, as the
+per-minute aggregates.
+
+Usage:
+    python llm_metering.py .cache/llm_metrics.json   # capacity summary of an export
+"""
+import argparse
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from percentiles import percentile
+
+DEFAULT_INPUT_TPM = int(os.environ.get("LLM_INPUT_TPM", 0))          # 0 = unlimited
+DEFAULT_OUTPUT_TPM = int(os.environ.get("LLM_OUTPUT_TPM", 0))        # 0 = unlimited
+DEFAULT_BUDGET_MODE = os.environ.get("LLM_BUDGET_MODE", "queue")     # "queue" | "shed"
+DEFAULT_MAX_WAIT = float(os.environ.get("LLM_BUDGET_MAX_WAIT", 30))  # seconds
+DEFAULT_MINUTES = int(os.environ.get("LLM_METER_MINUTES", 60))
+DEFAULT_METRICS_FILE = os.environ.get("LLM_METRICS_FILE", "")
+DEFAULT_METRICS_INTERVAL = float(os.environ.get("LLM_METRICS_INTERVAL", 10))
+
+WINDOW_S = 60.0
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, math.inf)
+
+# USD per million (input, output) tokens; the first matching model prefix wins
+PRICING = {
+    "claude-3-5-haiku": (0.80, 4.00),
+    "claude-3-haiku": (0.25, 1.25),
+    "claude-haiku-4": (1.00, 5.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-7-sonnet": (3.00, 15.00),
+    "claude-sonnet-4": (3.00, 15.00),
+    "claude-3-opus": (15.00, 75.00),
+    "claude-opus-4": (15.00, 75.00),
+}
+
+
+class TokenBudgetExceeded(RuntimeError):
+    """The call would exceed the token-per-minute budget (shed, or queued too long)."""
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    for prefix, (input_price, output_price) in PRICING.items():
+        if model and model.startswith(prefix):
+            return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    return 0.0
+
+
+def estimate_input_tokens(system, messages) -> int:
+    """Rough prompt size (4 characters per token), for reserving budget up front."""
+    return max(1, len(json.dumps(system, ensure_ascii=False) + json.dumps(messages, ensure_ascii=False)) // 4)
+
+
+class _Aggregate:
+    __slots__ = ("requests", "errors", "input_tokens", "output_tokens", "latency_sum", "latency_max", "cost_usd")
+
+    def __init__(self):
+        self.requests = self.errors = self.input_tokens = self.output_tokens = 0
+        self.latency_sum = self.latency_max = self.cost_usd = 0.0
+
+    def add(self, ok: bool, input_tokens: int, output_tokens: int, latency_s: float, cost: float):
+        self.requests += 1
+        self.errors += 0 if ok else 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.latency_sum += latency_s
+        self.latency_max = max(self.latency_max, latency_s)
+        self.cost_usd += cost
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class LLMMeter:
+    """Records LLM calls and enforces the token-per-minute budgets (0 = unlimited)."""
+
+    def __init__(self, input_tpm: int = DEFAULT_INPUT_TPM, output_tpm: int = DEFAULT_OUTPUT_TPM,
+                 mode: str = DEFAULT_BUDGET_MODE, max_wait: float = DEFAULT_MAX_WAIT,
+                 minutes: int = DEFAULT_MINUTES, metrics_file: str = DEFAULT_METRICS_FILE,
+                 metrics_interval: float = DEFAULT_METRICS_INTERVAL):
+        if mode not in ("queue", "shed"):
+            raise ValueError(f"Unknown budget mode: {mode!r}")
+        self.input_tpm = input_tpm
+        self.output_tpm = output_tpm
+        self.mode = mode
+        self.max_wait = max_wait
+        self.minutes = minutes
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self._cond = threading.Condition()
+        self._window = deque()          # [timestamp, input_tokens, output_tokens] per call, oldest first
+        self._waiters = deque()         # FIFO of queued tickets
+        self._minutes = OrderedDict()   # minute start (epoch s) -> {model: _Aggregate}
+        self._totals = {}               # model -> _Aggregate, since start
+        self._latency_counts = {}       # model -> cumulative count per LATENCY_BUCKETS entry
+        self.budget_waits = 0
+        self.budget_wait_s = 0.0
+        self.budget_shed = 0
+        self._written_at = 0.0
+
+    # --- Budget ---
+
+    def _prune(self, now: float):
+        while self._window and self._window[0][0] <= now - WINDOW_S:
+            self._window.popleft()
+
+    def _used(self) -> tuple[int, int]:
+        return sum(entry[1] for entry in self._window), sum(entry[2] for entry in self._window)
+
+    def _fits(self, input_tokens: int, output_tokens: int) -> bool:
+        if not self._window:
+            return True   # a single call bigger than the budget still runs, alone
+        used_in, used_out = self._used()
+        return ((not self.input_tpm or used_in + input_tokens <= self.input_tpm) and
+                (not self.output_tpm or used_out + output_tokens <= self.output_tpm))
+
+    def _wait_time(self, input_tokens: int, output_tokens: int, now: float) -> float:
+        """Seconds until enough of the window ages out for the call to fit."""
+        used_in, used_out = self._used()
+        for ts, entry_in, entry_out in self._window:
+            used_in -= entry_in
+            used_out -= entry_out
+            if ((not self.input_tpm or used_in + input_tokens <= self.input_tpm) and
+                    (not self.output_tpm or used_out + output_tokens <= self.output_tpm)):
+                return max(0.0, ts + WINDOW_S - now)
+        return WINDOW_S
+
+    def acquire(self, input_tokens: int, output_tokens: int) -> list:
+        """Reserve tokens in the current window; returns the ticket to pass to ``record``.
+
+        Blocks (``queue``) or raises ``TokenBudgetExceeded`` (``shed``, or the
+        wait would pass ``max_wait``) when the budget is used up.
+        """
+        ticket = [0.0, input_tokens, output_tokens]
+        start = time.monotonic()
+        with self._cond:
+            self._prune(start)
+            # Without a budget the window is still kept, for last_minute()
+            if not (self.input_tpm or self.output_tpm) or (
+                    not self._waiters and self._fits(input_tokens, output_tokens)):
+                ticket[0] = start
+                self._window.append(ticket)
+                return ticket
+            if self.mode == "shed":
+                self.budget_shed += 1
+                raise TokenBudgetExceeded(self._exceeded_message(input_tokens, output_tokens))
+
+            self._waiters.append(ticket)
+            self.budget_waits += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._prune(now)
+                    if self._waiters[0] is ticket and self._fits(input_tokens, output_tokens):
+                        break
+                    delay = self._wait_time(input_tokens, output_tokens, now) if self._waiters[0] is ticket else 1.0
+                    if now + delay - start > self.max_wait:
+                        self.budget_shed += 1
+                        raise TokenBudgetExceeded(self._exceeded_message(input_tokens, output_tokens))
+                    self._cond.wait(max(delay, 0.01))
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+            ticket[0] = now
+            self._window.append(ticket)
+            self.budget_wait_s += now - start
+            return ticket
+
+    def _exceeded_message(self, input_tokens: int, output_tokens: int) -> str:
+        used_in, used_out = self._used()
+        return (f"LLM token budget exceeded: {used_in}+{input_tokens} input / {self.input_tpm or '∞'}, "
+                f"{used_out}+{output_tokens} output / {self.output_tpm or '∞'} tokens per minute")
+
+    # --- Recording ---
+
+    def record(self, model: str, input_tokens: int, output_tokens: int, latency_s: float,
+               ok: bool = True, ticket: list | None = None):
+        """Record a finished call; corrects the ticket's reservation to the real usage."""
+        cost = estimate_cost(model, input_tokens, output_tokens)
+        minute = int(time.time() // 60 * 60)
+        with self._cond:
+            if ticket is not None and ticket[0]:
+                ticket[1], ticket[2] = input_tokens, output_tokens
+                self._cond.notify_all()
+            per_model = self._minutes.setdefault(minute, {})
+            per_model.setdefault(model, _Aggregate()).add(ok, input_tokens, output_tokens, latency_s, cost)
+            while len(self._minutes) > self.minutes:
+                self._minutes.popitem(last=False)
+            self._totals.setdefault(model, _Aggregate()).add(ok, input_tokens, output_tokens, latency_s, cost)
+            counts = self._latency_counts.setdefault(model, [0] * len(LATENCY_BUCKETS))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency_s <= bound:
+                    counts[i] += 1
+            export = self.metrics_file and time.monotonic() - self._written_at >= self.metrics_interval
+            if export:
+                self._written_at = time.monotonic()
+        if export:
+            self.export()
+
+    # --- Views ---
+
+    def last_minute(self) -> dict:
+        """Tokens used (including open reservations) in the sliding 60 s window."""
+        with self._cond:
+            self._prune(time.monotonic())
+            used_in, used_out = self._used()
+            return {"calls": len(self._window), "input_tokens": used_in, "output_tokens": used_out,
+                    "input_tpm": self.input_tpm, "output_tpm": self.output_tpm}
+
+    def format_last_minute(self) -> str:
+        window = self.last_minute()
+        with self._cond:
+            cost = sum(aggregate.cost_usd for aggregate in self._totals.values())
+        return (f"last 60s: in={window['input_tokens']}/{window['input_tpm'] or '∞'}, "
+                f"out={window['output_tokens']}/{window['output_tpm'] or '∞'}; session cost ${cost:.4f}")
+
+    def minutes_summary(self) -> list[dict]:
+        """Per-minute aggregates, oldest first: ``{"minute", "model", requests, tokens, ...}``."""
+        with self._cond:
+            return [dict(aggregate.to_dict(), minute=minute, model=model)
+                    for minute, per_model in self._minutes.items() for model, aggregate in per_model.items()]
+
+    def totals(self) -> dict:
+        with self._cond:
+            return {model: aggregate.to_dict() for model, aggregate in self._totals.items()}
+
+    # --- Export ---
+
+    def prometheus_text(self) -> str:
+        with self._cond:
+            totals = {model: aggregate.to_dict() for model, aggregate in self._totals.items()}
+            latency = {model: list(counts) for model, counts in self._latency_counts.items()}
+            self._prune(time.monotonic())
+            used_in, used_out = self._used()
+            waits, wait_s, shed = self.budget_waits, self.budget_wait_s, self.budget_shed
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            """One family; a sample is ``(labels, value)``, or ``(suffix, labels, value)`` for ``_bucket`` etc."""
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample in samples:
+                suffix, labels, value = sample if len(sample) == 3 else ("", *sample)
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}" if label_text else f"{name}{suffix} {value}")
+
+        metric("llm_requests_total", "counter", "LLM calls by model and status.",
+               [({"model": m, "status": "ok"}, t["requests"] - t["errors"]) for m, t in totals.items()] +
+               [({"model": m, "status": "error"}, t["errors"]) for m, t in totals.items()])
+        metric("llm_tokens_total", "counter", "Tokens used by model and direction.",
+               [({"model": m, "direction": "input"}, t["input_tokens"]) for m, t in totals.items()] +
+               [({"model": m, "direction": "output"}, t["output_tokens"]) for m, t in totals.items()])
+        metric("llm_cost_usd_total", "counter", "Estimated spend in USD.",
+               [({"model": m}, f"{t['cost_usd']:.6f}") for m, t in totals.items()])
+        histogram = []
+        for model, counts in latency.items():
+            histogram += [("_bucket", {"model": model, "le": "+Inf" if math.isinf(b) else b}, c)
+                          for b, c in zip(LATENCY_BUCKETS, counts)]
+            histogram += [("_sum", {"model": model}, f"{totals[model]['latency_sum']:.6f}"),
+                          ("_count", {"model": model}, counts[-1])]
+        metric("llm_request_latency_seconds", "histogram", "Call latency.", histogram)
+        metric("llm_window_tokens", "gauge", "Tokens used in the last 60 s (incl. reservations).",
+               [({"direction": "input"}, used_in), ({"direction": "output"}, used_out)])
+        metric("llm_budget_tokens_per_minute", "gauge", "Configured budget (0 = unlimited).",
+               [({"direction": "input"}, self.input_tpm), ({"direction": "output"}, self.output_tpm)])
+        metric("llm_budget_waits_total", "counter", "Calls queued by the budget.", [({}, waits)])
+        metric("llm_budget_wait_seconds_total", "counter", "Time spent queued by the budget.", [({}, f"{wait_s:.6f}")])
+        metric("llm_budget_shed_total", "counter", "Calls rejected by the budget.", [({}, shed)])
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str | None = None):
+        """Atomically write the metrics file (JSON for ``.json`` paths, Prometheus text otherwise)."""
+        path = path or self.metrics_file
+        if not path:
+            return
+        if path.endswith(".json"):
+            data = json.dumps({"generated_at": time.time(), "input_tpm": self.input_tpm,
+                               "output_tpm": self.output_tpm, "totals": self.totals(),
+                               "minutes": self.minutes_summary()}, indent=1)
+        else:
+            data = self.prometheus_text()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+# --- Client wrapper ---
+
+class _Messages:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, **kwargs):
+        return self._owner._create(**kwargs)
+
+    def stream(self, **kwargs):
+        return self._owner._stream(**kwargs)
+
+
+class MeteredClient:
+    """Drop-in wrapper for an anthropic SDK client or ``anthropic_simple.AnthropicClient``.
+
+    Exposes both call styles (``messages.create/stream`` and
+    ``create_message/stream_message``) and meters every call.
+    """
+
+    def __init__(self, client, meter: LLMMeter | None = None):
+        self.client = client
+        self.meter = meter or get_default_meter()
+        self.messages = _Messages(self)
+
+    def create_message(self, model, max_tokens, system=None, messages=None, **extra):
+        return self._create(model=model, max_tokens=max_tokens, system=system, messages=messages, **extra)
+
+    def stream_message(self, model, max_tokens, system=None, messages=None, **extra):
+        return self._stream(model=model, max_tokens=max_tokens, system=system, messages=messages, **extra)
+
+    def _acquire(self, kwargs: dict) -> list:
+        return self.meter.acquire(estimate_input_tokens(kwargs.get("system"), kwargs.get("messages")),
+                                  kwargs.get("max_tokens", 0))
+
+    def _create(self, **kwargs):
+        ticket = self._acquire(kwargs)
+        start = time.perf_counter()
+        try:
+            if hasattr(self.client, "messages"):
+                response = self.client.messages.create(**kwargs)
+            else:
+                response = self.client.create_message(**kwargs)
+        except BaseException:
+            self.meter.record(kwargs.get("model"), 0, 0, time.perf_counter() - start, ok=False, ticket=ticket)
+            raise
+        self.meter.record(kwargs.get("model"), response.usage.input_tokens, response.usage.output_tokens,
+                          time.perf_counter() - start, ticket=ticket)
+        return response
+
+    @contextmanager
+    def _stream(self, **kwargs):
+        ticket = self._acquire(kwargs)
+        start = time.perf_counter()
+        try:
+            manager = (self.client.messages.stream(**kwargs) if hasattr(self.client, "messages")
+                       else self.client.stream_message(**kwargs))
+            with manager as stream:
+                yield stream
+                response = stream.get_final_message()
+        except BaseException:
+            self.meter.record(kwargs.get("model"), 0, 0, time.perf_counter() - start, ok=False, ticket=ticket)
+            raise
+        self.meter.record(kwargs.get("model"), response.usage.input_tokens, response.usage.output_tokens,
+                          time.perf_counter() - start, ticket=ticket)
+
+    def close(self):
+        if hasattr(self.client, "close"):
+            self.client.close()
+
+
+_default_meter = None
+_default_meter_lock = threading.Lock()
+
+
+def get_default_meter() -> LLMMeter:
+    """Process-wide meter configured from the ``LLM_*`` environment variables."""
+    global _default_meter
+    with _default_meter_lock:
+        if _default_meter is None:
+            _default_meter = LLMMeter()
+            if _default_meter.metrics_file:
+                atexit.register(_default_meter.export)
+        return _default_meter
+
+
+def summarize(path: str) -> str:
+    """Capacity summary of a JSON export: per-minute peaks and percentiles."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    by_minute = {}
+    for row in data["minutes"]:
+        minute = by_minute.setdefault(row["minute"], [0, 0, 0])
+        minute[0] += row["requests"]
+        minute[1] += row["input_tokens"]
+        minute[2] += row["output_tokens"]
+    if not by_minute:
+        return "No calls recorded."
+
+    lines = [f"{len(by_minute)} active minutes; budget input={data['input_tpm'] or '∞'}, "
+             f"output={data['output_tpm'] or '∞'} tokens/min",
+             f"{'per minute':<16}{'p50':>10}{'p95':>10}{'peak':>10}"]
+    for i, name in enumerate(("requests", "input tokens", "output tokens")):
+        values = [minute[i] for minute in by_minute.values()]
+        lines.append(f"{name:<16}{percentile(values, 50):>10,}{percentile(values, 95):>10,}{max(values):>10,}")
+    for model, totals in data["totals"].items():
+        lines.append(f"{model}: {totals['requests']} calls, {totals['errors']} errors, "
+                     f"avg {totals['latency_sum'] / max(totals['requests'], 1):.2f}s, ${totals['cost_usd']:.4f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capacity summary of an LLM metrics JSON export.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_METRICS_FILE or os.path.join(".cache", "llm_metrics.json"))
+    print(summarize(parser.parse_args().path))
@@ -1,15 +1,26 @@
 import os
 import json
-import yfinance as yf
 from anthropic import Anthropic
 from dotenv import load_dotenv
 from datetime import datetime
+from llm_cache import get_default_response_cache
+from recommendation_service import format_stream_timings
+from indicators import format_technicals
+from llm_metering import MeteredClient
+from pipeline import AnalysisPipeline, looks_like_ticker
+from recommendation_router import RecommendationRouter
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Anthropic client
-client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+# Initialize Anthropic client; every call is metered and held to the token budget
+client = MeteredClient(Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY")))
+
+# Resolution, quotes, technicals and recommendations: shared with the app, each stage traced
+pipeline = AnalysisPipeline(client)
+
+# Clear-cut cases are answered by the rule engine; only borderline ones go to Claude
+router = RecommendationRouter(pipeline)
 
 # --- Utility function to get timestamp ---
 def timestamp():
@@ -22,93 +33,66 @@ def get_user_input(prompt: str) -> dict:
     return {"user_input": user_response}
 
 def get_ticker_from_llm(company_name: str) -> dict:
-    response = client.messages.create(
-        model="claude-3-5-haiku-20241022",
-        max_tokens=100,
-        system="You are a financial assistant. Given a company name, return ONLY its exact stock ticker symbol. Return only the ticker text (e.g., 'NVDA'). No extra explanation.",
-        messages=[
-            {
-                "role": "user",
-                "content": f"What is the stock ticker symbol for {company_name}?"
-            }
-        ]
-    )
+    response = pipeline.ask_ticker(company_name)
     ticker = response.content[0].text.strip().upper()
 
     # Print token usage
-    print(f"{timestamp()} 🔢 Token usage [get_ticker_from_llm]: input={response.usage.input_tokens}, output={response.usage.output_tokens}")
+    print(f"{timestamp()} 🔢 Token usage [get_ticker_from_llm]: input={response.usage.input_tokens}, output={response.usage.output_tokens} "
+          f"({client.meter.format_last_minute()})")
 
     return {"ticker": ticker}
 
-def get_stock_data(ticker: str) -> dict:
-    try:
-        ticker_obj = yf.Ticker(ticker)
-        ticker_info = ticker_obj.info
-
-        current_price = ticker_info.get("currentPrice")
-        target_price = ticker_info.get("targetMeanPrice")
-
-        # Fallback: try to get last close price if current price missing
-        if current_price is None:
-            hist = ticker_obj.history(period="1d")
-            if not hist.empty:
-                current_price = hist["Close"].iloc[-1]
-            else:
-                current_price = None
-
-        if current_price is None or target_price is None:
-            return {
-                "ticker": ticker,
-                "current_price": current_price,
-                "target_price": target_price,
-                "error": "Price data unavailable or ticker not supported."
-            }
+def resolve_ticker(company_name: str) -> dict:
+    """Resolve a company name via the local symbol index; ask the LLM only on a miss."""
+    return pipeline.resolve(company_name, lambda name: get_ticker_from_llm(name)["ticker"])
 
-        return {
-            "ticker": ticker,
-            "current_price": current_price,
-            "target_price": target_price,
-            "error": None
-        }
-    
-    except Exception as e:
-        # Handle rate limiting and other errors
-        error_msg = str(e)
-        if "Rate limited" in error_msg or "Too Many Requests" in error_msg:
-            error_msg = "Yahoo Finance rate limit exceeded. Please try again in a few minutes."
-        elif "Invalid ticker" in error_msg:
-            error_msg = f"Invalid ticker symbol: {ticker}"
-        else:
-            error_msg = f"Error fetching data for {ticker}: {str(e)}"
-        
-        return {
-            "ticker": ticker,
-            "current_price": None,
-            "target_price": None,
-            "error": error_msg
-        }
-
-def get_recommendation(ticker: str, current_price: float, target_price: float) -> dict:
-    response = client.messages.create(
-        model="claude-3-5-haiku-20241022",
-        max_tokens=500,
-        system="You are a financial assistant. Make a BUY/HOLD/SELL recommendation: BUY if current price much lower than target price, HOLD if close, SELL if higher.",
-        messages=[
-            {
-                "role": "user",
-                "content": f"Ticker: {ticker}, Current price: {current_price}, Target price: {target_price}."
-            }
-        ]
-    )
-    recommendation_body = response.content[0].text.strip()
+def get_stock_data(ticker: str) -> dict:
+    # Served from the shared quote cache; Yahoo is hit only for stale fields
+    return pipeline.stock_data(ticker)
+
+def get_recommendation(ticker: str, current_price: float, target_price: float, stream: bool = True,
+                       technicals: dict | None = None) -> dict:
+    printed = 0
+
+    def echo(text):
+        # Echo the answer as it arrives
+        nonlocal printed
+        if not printed:
+            print(f"{timestamp()} 🤖 ", end="", flush=True)
+        print(text[printed:], end="", flush=True)
+        printed = len(text)
+
+    decision = router.route(ticker, current_price, target_price, technicals)
+    answered_by = "rule engine" if decision["route"] == "rules" else "Claude"
+    print(f"{timestamp()} 🧭 Routing [get_recommendation]: {answered_by} ({decision['band']}, "
+          f"confidence {decision['confidence']:.2f}, upside {decision['upside_pct']:+.1f}%)")
+
+    # Claude answers are looked up in the persistent response cache first (prices quantized)
+    result = router.serve(decision, current_price, target_price, technicals, stream=stream, on_text=echo)
+    if printed:
+        print()
+    response, source, timings = result["response"], result["source"], result["timings"]
 
     # Print token usage
-    print(f"{timestamp()} 🔢 Token usage [get_recommendation]: input={response.usage.input_tokens}, output={response.usage.output_tokens}")
+    if source == "rules":
+        print(f"{timestamp()} 🔢 Token usage [get_recommendation]: input=0, output=0 (rule engine)")
+        return {"recommendation": format_recommendation(f"{result['verdict']}\n\n{result['text']}")}
+    recommendation_body = result["text"]
+    if source == "cache":
+        saved = get_default_response_cache().stats()
+        print(f"{timestamp()} 🔢 Token usage [get_recommendation]: input=0, output=0 "
+              f"(cache hit, saved input={response.usage.input_tokens}, output={response.usage.output_tokens}; "
+              f"total saved input={saved['saved_input_tokens']}, output={saved['saved_output_tokens']})")
+    else:
+        latency = f", {format_stream_timings(timings)}" if timings else ""
+        print(f"{timestamp()} 🔢 Token usage [get_recommendation]: input={response.usage.input_tokens}, output={response.usage.output_tokens}{latency} "
+              f"({client.meter.format_last_minute()})")
+
+    return {"recommendation": format_recommendation(recommendation_body)}
 
+def format_recommendation(recommendation_body: str) -> str:
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    full_recommendation = f"[{ts}] Recommendation: {recommendation_body}\n\n⚠️ Disclaimer: This recommendation is for informational purposes only and does not constitute financial advice. Please consult a qualified financial advisor before making investment decisions."
-    
-    return {"recommendation": full_recommendation}
+    return f"[{ts}] Recommendation: {recommendation_body}\n\n⚠️ Disclaimer: This recommendation is for informational purposes only and does not constitute financial advice. Please consult a qualified financial advisor before making investment decisions."
 
 # --- Function schemas for OpenAI ---
 
@@ -211,14 +195,14 @@ def agent_loop():
 
     user_input = function_response["user_input"]
 
-    if user_input.isupper() and 1 <= len(user_input) <= 5:
+    if looks_like_ticker(user_input):
         ticker = user_input
     else:
-        function_response = get_ticker_from_llm(user_input)
-        print(f"{timestamp()} ✅ Tool result [get_ticker_from_llm]: {function_response}")
+        function_response = resolve_ticker(user_input)
+        print(f"{timestamp()} ✅ Tool result [resolve_ticker]: {function_response}")
 
         # Check ticker validity
-        if not (function_response["ticker"].isupper() and 1 <= len(function_response["ticker"]) <= 5):
+        if not looks_like_ticker(function_response["ticker"]):
             print(f"\n❌ The company '{user_input}' does not appear to have a valid stock ticker symbol or it is not publicly traded.")
             return
 
@@ -237,16 +221,24 @@ def agent_loop():
         print(f"\n❌ Could not retrieve analyst target price for {ticker}. Cannot generate recommendation.")
         return
 
+    # Technical indicators from the local price history (None if unavailable)
+    technicals = pipeline.technicals(ticker)
+    if technicals:
+        print(f"{timestamp()} ✅ Tool result [ticker_technicals]: {format_technicals(technicals)}")
+
     # Get recommendation
     reco_response = get_recommendation(
         ticker=ticker,
         current_price=stock_data["current_price"],
-        target_price=stock_data["target_price"]
+        target_price=stock_data["target_price"],
+        technicals=technicals
     )
     print(f"{timestamp()} ✅ Tool result [get_recommendation]: {reco_response}")
 
     print("\n--- Final Recommendation ---")
     print(reco_response["recommendation"])
+    print(f"\n{timestamp()} ⏱️ Stages: {pipeline.tracer.format_summary()}")
+    print(f"{timestamp()} 🧭 Routing: {router.format_summary()}")
 
 # --- Run the agent ---
 if __name__ == "__main__":
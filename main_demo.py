@@ -1,12 +1,16 @@
 import os
 import json
-import yfinance as yf
 from dotenv import load_dotenv
 from datetime import datetime
+from indicators import format_technicals
+from pipeline import AnalysisPipeline
 
 # Load environment variables
 load_dotenv()
 
+# Same stages as main.py and the app, without the LLM ones
+pipeline = AnalysisPipeline()
+
 # --- Utility function to get timestamp ---
 def timestamp():
     return datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
@@ -18,68 +22,18 @@ def get_user_input(prompt: str) -> dict:
     return {"user_input": user_response}
 
 def get_stock_data(ticker: str) -> dict:
-    try:
-        ticker_obj = yf.Ticker(ticker)
-        ticker_info = ticker_obj.info
-
-        current_price = ticker_info.get("currentPrice")
-        target_price = ticker_info.get("targetMeanPrice")
-
-        # Fallback: try to get last close price if current price missing
-        if current_price is None:
-            hist = ticker_obj.history(period="1d")
-            if not hist.empty:
-                current_price = hist["Close"].iloc[-1]
-            else:
-                current_price = None
-
-        if current_price is None or target_price is None:
-            return {
-                "ticker": ticker,
-                "current_price": current_price,
-                "target_price": target_price,
-                "error": "Price data unavailable or ticker not supported."
-            }
-
-        return {
-            "ticker": ticker,
-            "current_price": current_price,
-            "target_price": target_price,
-            "error": None
-        }
-    
-    except Exception as e:
-        error_msg = str(e)
-        if "Rate limited" in error_msg or "Too Many Requests" in error_msg:
-            error_msg = "Yahoo Finance rate limit exceeded. Please try again in a few minutes."
-        elif "Invalid ticker" in error_msg:
-            error_msg = f"Invalid ticker symbol: {ticker}"
-        else:
-            error_msg = f"Error fetching data for {ticker}: {str(e)}"
-        
-        return {
-            "ticker": ticker,
-            "current_price": None,
-            "target_price": None,
-            "error": error_msg
-        }
-
-def get_recommendation(ticker: str, current_price: float, target_price: float) -> dict:
-    # Simple rule-based recommendation for demo
-    price_diff_pct = ((target_price - current_price) / current_price) * 100
-    
-    if price_diff_pct > 15:
-        recommendation = "BUY"
-        reasoning = f"Akcia {ticker} je výrazne pod cieľovou cenou analytikov. Aktuálna cena je ${current_price:.2f}, zatiaľ čo analytici očakávajú ${target_price:.2f} (potenciálny rast {price_diff_pct:.1f}%). To naznačuje významnú príležitosť na zhodnotenie."
-    elif price_diff_pct > 5:
-        recommendation = "HOLD"
-        reasoning = f"Akcia {ticker} je mierne pod cieľovou cenou analytikov. Aktuálna cena ${current_price:.2f} má potenciál rastu na ${target_price:.2f} (približne {price_diff_pct:.1f}%), čo naznačuje miernu príležitosť. Odporúčame držať a monitorovať."
-    elif price_diff_pct > -5:
-        recommendation = "HOLD"
-        reasoning = f"Akcia {ticker} je blízko cieľovej ceny analytikov. Aktuálna cena ${current_price:.2f} je v rovnováhe s cieľom ${target_price:.2f} ({price_diff_pct:+.1f}%). Držte pozíciu a sledujte vývoj."
-    else:
-        recommendation = "SELL"
-        reasoning = f"Akcia {ticker} je nad cieľovou cenou analytikov. Aktuálna cena ${current_price:.2f} presahuje cieľ ${target_price:.2f} o {abs(price_diff_pct):.1f}%, čo môže naznačovať prekúpenosť. Zvážte realizáciu zisku."
+    # Served from the shared quote cache; Yahoo is hit only for stale fields
+    return pipeline.stock_data(ticker)
+
+def get_recommendation(ticker: str, current_price: float, target_price: float,
+                       technicals: dict | None = None) -> dict:
+    # Simple rule-based recommendation for demo; same thresholds as the
+    # vectorized engine used for whole universes
+    result = pipeline.rule_recommendation(ticker, current_price, target_price, technicals)
+    price_diff_pct = result["price_diff_pct"]
+    recommendation = result["verdict"]
+    reasoning = result["reasoning"]
+    technicals_section = f"\n📉 Technické ukazovatele:\n{format_technicals(technicals)}\n" if technicals else ""
     
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     full_recommendation = f"""[{ts}] 
@@ -94,7 +48,7 @@ def get_recommendation(ticker: str, current_price: float, target_price: float) -
 
 💡 Zdôvodnenie:
 {reasoning}
-
+{technicals_section}
 ⚠️ Disclaimer: Toto odporúčanie je len informačné a nepredstavuje finančné poradenstvo. 
 Vždy konzultujte s kvalifikovaným finančným poradcom pred investičnými rozhodnutiami."""
     
@@ -128,16 +82,21 @@ def agent_loop():
         print(f"\n❌ Could not retrieve analyst target price for {ticker}. Cannot generate recommendation.")
         return
 
+    # Technical indicators from the local price history (None if unavailable)
+    technicals = pipeline.technicals(ticker)
+
     # Get recommendation
     reco_response = get_recommendation(
         ticker=ticker,
         current_price=stock_data["current_price"],
-        target_price=stock_data["target_price"]
+        target_price=stock_data["target_price"],
+        technicals=technicals
     )
 
     print("\n" + "="*60)
     print(reco_response["recommendation"])
     print("="*60)
+    print(f"{timestamp()} ⏱️ Stages: {pipeline.tracer.format_summary()}")
 
 # --- Run the agent ---
 if __name__ == "__main__":
@@ -0,0 +1,327 @@
+"""Pluggable market-data providers: live Yahoo Finance or a local replay.
+
+Everything that needs quotes or price history (``quote_cache``,
+``bulk_quotes``, ``price_history`` and, through them, main.py, main_demo.py,
+app.py and batch.py) gets them from ``get_default_provider()``:
+
+- ``YFinanceProvider``: yfinance, paced and retried by ``rate_limiter``;
+- ``ReplayProvider``: recorded ``.info`` dicts and daily bars from a JSON
+  fixture (``fixtures/yahoo_quotes.json`` format), with configurable latency,
+  random errors and 429s, so the whole pipeline can be load-tested on a
+  machine without network access.
+
+Select with ``MARKET_DATA_PROVIDER=yfinance|replay``; the replay is
+configured by the ``MARKET_DATA_REPLAY_*`` variables below.
+
+Usage:
+    python market_data.py record NVDA MSFT AAPL -o fixtures/my_quotes.json --days 30
+    python market_data.py record NVDA MSFT AAPL -o fixtures/yahoo_quotes.json --force   # replace the bundled one
+    MARKET_DATA_PROVIDER=replay MARKET_DATA_REPLAY_LATENCY_MS=150 streamlit run app.py
+"""
+import abc
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+DEFAULT_PROVIDER = os.environ.get("MARKET_DATA_PROVIDER", "yfinance")   # "yfinance" | "replay"
+DEFAULT_REPLAY_PATH = os.environ.get(
+    "MARKET_DATA_REPLAY_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "yahoo_quotes.json"),
+)
+REPLAY_LATENCY_MS = float(os.environ.get("MARKET_DATA_REPLAY_LATENCY_MS", 0))
+REPLAY_JITTER_MS = float(os.environ.get("MARKET_DATA_REPLAY_JITTER_MS", 0))
+REPLAY_ERROR_RATE = float(os.environ.get("MARKET_DATA_REPLAY_ERROR_RATE", 0))
+REPLAY_RATE_LIMIT_RATE = float(os.environ.get("MARKET_DATA_REPLAY_RATE_LIMIT_RATE", 0))
+# Serve unknown symbols from a recorded one (picked by hash) instead of failing
+REPLAY_SYNTHESIZE = os.environ.get("MARKET_DATA_REPLAY_SYNTHESIZE", "0") == "1"
+# Shift recorded bars by whole weeks so the last one falls in the current week
+REPLAY_REBASE_DATES = os.environ.get("MARKET_DATA_REPLAY_REBASE_DATES", "1") == "1"
+
+HISTORY_COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+
+
+def _empty_history() -> dict:
+    return {column: np.empty(0, np.int64 if column == "ts" else np.float64) for column in HISTORY_COLUMNS}
+
+
+class MarketDataProvider(abc.ABC):
+    """Interface for quote and history sources.
+
+    ``history`` returns column arrays (``ts`` as epoch seconds at UTC
+    midnight, then ``open``, ``high``, ``low``, ``close``, ``volume``) for the
+    bars with ``ts >= start``, or the full history when ``start`` is None.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    def info(self, ticker: str) -> dict:
+        """The ``.info`` dict (``currentPrice``, ``targetMeanPrice``, fundamentals)."""
+
+    @abc.abstractmethod
+    def last_close(self, ticker: str) -> float | None:
+        """Latest daily close, or None for an unknown symbol."""
+
+    def download_closes(self, tickers: list[str]) -> dict[str, float]:
+        """Latest close for many tickers; missing symbols are left out."""
+        return {ticker: close for ticker in tickers if (close := self.last_close(ticker)) is not None}
+
+    @abc.abstractmethod
+    def history(self, ticker: str, start: int | None = None) -> dict[str, np.ndarray]:
+        """Daily bars as column arrays (see the class docstring)."""
+
+
+# --- Yahoo Finance ---
+
+class YFinanceProvider(MarketDataProvider):
+    """Live Yahoo Finance through yfinance (imported on first use).
+
+    Every request goes through ``limiter`` (default: the shared
+    ``rate_limiter.get_default_limiter()``).
+    """
+
+    name = "yfinance"
+
+    def __init__(self, limiter=None):
+        self._limiter = limiter
+
+    @property
+    def limiter(self):
+        if self._limiter is None:
+            from rate_limiter import get_default_limiter
+            self._limiter = get_default_limiter()
+        return self._limiter
+
+    def info(self, ticker: str) -> dict:
+        import yfinance as yf
+
+        return self.limiter.call(lambda: yf.Ticker(ticker).info)
+
+    def last_close(self, ticker: str) -> float | None:
+        import yfinance as yf
+
+        hist = self.limiter.call(yf.Ticker(ticker).history, period="1d")
+        if hist.empty:
+            return None
+        return float(hist["Close"].iloc[-1])
+
+    def download_closes(self, tickers: list[str]) -> dict[str, float]:
+        """Latest close for many tickers in one ``yf.download`` request."""
+        import yfinance as yf
+
+        data = self.limiter.call(yf.download, tickers, period="5d", group_by="ticker",
+                                 auto_adjust=False, progress=False, threads=False)
+        closes = {}
+        if data is None or data.empty:
+            return closes
+        grouped = hasattr(data.columns, "levels")
+        for ticker in tickers:
+            try:
+                column = data[ticker]["Close"] if grouped else data["Close"]
+            except KeyError:
+                continue
+            column = column.dropna()
+            if not column.empty:
+                closes[ticker] = float(column.iloc[-1])
+        return closes
+
+    def history(self, ticker: str, start: int | None = None) -> dict[str, np.ndarray]:
+        import yfinance as yf
+
+        if start is None:
+            hist = self.limiter.call(yf.Ticker(ticker).history, period="max", auto_adjust=False)
+        else:
+            start_day = datetime.fromtimestamp(start, tz=timezone.utc).strftime("%Y-%m-%d")
+            hist = self.limiter.call(yf.Ticker(ticker).history, start=start_day, auto_adjust=False)
+        if hist.empty:
+            return _empty_history()
+
+        index = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+        days = index.normalize().values.astype("datetime64[s]").astype(np.int64)
+        return {
+            "ts": days,
+            "open": hist["Open"].to_numpy(np.float64),
+            "high": hist["High"].to_numpy(np.float64),
+            "low": hist["Low"].to_numpy(np.float64),
+            "close": hist["Close"].to_numpy(np.float64),
+            "volume": hist["Volume"].to_numpy(np.float64),
+        }
+
+
+# --- Replay ---
+
+class ReplayProvider(MarketDataProvider):
+    """Serves a recorded fixture ``{ticker: {"info": {...}, "history": [bars]}}``.
+
+    Each request sleeps ``latency_ms`` plus up to ``jitter_ms``, then fails
+    with probability ``rate_limit_rate`` (a yfinance-style "Too Many
+    Requests" error) or ``error_rate`` (a generic error). Unknown tickers
+    raise "Invalid ticker" unless ``synthesize`` is set, in which case they
+    get a recorded symbol's data under their own name. With ``rebase_dates``
+    the bars are shifted by whole weeks (weekdays stay weekdays) so the last
+    one falls within the past week, as live data would. ``limiter`` (optional)
+    is applied like in ``YFinanceProvider``; ``requests`` counts calls per
+    endpoint.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str = DEFAULT_REPLAY_PATH, latency_ms: float = REPLAY_LATENCY_MS,
+                 jitter_ms: float = REPLAY_JITTER_MS, error_rate: float = REPLAY_ERROR_RATE,
+                 rate_limit_rate: float = REPLAY_RATE_LIMIT_RATE, synthesize: bool = REPLAY_SYNTHESIZE,
+                 rebase_dates: bool = REPLAY_REBASE_DATES, seed: int | None = None, limiter=None):
+        with open(path, encoding="utf-8") as f:
+            self.records = {ticker.upper(): record for ticker, record in json.load(f).items()}
+        self._symbols = sorted(self.records)
+        self.latency_s = latency_ms / 1000
+        self.jitter_s = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.synthesize = synthesize
+        self.rebase_dates = rebase_dates
+        self.limiter = limiter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = {"info": 0, "last_close": 0, "download": 0, "history": 0}
+
+    def _record(self, ticker: str) -> dict:
+        ticker = ticker.upper()
+        record = self.records.get(ticker)
+        if record is None:
+            if not self.synthesize:
+                raise ValueError(f"Invalid ticker symbol: {ticker} (not in the replay fixture)")
+            record = self.records[self._symbols[zlib.crc32(ticker.encode()) % len(self._symbols)]]
+            record = {"info": dict(record["info"], symbol=ticker), "history": record["history"]}
+        return record
+
+    def _request(self, endpoint: str, fn):
+        def attempt():
+            with self._lock:
+                self.requests[endpoint] += 1
+                delay = self.latency_s + (self._random.uniform(0, self.jitter_s) if self.jitter_s else 0.0)
+                roll = self._random.random()
+            if delay:
+                time.sleep(delay)
+            if roll < self.rate_limit_rate:
+                raise RuntimeError("Too Many Requests. Rate limited. Try after a while. (replay)")
+            if roll < self.rate_limit_rate + self.error_rate:
+                raise RuntimeError(f"Replay: injected {endpoint} error")
+            return fn()
+
+        return self.limiter.call(attempt) if self.limiter is not None else attempt()
+
+    def info(self, ticker: str) -> dict:
+        return self._request("info", lambda: dict(self._record(ticker)["info"]))
+
+    def _closes(self, ticker: str) -> float | None:
+        bars = self._record(ticker)["history"]
+        return float(bars[-1]["Close"]) if bars else None
+
+    def last_close(self, ticker: str) -> float | None:
+        return self._request("last_close", lambda: self._closes(ticker))
+
+    def download_closes(self, tickers: list[str]) -> dict[str, float]:
+        def closes():
+            found = {}
+            for ticker in tickers:
+                try:
+                    close = self._closes(ticker)
+                except ValueError:
+                    continue
+                if close is not None:
+                    found[ticker] = close
+            return found
+
+        return self._request("download", closes)
+
+    def history(self, ticker: str, start: int | None = None) -> dict[str, np.ndarray]:
+        def bars():
+            rows = self._record(ticker)["history"]
+            if not rows:
+                return _empty_history()
+            ts = np.array([date.fromisoformat(row["Date"][:10]) for row in rows], dtype="datetime64[D]")
+            if self.rebase_dates:
+                weeks = (np.datetime64(date.today(), "D") - ts[-1]).astype(np.int64) // 7
+                ts = ts + np.timedelta64(7 * max(int(weeks), 0), "D")
+            columns = {"ts": ts.astype("datetime64[s]").astype(np.int64)}
+            for column in HISTORY_COLUMNS[1:]:
+                columns[column] = np.array([row[column.capitalize()] for row in rows], dtype=np.float64)
+            if start is not None:
+                keep = columns["ts"] >= start
+                columns = {column: values[keep] for column, values in columns.items()}
+            return columns
+
+        return self._request("history", bars)
+
+
+def create_provider(name: str = DEFAULT_PROVIDER) -> MarketDataProvider:
+    if name == "yfinance":
+        return YFinanceProvider()
+    if name == "replay":
+        return ReplayProvider()
+    raise ValueError(f"Unknown market data provider: {name!r} (expected 'yfinance' or 'replay')")
+
+
+_default_provider = None
+_default_provider_lock = threading.Lock()
+
+
+def get_default_provider() -> MarketDataProvider:
+    """Process-wide provider selected by ``MARKET_DATA_PROVIDER``."""
+    global _default_provider
+    with _default_provider_lock:
+        if _default_provider is None:
+            _default_provider = create_provider()
+        return _default_provider
+
+
+def set_default_provider(provider: MarketDataProvider | None):
+    """Swap the process-wide provider (e.g. a ReplayProvider in a benchmark); None resets it."""
+    global _default_provider
+    with _default_provider_lock:
+        _default_provider = provider
+
+
+def record_fixture(tickers: list[str], days: int = 30, provider: MarketDataProvider | None = None) -> dict:
+    """Fetch ``.info`` and the last ``days`` of bars for tickers, in the replay fixture format."""
+    provider = provider or YFinanceProvider()
+    start = int(datetime.combine(date.today() - timedelta(days=days), datetime.min.time(),
+                                 tzinfo=timezone.utc).timestamp())
+    fixture = {}
+    for ticker in tickers:
+        info = provider.info(ticker)
+        bars = provider.history(ticker, start)
+        dates = bars["ts"].astype("datetime64[s]").astype("datetime64[D]").astype(str)
+        fixture[ticker] = {
+            "info": info,
+            "history": [
+                {"Date": day, **{column.capitalize(): float(bars[column][i]) for column in HISTORY_COLUMNS[1:]}}
+                for i, day in enumerate(dates)
+            ],
+        }
+    return fixture
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record a replay fixture from Yahoo Finance.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="Fetch .info and recent bars for tickers")
+    record.add_argument("tickers", nargs="+")
+    record.add_argument("-o", "--output", required=True, help="Fixture file to write")
+    record.add_argument("--days", type=int, default=30, help="Calendar days of history to record")
+    record.add_argument("--force", action="store_true", help="Overwrite an existing fixture file")
+    args = parser.parse_args()
+    if os.path.exists(args.output) and not args.force:
+        record.error(f"{args.output} exists; pass --force to overwrite it")
+
+    fixture = record_fixture([t.upper() for t in args.tickers], args.days)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, indent=1, default=str)
+    print(f"✅ Recorded {len(fixture)} tickers to {args.output}")
@@ -0,0 +1,278 @@
+"""Concurrent latency and cost probe of Claude models, and the model choice it feeds.
+
+``python test_all_claude_models.py`` checks every candidate model with one
+request, then sends ``--requests`` timed, streamed recommendation prompts to
+each model that works. All models are probed at once, with at most
+``--concurrency`` requests in flight (asyncio + semaphore). For each model it
+reports time to first token, total latency percentiles, output tokens/s and
+the estimated cost per 1,000 recommendations (``llm_metering.PRICING``).
+
+Working models are ranked by p50 latency weighted by relative cost:
+``p50 * (cost / cheapest cost) ** cost_weight``. The ranking is written to
+``MODEL_PROBE_PATH``, where ``select_model()`` finds it at startup
+(``recommendation_service.RECOMMENDATION_MODEL``, used by main.py and app.py).
+The probed best model is only used by processes talking to the same API
+endpoint (``ANTHROPIC_BASE_URL``) the probe measured. ``CLAUDE_MODEL``
+overrides the choice.
+
+``--stub`` probes an in-process ``anthropic_stub_server`` with made-up
+per-model latencies instead of the real API (results go to a separate
+``-stub`` file). A stub started on its own is probed, and then used by the
+app, through ``ANTHROPIC_BASE_URL`` like any other endpoint.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+from llm_metering import estimate_cost
+from percentiles import percentile
+
+DEFAULT_MODEL = "claude-3-5-haiku-20241022"
+PROBE_PATH = os.environ.get("MODEL_PROBE_PATH", os.path.join(".cache", "model_probe.json"))
+
+CANDIDATE_MODELS = [
+    # Claude 4.x
+    "claude-haiku-4-5",
+    "claude-sonnet-4-5",
+    "claude-sonnet-4-20250514",
+    "claude-opus-4-1",
+
+    # Claude 3.5 / 3.7
+    "claude-3-5-haiku-20241022",
+    "claude-3-5-sonnet-20241022",
+    "claude-3-5-sonnet-20240620",
+    "claude-3-5-sonnet-latest",
+    "claude-3-7-sonnet-20250219",
+
+    # Claude 3
+    "claude-3-opus-20240229",
+    "claude-3-opus-latest",
+    "claude-3-sonnet-20240229",
+    "claude-3-haiku-20240307",
+]
+
+# Models served by --stub: (time to first token ms, ms per streamed word); the rest are 404s
+STUB_MODELS = {
+    "claude-3-haiku-20240307": (180, 4),
+    "claude-3-5-haiku-20241022": (220, 5),
+    "claude-haiku-4-5": (200, 4),
+    "claude-3-5-sonnet-20241022": (450, 9),
+    "claude-sonnet-4-20250514": (500, 10),
+    "claude-3-opus-20240229": (1100, 25),
+}
+
+
+def _api_base_url() -> str | None:
+    """The API endpoint this process talks to; None is the real Anthropic API."""
+    base_url = os.environ.get("ANTHROPIC_BASE_URL")
+    return base_url.rstrip("/") if base_url else None
+
+
+def load_results(path: str = PROBE_PATH) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def select_model(default: str = DEFAULT_MODEL, path: str = PROBE_PATH) -> str:
+    """Model to use: ``CLAUDE_MODEL``, else the probe's best model for this endpoint, else ``default``."""
+    override = os.environ.get("CLAUDE_MODEL")
+    if override:
+        return override
+    results = load_results(path)
+    if not results or not results.get("best") or results.get("base_url") != _api_base_url():
+        return default
+    return results["best"]
+
+
+def classify_error(error: Exception) -> str:
+    error_str = str(error)
+    if "not_found_error" in error_str:
+        return "Not available"
+    if "permission" in error_str.lower() or "access" in error_str.lower():
+        return "Permission denied - upgrade needed"
+    return error_str[:80]
+
+
+# --- Probe ---
+
+async def _timed_request(client, model: str, max_tokens: int, semaphore: asyncio.Semaphore) -> dict:
+    from recommendation_service import RECOMMENDATION_SYSTEM, recommendation_prompt
+
+    messages = [{"role": "user", "content": recommendation_prompt("NVDA", 120.5, 150.0)}]
+    async with semaphore:
+        start = time.perf_counter()
+        ttft = None
+        async with client.stream_message(model, max_tokens, system=RECOMMENDATION_SYSTEM,
+                                         messages=messages) as stream:
+            async for _ in stream.text_stream:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+            message = await stream.get_final_message()
+        total = time.perf_counter() - start
+    return {
+        "ttft_s": total if ttft is None else ttft,
+        "total_s": total,
+        "input_tokens": message.usage.input_tokens,
+        "output_tokens": message.usage.output_tokens,
+    }
+
+
+def _summarize(model: str, samples: list[dict], errors: list[Exception]) -> dict:
+    ttft = [s["ttft_s"] for s in samples]
+    total = [s["total_s"] for s in samples]
+    generating = sum(s["total_s"] - s["ttft_s"] for s in samples)
+    output_tokens = sum(s["output_tokens"] for s in samples)
+    cost = sum(estimate_cost(model, s["input_tokens"], s["output_tokens"]) for s in samples) / len(samples)
+    return {
+        "model": model,
+        "ok": True,
+        "requests": len(samples),
+        "errors": len(errors),
+        "ttft_p50_ms": round(1000 * percentile(ttft, 50), 1),
+        "ttft_p95_ms": round(1000 * percentile(ttft, 95), 1),
+        "total_p50_ms": round(1000 * percentile(total, 50), 1),
+        "total_p95_ms": round(1000 * percentile(total, 95), 1),
+        "total_p99_ms": round(1000 * percentile(total, 99), 1),
+        "tokens_per_s": round(output_tokens / generating, 1) if generating > 0 else None,
+        "cost_per_1k_usd": round(1000 * cost, 4),
+    }
+
+
+async def probe_model(client, model: str, requests: int, max_tokens: int, semaphore: asyncio.Semaphore) -> dict:
+    # The first request checks availability (unavailable models cost one call)
+    # and warms the connection; it is not part of the measurement
+    try:
+        await _timed_request(client, model, max_tokens, semaphore)
+    except Exception as e:
+        return {"model": model, "ok": False, "error": classify_error(e)}
+    results = await asyncio.gather(*(_timed_request(client, model, max_tokens, semaphore)
+                                     for _ in range(requests)), return_exceptions=True)
+    samples = [r for r in results if not isinstance(r, BaseException)]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if not samples:
+        return {"model": model, "ok": False, "error": classify_error(errors[0])}
+    return _summarize(model, samples, errors)
+
+
+def rank(results: list[dict], cost_weight: float) -> list[dict]:
+    """Working models best first (with their ``score``), then the failed ones."""
+    working = [r for r in results if r["ok"]]
+    costs = [r["cost_per_1k_usd"] for r in working if r["cost_per_1k_usd"] > 0]
+    cheapest = min(costs) if costs else 0.0
+    for r in working:
+        relative_cost = r["cost_per_1k_usd"] / cheapest if cheapest and r["cost_per_1k_usd"] else 1.0
+        r["score"] = round(r["total_p50_ms"] * relative_cost ** cost_weight, 1)
+    working.sort(key=lambda r: r["score"])
+    return working + [r for r in results if not r["ok"]]
+
+
+async def run_probe(models: list[str], requests: int = 5, concurrency: int = 4, max_tokens: int = 300,
+                    cost_weight: float = 0.5, api_key: str | None = None, base_url: str | None = None) -> dict:
+    """Probe all ``models`` concurrently; returns the ranked results (see ``save_results``)."""
+    from anthropic_simple import AsyncAnthropicClient
+
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    async with AsyncAnthropicClient(api_key, base_url=base_url, max_connections=concurrency) as client:
+        results = await asyncio.gather(*(probe_model(client, model, requests, max_tokens, semaphore)
+                                         for model in models))
+    ranked = rank(list(results), cost_weight)
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "base_url": (base_url or "").rstrip("/") or _api_base_url(),
+        "requests": requests,
+        "concurrency": concurrency,
+        "max_tokens": max_tokens,
+        "cost_weight": cost_weight,
+        "wall_s": round(time.perf_counter() - started, 2),
+        "best": ranked[0]["model"] if ranked and ranked[0]["ok"] else None,
+        "models": ranked,
+    }
+
+
+def save_results(results: dict, path: str = PROBE_PATH):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    os.replace(tmp, path)
+
+
+def print_results(results: dict):
+    working = [r for r in results["models"] if r["ok"]]
+    failed = [r for r in results["models"] if not r["ok"]]
+    print("=" * 100)
+    print(f"CLAUDE MODEL PROBE ({results['requests']} requests per model, {results['concurrency']} in flight, "
+          f"{results['wall_s']:.1f}s" + (f", {results['base_url']}" if results["base_url"] else "") + ")")
+    print("=" * 100)
+    print(f"\n✅ WORKING MODELS ({len(working)}), best first:")
+    if working:
+        print(f"   {'model':<30}{'TTFT p50':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'tok/s':>8}{'$/1k':>9}{'score':>9}")
+        for r in working:
+            tokens_per_s = f"{r['tokens_per_s']:.0f}" if r["tokens_per_s"] is not None else "-"
+            print(f"   {r['model']:<30}{r['ttft_p50_ms']:>8.0f}ms{r['total_p50_ms']:>7.0f}ms"
+                  f"{r['total_p95_ms']:>7.0f}ms{r['total_p99_ms']:>7.0f}ms{tokens_per_s:>8}"
+                  f"{r['cost_per_1k_usd']:>9.3f}{r['score']:>9.0f}"
+                  + (f"  ({r['errors']} errors)" if r["errors"] else ""))
+    else:
+        print("   None")
+
+    print(f"\n❌ FAILED MODELS ({len(failed)}):")
+    if failed:
+        for r in failed:
+            print(f"   • {r['model']}")
+            print(f"     Reason: {r['error']}")
+    else:
+        print("   None")
+
+    print("\n" + "=" * 100)
+    if results["best"]:
+        print(f"✅ BEST MODEL TO USE: {results['best']}")
+    else:
+        print("❌ No working models found! Check your API key.")
+    print("=" * 100)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", nargs="+", default=CANDIDATE_MODELS)
+    parser.add_argument("--requests", type=int, default=5, help="Timed requests per working model")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight across all models")
+    parser.add_argument("--max-tokens", type=int, default=300)
+    parser.add_argument("--cost-weight", type=float, default=0.5,
+                        help="0 ranks by latency only; 1 weighs relative cost as much as latency")
+    parser.add_argument("--stub", action="store_true", help="Probe a local stub server instead of the API")
+    parser.add_argument("--output", help=f"Results file read by select_model() (default {PROBE_PATH}; "
+                                         f"with --stub a separate file next to it)")
+    args = parser.parse_args(argv)
+
+    base_url = None
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if args.stub:
+        from anthropic_stub_server import start_stub_server
+
+        server = start_stub_server(models=STUB_MODELS)
+        base_url = server.url
+        api_key = api_key or "stub"
+    elif not api_key:
+        raise SystemExit("ANTHROPIC_API_KEY is not set (or use --stub)")
+
+    # Measurements of the throwaway in-process stub must not replace the real ones
+    output = args.output or (os.path.splitext(PROBE_PATH)[0] + "-stub.json" if args.stub else PROBE_PATH)
+    results = asyncio.run(run_probe(args.models, args.requests, args.concurrency, args.max_tokens,
+                                    args.cost_weight, api_key=api_key, base_url=base_url))
+    print_results(results)
+    save_results(results, output)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
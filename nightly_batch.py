@@ -0,0 +1,361 @@
+"""Nightly recommendation refresh through the Message Batches API.
+
+A nightly run does not need interactive latency, so instead of one
+synchronous ``messages.create`` per symbol (``batch.py``) it:
+
+1. collects the watchlist: ticker resolution, quote and technicals per
+   symbol, concurrently, and builds the exact request
+   ``pipeline.AnalysisPipeline.recommend`` would send (symbols whose answer
+   is still in ``llm_cache`` are served from there);
+2. submits those requests as Message Batches of up to ``--batch-size``,
+   each distinct request (``llm_cache`` key) once: entries that resolve to
+   the same ticker and prices, e.g. "Apple" and "AAPL", share one;
+3. polls every ``NIGHTLY_POLL_INTERVAL`` seconds until each batch has ended,
+   then joins the results back to the tickers by ``custom_id``, each one to
+   every entry that shares the request, and stores every answer in
+   ``llm_cache``, so the next CLI/app lookup is a cache hit.
+
+The run state (collected symbols, requests, batch IDs, joined results) is
+saved under ``NIGHTLY_DIR`` after every step. ``--resume`` picks an
+interrupted run up where it stopped: batches already submitted are only
+polled, never sent twice.
+
+Batched calls are billed at half the synchronous price
+(``BATCH_DISCOUNT``); the summary reports throughput and the cost per 1,000
+symbols at both prices. ``--stub`` runs everything offline against an
+in-process ``anthropic_stub_server`` and the ``replay`` market data provider.
+
+Usage:
+    python nightly_batch.py watchlist.txt
+    python nightly_batch.py --resume                 # the last unfinished run
+    python nightly_batch.py --stub watchlist.txt --poll-interval 1
+"""
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+NIGHTLY_DIR = os.environ.get("NIGHTLY_DIR", os.path.join(".cache", "nightly"))
+DEFAULT_POLL_INTERVAL = float(os.environ.get("NIGHTLY_POLL_INTERVAL", 60))   # seconds
+# The API takes up to 100,000 requests (256 MB) per batch; smaller batches end sooner
+DEFAULT_BATCH_SIZE = 10_000
+BATCH_DISCOUNT = 0.5
+
+
+def custom_id(index: int, ticker: str) -> str:
+    """Unique per run and within the API's ``^[a-zA-Z0-9_-]{1,64}$``."""
+    return f"s{index:05d}-" + re.sub(r"[^A-Za-z0-9_-]", "_", ticker)[:50]
+
+
+class NightlyRun:
+    """One nightly run and its state file (``<NIGHTLY_DIR>/<run_id>.json``)."""
+
+    def __init__(self, state: dict, directory: str = NIGHTLY_DIR):
+        self.state = state
+        self.path = os.path.join(directory, f"{state['run_id']}.json")
+
+    @classmethod
+    def new(cls, entries: list[str], directory: str = NIGHTLY_DIR) -> "NightlyRun":
+        run_id = datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        return cls({"run_id": run_id, "created_at": time.time(), "status": "collecting", "entries": entries,
+                    "symbols": {}, "batches": [], "collect_s": None, "finished_at": None}, directory)
+
+    @classmethod
+    def load(cls, run_id: str | None = None, directory: str = NIGHTLY_DIR) -> "NightlyRun":
+        """The run ``run_id``, or the most recent one that has not finished."""
+        if run_id is None:
+            names = sorted(name for name in os.listdir(directory) if name.endswith(".json")) \
+                if os.path.isdir(directory) else []
+            for name in reversed(names):
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    state = json.load(f)
+                if state["status"] != "done":
+                    return cls(state, directory)
+            raise SystemExit(f"No unfinished nightly run in {directory}")
+        with open(os.path.join(directory, f"{run_id}.json"), encoding="utf-8") as f:
+            return cls(json.load(f), directory)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, default=float, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    @property
+    def shared(self) -> dict[str, list[str]]:
+        """Custom ID -> every custom ID with the same request (by ``llm_cache`` key), in watchlist order."""
+        from llm_cache import prompt_key
+
+        groups = {}
+        for cid, record in self.state["symbols"].items():
+            if record["request"] is not None:
+                groups.setdefault(prompt_key(**record["request"]), []).append(cid)
+        return {cid: cids for cids in groups.values() for cid in cids}
+
+    @property
+    def pending(self) -> list[str]:
+        """Custom IDs that still need a batch submission, one per distinct request."""
+        submitted = {cid for batch in self.state["batches"] for cid in batch["custom_ids"]}
+        pending, seen = [], set()
+        for cid, cids in self.shared.items():
+            if cids[0] in seen or submitted.intersection(cids):
+                continue
+            seen.add(cids[0])
+            pending.append(cid)
+        return pending
+
+
+# --- Collect ---
+
+def collect_symbol(index: int, entry: str, pipeline, resolve_ticker, refresh: bool = False) -> tuple[str, dict]:
+    """Resolve, quote and build the recommendation request for one watchlist entry."""
+    from pipeline import looks_like_ticker
+
+    record = {"input": entry, "ticker": None, "current_price": None, "target_price": None, "request": None,
+              "recommendation": None, "source": None, "input_tokens": 0, "output_tokens": 0, "error": None}
+    try:
+        ticker = entry if looks_like_ticker(entry) else resolve_ticker(entry)["ticker"]
+        record["ticker"] = ticker
+        if not looks_like_ticker(ticker):
+            record["error"] = f"'{entry}' does not appear to have a valid stock ticker symbol."
+            return custom_id(index, entry), record
+        stock_data = pipeline.stock_data(ticker)
+        record["current_price"] = stock_data["current_price"]
+        record["target_price"] = stock_data["target_price"]
+        if stock_data["error"]:
+            record["error"] = stock_data["error"]
+            return custom_id(index, ticker), record
+        request = pipeline.recommendation_request(ticker, stock_data["current_price"], stock_data["target_price"],
+                                                  pipeline.technicals(ticker))
+        cached = None if refresh else pipeline.response_cache.get(**request)
+        if cached is not None:
+            record.update(recommendation=cached["text"].strip(), source="cache")
+        else:
+            record["request"] = request
+    except Exception as e:
+        record["error"] = f"Error analyzing {entry}: {str(e)}"
+    return custom_id(index, record["ticker"] or entry), record
+
+
+def collect(run: NightlyRun, pipeline, resolve_ticker, workers: int = 8, refresh: bool = False):
+    from bulk_quotes import BulkQuoteProvider
+    from pipeline import looks_like_ticker
+
+    start = time.perf_counter()
+    entries = run.state["entries"]
+    tickers = [entry for entry in entries if looks_like_ticker(entry)]
+    if tickers:
+        try:
+            BulkQuoteProvider().get_quotes(tickers)
+        except Exception as e:
+            print(f"⚠️ Bulk quote prefetch failed, falling back to per-symbol requests: {e}", file=sys.stderr)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(lambda item: collect_symbol(*item, pipeline, resolve_ticker, refresh),
+                           enumerate(entries))
+        run.state["symbols"] = dict(results)
+    run.state["collect_s"] = time.perf_counter() - start
+    run.state["status"] = "submitting"
+    run.save()
+
+
+# --- Submit, poll, join ---
+
+def submit(run: NightlyRun, batches, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Submit every request not yet in a batch; each batch ID is saved before the next one is sent."""
+    pending = run.pending
+    symbols = run.state["symbols"]
+    for i in range(0, len(pending), batch_size):
+        chunk = pending[i:i + batch_size]
+        batch = batches.create(requests=[{"custom_id": cid, "params": symbols[cid]["request"]} for cid in chunk])
+        run.state["batches"].append({"id": batch.id, "custom_ids": chunk, "submitted_at": time.time(),
+                                     "ended_at": None})
+        run.save()
+        print(f"📤 Submitted batch {batch.id} ({len(chunk)} requests)", file=sys.stderr)
+    run.state["status"] = "polling"
+    run.save()
+
+
+def join_results(run: NightlyRun, batch_id: str, results, response_cache):
+    """Attach each result to every symbol sharing its request and store the answers in ``llm_cache``.
+
+    The tokens are counted once, on the symbol whose ``custom_id`` was submitted.
+    """
+    symbols = run.state["symbols"]
+    shared = run.shared
+    for item in results:
+        record = symbols.get(item.custom_id)
+        if record is None:
+            continue
+        result = item.result
+        if result.type != "succeeded":
+            error = getattr(getattr(result, "error", None), "error", None)
+            for cid in shared.get(item.custom_id, [item.custom_id]):
+                symbols[cid]["error"] = f"Batch request {result.type}" + (f": {error.message}" if error else "")
+            continue
+        message = result.message
+        response_cache.put(response=message, **record["request"])
+        for cid in shared.get(item.custom_id, [item.custom_id]):
+            symbols[cid].update(recommendation=message.content[0].text.strip(), source="batch", error=None)
+        record.update(input_tokens=message.usage.input_tokens, output_tokens=message.usage.output_tokens)
+    for submitted in next(batch["custom_ids"] for batch in run.state["batches"] if batch["id"] == batch_id):
+        for cid in shared.get(submitted, [submitted]):
+            if symbols[cid]["source"] is None and symbols[cid]["error"] is None:
+                symbols[cid]["error"] = "No result in the batch"
+
+
+def poll(run: NightlyRun, batches, response_cache, interval: float = DEFAULT_POLL_INTERVAL):
+    """Wait until every submitted batch has ended and its results are joined."""
+    while True:
+        open_batches = [batch for batch in run.state["batches"] if batch["ended_at"] is None]
+        if not open_batches:
+            break
+        for entry in open_batches:
+            batch = batches.retrieve(entry["id"])
+            if batch.processing_status != "ended":
+                counts = batch.request_counts
+                print(f"⏳ {entry['id']}: {counts.processing} processing, {counts.succeeded} succeeded",
+                      file=sys.stderr)
+                continue
+            join_results(run, entry["id"], batches.results(entry["id"]), response_cache)
+            entry["ended_at"] = time.time()
+            run.save()
+            print(f"📥 {entry['id']} ended, results joined", file=sys.stderr)
+        if any(batch["ended_at"] is None for batch in run.state["batches"]):
+            time.sleep(interval)
+    run.state["status"] = "done"
+    run.state["finished_at"] = time.time()
+    run.save()
+
+
+# --- Report ---
+
+def summarize(run: NightlyRun, model: str) -> dict:
+    from llm_metering import estimate_cost
+
+    state = run.state
+    records = list(state["symbols"].values())
+    input_tokens = sum(r["input_tokens"] for r in records)
+    output_tokens = sum(r["output_tokens"] for r in records)
+    sync_cost = estimate_cost(model, input_tokens, output_tokens)
+    batches = state["batches"]
+    batch_s = (max(b["ended_at"] for b in batches) - min(b["submitted_at"] for b in batches)) if batches else 0.0
+    elapsed = (state["finished_at"] or time.time()) - state["created_at"]
+    symbols = len(records)
+    per_1k = 1000 / symbols if symbols else 0.0
+    return {
+        "run_id": state["run_id"],
+        "symbols": symbols,
+        "succeeded": sum(1 for r in records if r["recommendation"] and not r["error"]),
+        "from_cache": sum(1 for r in records if r["source"] == "cache"),
+        "batched": sum(1 for r in records if r["source"] == "batch"),
+        "failed": sum(1 for r in records if r["error"]),
+        "batches": len(batches),
+        "requests": sum(len(batch["custom_ids"]) for batch in batches),
+        "collect_s": round(state["collect_s"] or 0.0, 2),
+        "batch_s": round(batch_s, 2),
+        "elapsed_s": round(elapsed, 2),
+        "symbols_per_min": round(60 * symbols / elapsed, 1) if elapsed > 0 else None,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cost_usd": round(BATCH_DISCOUNT * sync_cost, 6),
+        "cost_per_1k_usd": round(BATCH_DISCOUNT * sync_cost * per_1k, 4),
+        "sync_cost_per_1k_usd": round(sync_cost * per_1k, 4),
+    }
+
+
+def write_results(run: NightlyRun, out):
+    """One JSON line per symbol, shaped like ``batch.py`` output (``bulk_reports`` reads either)."""
+    from main import format_recommendation
+
+    for record in run.state["symbols"].values():
+        line = {key: record[key] for key in ("input", "ticker", "current_price", "target_price", "error")}
+        line["recommendation"] = format_recommendation(record["recommendation"]) if record["recommendation"] else None
+        out.write(json.dumps(line, default=float, ensure_ascii=False) + "\n")
+
+
+def print_summary(summary: dict, file=sys.stderr):
+    print("\n" + "=" * 70, file=file)
+    print(f"🌙 Nightly run {summary['run_id']}: {summary['succeeded']}/{summary['symbols']} succeeded "
+          f"({summary['batched']} batched, {summary['from_cache']} from cache, {summary['failed']} failed)", file=file)
+    print("=" * 70, file=file)
+    print(f"   • collect: {summary['collect_s']:.1f}s", file=file)
+    print(f"   • batches: {summary['batches']} ({summary['requests']} requests), "
+          f"submit to last result {summary['batch_s']:.1f}s", file=file)
+    print(f"   • elapsed: {summary['elapsed_s']:.1f}s"
+          + (f" -> {summary['symbols_per_min']:.0f} symbols/min" if summary["symbols_per_min"] else ""), file=file)
+    print(f"   • tokens: input={summary['input_tokens']}, output={summary['output_tokens']}", file=file)
+    print(f"💰 Cost: ${summary['cost_usd']:.4f}, ${summary['cost_per_1k_usd']:.4f} per 1,000 symbols "
+          f"(synchronous calls: ${summary['sync_cost_per_1k_usd']:.4f})", file=file)
+    print("=" * 70, file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("symbols", nargs="*", help="Watchlist file(s) or tickers/company names given directly")
+    parser.add_argument("-o", "--output", help="JSON lines output (default <NIGHTLY_DIR>/<run_id>.jsonl)")
+    parser.add_argument("--resume", nargs="?", const="", metavar="RUN_ID",
+                        help="Continue an interrupted run (default: the last unfinished one)")
+    parser.add_argument("--workers", type=int, default=8, help="Symbols collected at once")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Requests per message batch")
+    parser.add_argument("--poll-interval", type=float, help=f"Seconds between polls (default {DEFAULT_POLL_INTERVAL:g})")
+    parser.add_argument("--refresh", action="store_true", help="Ask again for symbols still in llm_cache")
+    parser.add_argument("--stub", action="store_true",
+                        help="Run offline against a local stub server and replayed market data")
+    parser.add_argument("--stub-batch-ms", type=float, default=3000.0, help="Stub processing time per batch")
+    args = parser.parse_args(argv)
+    if args.resume is None and not args.symbols:
+        parser.error("give a watchlist or --resume")
+
+    poll_interval = args.poll_interval if args.poll_interval is not None else DEFAULT_POLL_INTERVAL
+    if args.stub:
+        from anthropic_stub_server import start_stub_server
+
+        server = start_stub_server(batch_ms=args.stub_batch_ms)
+        os.environ["ANTHROPIC_BASE_URL"] = server.url
+        os.environ.setdefault("ANTHROPIC_API_KEY", "stub")
+        os.environ.setdefault("MARKET_DATA_PROVIDER", "replay")
+        if args.poll_interval is None:
+            poll_interval = 1.0
+
+    from batch import read_watchlist
+    from main import client, pipeline, resolve_ticker
+    from recommendation_service import RECOMMENDATION_MODEL
+
+    # MeteredClient wraps the SDK client; batches are billed apart from the per-minute budget
+    batches = getattr(client, "client", client).messages.batches
+    if args.resume is not None:
+        run = NightlyRun.load(args.resume or None)
+        print(f"↩️ Resuming nightly run {run.state['run_id']} ({run.state['status']})", file=sys.stderr)
+    else:
+        entries = []
+        for item in args.symbols:
+            entries.extend(read_watchlist(item) if os.path.isfile(item) else [item])
+        run = NightlyRun.new(entries)
+        run.save()
+
+    # Tool functions print progress lines; keep them off stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        if run.state["status"] == "collecting":
+            collect(run, pipeline, resolve_ticker, args.workers, args.refresh)
+        if run.state["status"] == "submitting":
+            submit(run, batches, args.batch_size)
+        poll(run, batches, pipeline.response_cache, poll_interval)
+
+    output = args.output or os.path.join(os.path.dirname(run.path), f"{run.state['run_id']}.jsonl")
+    with open(output, "w", encoding="utf-8") as out:
+        write_results(run, out)
+    summary = summarize(run, RECOMMENDATION_MODEL)
+    print_summary(summary)
+    print(f"Results written to {output}", file=sys.stderr)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Packed recommendations: verdicts for many tickers from one Claude call.
+
+Watchlist runs (``batch.py --packed``) send N tickers with their prices and
+technicals in one request instead of N requests that each repeat the system
+prompt. The model answers one ``TICKER|VERDICT|reason`` line per row, which
+``parse_packed`` splits back per ticker.
+
+Pack size adapts to the token limits: a pack holds at most ``max_pack`` rows,
+no more rows than fit ``max_input_tokens`` and, at ``OUTPUT_TOKENS_PER_ROW``
+each, the output cap (``LLM_PACK_MAX_OUTPUT_TOKENS``, and the per-minute
+output budget ``LLM_OUTPUT_TPM`` when one is set). Within that limit it grows
+by one row after a clean pack and halves after a truncated reply or one with
+too many malformed rows. Rows that come back malformed or missing are retried
+on their own, up to ``retries`` times.
+"""
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from llm_metering import DEFAULT_OUTPUT_TPM, estimate_cost, estimate_input_tokens
+from recommendation_service import RECOMMENDATION_MODEL, RECOMMENDATION_SYSTEM, create_message
+
+DEFAULT_MAX_PACK = int(os.environ.get("LLM_PACK_SIZE", 25))
+DEFAULT_MAX_INPUT_TOKENS = int(os.environ.get("LLM_PACK_MAX_INPUT_TOKENS", 20000))
+DEFAULT_MAX_OUTPUT_TOKENS = int(os.environ.get("LLM_PACK_MAX_OUTPUT_TOKENS", 4096))
+OUTPUT_TOKENS_PER_ROW = 40
+# A pack with more malformed rows than this share shrinks the next ones
+MALFORMED_SHRINK_SHARE = 0.2
+
+PACKED_SYSTEM = (RECOMMENDATION_SYSTEM + " You get several stocks, one per line as "
+                 "`TICKER | current price | target price | technicals`. Answer with exactly one line per stock, "
+                 "in the same order, formatted `TICKER|VERDICT|reason`, where VERDICT is BUY, HOLD or SELL and "
+                 "reason is at most 12 words. No other text.")
+
+_ROW_RE = re.compile(r"^\s*([A-Z0-9.\-]+)\s*\|\s*(BUY|HOLD|SELL)\s*\|\s*(.*?)\s*$", re.IGNORECASE)
+
+
+def packed_row(ticker: str, current_price: float, target_price: float, technicals: str = "") -> str:
+    """One prompt line; ``technicals`` is ``indicators.format_technicals`` output."""
+    return f"{ticker} | {current_price} | {target_price}" + (f" | {technicals}" if technicals else "")
+
+
+def packed_prompt(rows: list[tuple]) -> str:
+    return "\n".join(packed_row(*row) for row in rows)
+
+
+def parse_packed(text: str, tickers: list[str]) -> tuple[dict, list[str]]:
+    """``({ticker: {"verdict", "reason"}}, malformed)`` for the tickers that were asked.
+
+    A ticker is malformed when its line is missing, repeated with different
+    verdicts, or not in ``TICKER|VERDICT|reason`` form. Lines for tickers that
+    were not asked are ignored.
+    """
+    asked = set(tickers)
+    parsed = {}
+    conflicting = set()
+    for line in text.splitlines():
+        match = _ROW_RE.match(line)
+        if not match:
+            continue
+        ticker, verdict, reason = match.group(1).upper(), match.group(2).upper(), match.group(3)
+        if ticker not in asked:
+            continue
+        if ticker in parsed and parsed[ticker]["verdict"] != verdict:
+            conflicting.add(ticker)
+        parsed.setdefault(ticker, {"verdict": verdict, "reason": reason})
+    malformed = [ticker for ticker in tickers if ticker not in parsed or ticker in conflicting]
+    return {ticker: row for ticker, row in parsed.items() if ticker not in conflicting}, malformed
+
+
+class PackSizer:
+    """Adaptive pack size within the input/output token limits."""
+
+    def __init__(self, max_pack: int = DEFAULT_MAX_PACK, max_input_tokens: int = DEFAULT_MAX_INPUT_TOKENS,
+                 max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS, output_tokens_per_row: int = OUTPUT_TOKENS_PER_ROW):
+        if DEFAULT_OUTPUT_TPM:
+            # One call must fit in a minute's output budget or it would queue forever
+            max_output_tokens = min(max_output_tokens, DEFAULT_OUTPUT_TPM)
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+        self.output_tokens_per_row = output_tokens_per_row
+        self.limit = max(1, min(max_pack, max_output_tokens // output_tokens_per_row))
+        self.size = self.limit
+        self._lock = threading.Lock()
+
+    def take(self, pending: deque) -> list:
+        """Pop the next pack of rows from ``pending`` (at least one row)."""
+        with self._lock:
+            size = self.size
+        budget = self.max_input_tokens - estimate_input_tokens(PACKED_SYSTEM, [])
+        pack = [pending.popleft()]
+        budget -= len(packed_row(*pack[0])) // 4 + 1
+        while pending and len(pack) < size:
+            cost = len(packed_row(*pending[0])) // 4 + 1
+            if cost > budget:
+                break
+            budget -= cost
+            pack.append(pending.popleft())
+        return pack
+
+    def max_tokens(self, rows: int) -> int:
+        return min(self.max_output_tokens, rows * self.output_tokens_per_row + 16)
+
+    def feedback(self, rows: int, malformed: int, truncated: bool):
+        with self._lock:
+            if truncated or (rows > 1 and malformed > rows * MALFORMED_SHRINK_SHARE):
+                self.size = max(1, self.size // 2)
+            elif rows >= self.size:
+                self.size = min(self.limit, self.size + 1)
+
+
+class PackedRecommender:
+    """Runs packed recommendation calls, a few packs in flight, and retries malformed rows."""
+
+    def __init__(self, client, sizer: PackSizer | None = None, concurrency: int = 4, retries: int = 2,
+                 model: str = RECOMMENDATION_MODEL):
+        self.client = client
+        self.sizer = sizer or PackSizer()
+        self.concurrency = concurrency
+        self.retries = retries
+        self.model = model
+        self.stats = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0, "malformed": 0,
+                      "retries": 0, "truncated": 0, "pack_sizes": []}
+        self._lock = threading.Lock()
+
+    def _call(self, rows: list[tuple]) -> tuple[dict, list[str], bool]:
+        tickers = [row[0] for row in rows]
+        response = create_message(self.client, model=self.model, max_tokens=self.sizer.max_tokens(len(rows)),
+                                  system=PACKED_SYSTEM, messages=[{"role": "user", "content": packed_prompt(rows)}])
+        truncated = getattr(response, "stop_reason", None) == "max_tokens"
+        parsed, malformed = parse_packed(response.content[0].text, tickers)
+        usage = response.usage
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["input_tokens"] += usage.input_tokens
+            self.stats["output_tokens"] += usage.output_tokens
+            self.stats["cost_usd"] += estimate_cost(self.model, usage.input_tokens, usage.output_tokens)
+            self.stats["pack_sizes"].append(len(rows))
+            self.stats["malformed"] += len(malformed)
+            self.stats["truncated"] += truncated
+        return parsed, malformed, truncated
+
+    def recommend_many(self, rows: list[tuple]) -> dict[str, dict]:
+        """Verdicts for ``(ticker, current_price, target_price, technicals)`` rows.
+
+        Returns ``{ticker: {"verdict", "reason", "attempts", "error"}}``; a row
+        still malformed after ``retries`` single-row retries, or whose call
+        failed, has ``verdict`` None and the ``error``.
+        """
+        by_ticker = {row[0]: row for row in rows}
+        results = {}
+        pending = deque(rows)
+        retry = deque()     # (row, attempt) for single-row retries
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency), thread_name_prefix="packed") as pool:
+            inflight = {}
+            while pending or retry or inflight:
+                while (pending or retry) and len(inflight) < self.concurrency:
+                    if retry:
+                        row, attempt = retry.popleft()
+                        pack = [row]
+                        with self._lock:
+                            self.stats["retries"] += 1
+                    else:
+                        pack, attempt = self.sizer.take(pending), 0
+                    inflight[pool.submit(self._call, pack)] = (pack, attempt)
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pack, attempt = inflight.pop(future)
+                    try:
+                        parsed, malformed, truncated = future.result()
+                    except Exception as e:
+                        for row in pack:
+                            results[row[0]] = {"verdict": None, "reason": None, "attempts": attempt + 1,
+                                               "error": str(e)}
+                        continue
+                    if attempt == 0:
+                        self.sizer.feedback(len(pack), len(malformed), truncated)
+                    for ticker, row in parsed.items():
+                        results[ticker] = dict(row, attempts=attempt + 1, error=None)
+                    for ticker in malformed:
+                        if attempt < self.retries:
+                            retry.append((by_ticker[ticker], attempt + 1))
+                        else:
+                            results[ticker] = {"verdict": None, "reason": None, "attempts": attempt + 1,
+                                               "error": f"No parseable verdict for {ticker}"}
+        return results
@@ -1,231 +1,284 @@
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.pdfgen import canvas
+from copy import copy
 from datetime import datetime
 import io
-import plotly.graph_objects as go
 
-def create_pdf_report(ticker, company_name, sector, industry, current_price, target_price, 
-                      recommendation, recommendation_text, ticker_info, price_diff_pct):
-    """Generate a professional PDF report for stock analysis"""
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
-                           topMargin=72, bottomMargin=18)
-    
-    # Container for the 'Flowable' objects
-    elements = []
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1e3c72'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#2a5298'),
-        spaceAfter=12,
-        spaceBefore=12,
-        fontName='Helvetica-Bold'
-    )
-    
-    normal_style = styles['Normal']
-    normal_style.fontSize = 11
-    normal_style.leading = 14
-    
-    # Header
-    header = Paragraph(f"<b>AI STOCK ADVISOR REPORT</b>", title_style)
-    elements.append(header)
-    
-    # Company header
-    company_header = Paragraph(f"<b>{company_name} ({ticker})</b>", heading_style)
-    elements.append(company_header)
-    
-    # Date and time
-    date_text = Paragraph(f"<i>Report Generated: {datetime.now().strftime('%B %d, %Y at %H:%M:%S')}</i>", 
-                         normal_style)
-    elements.append(date_text)
-    elements.append(Spacer(1, 20))
-    
-    # Recommendation Box
-    if "BUY" in recommendation.upper():
-        rec_color = colors.HexColor('#4caf50')
-        rec_text = "🟢 BUY"
-    elif "SELL" in recommendation.upper():
-        rec_color = colors.HexColor('#f44336')
-        rec_text = "🔴 SELL"
-    else:
-        rec_color = colors.HexColor('#ff9800')
-        rec_text = "🟡 HOLD"
-    
-    rec_data = [[Paragraph(f"<b>RECOMMENDATION: {rec_text}</b>", 
-                          ParagraphStyle('rec', parent=styles['Normal'], 
-                                       fontSize=18, textColor=colors.white,
-                                       alignment=TA_CENTER))]]
-    rec_table = Table(rec_data, colWidths=[6.5*inch])
-    rec_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), rec_color),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 15),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
-    ]))
-    elements.append(rec_table)
-    elements.append(Spacer(1, 20))
-    
-    # Key Metrics Section
-    elements.append(Paragraph("<b>KEY METRICS</b>", heading_style))
-    
-    price_diff = target_price - current_price
-    
-    metrics_data = [
-        ['Metric', 'Value'],
-        ['Current Price', f'${current_price:.2f}'],
-        ['Target Price (Analysts)', f'${target_price:.2f}'],
-        ['Price Difference', f'${price_diff:+.2f}'],
-        ['Potential Growth', f'{price_diff_pct:+.2f}%'],
-        ['Sector', sector],
-        ['Industry', industry],
-    ]
-    
-    # Add Market Cap if available
-    market_cap = ticker_info.get('marketCap')
-    if market_cap:
-        market_cap_b = market_cap / 1e9
-        metrics_data.append(['Market Cap', f'${market_cap_b:.2f}B'])
-    
-    metrics_table = Table(metrics_data, colWidths=[3*inch, 3.5*inch])
-    metrics_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2a5298')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-    ]))
-    elements.append(metrics_table)
-    elements.append(Spacer(1, 20))
-    
-    # AI Analysis Section
-    elements.append(Paragraph("<b>AI ANALYSIS & RATIONALE</b>", heading_style))
-    
-    # Clean and format recommendation text
-    analysis_text = recommendation_text.replace('\n\n', '<br/><br/>')
-    analysis_para = Paragraph(analysis_text, normal_style)
-    elements.append(analysis_para)
-    elements.append(Spacer(1, 20))
-    
-    # Additional Financial Metrics
-    elements.append(Paragraph("<b>ADDITIONAL FINANCIAL METRICS</b>", heading_style))
-    
-    extra_metrics_data = [
-        ['Metric', 'Value'],
-    ]
-    
-    pe_ratio = ticker_info.get('trailingPE')
-    if pe_ratio:
-        extra_metrics_data.append(['P/E Ratio', f'{pe_ratio:.2f}'])
-    
-    pb_ratio = ticker_info.get('priceToBook')
-    if pb_ratio:
-        extra_metrics_data.append(['P/B Ratio', f'{pb_ratio:.2f}'])
-    
-    div_yield = ticker_info.get('dividendYield')
-    if div_yield:
-        extra_metrics_data.append(['Dividend Yield', f'{div_yield*100:.2f}%'])
-    
-    beta = ticker_info.get('beta')
-    if beta:
-        extra_metrics_data.append(['Beta (Volatility)', f'{beta:.2f}'])
-    
-    volume = ticker_info.get('volume')
-    if volume:
-        extra_metrics_data.append(['Trading Volume', f'{volume:,.0f}'])
-    
-    if len(extra_metrics_data) > 1:
-        extra_table = Table(extra_metrics_data, colWidths=[3*inch, 3.5*inch])
-        extra_table.setStyle(TableStyle([
+DISCLAIMER_TEXT = """
+    This recommendation is for informational purposes only and does not constitute financial advice.
+    Investing in stocks carries risk. The information provided is based on current market data and AI analysis,
+    which may not account for all factors affecting stock performance. Always consult with a qualified financial
+    advisor before making investment decisions. Past performance does not guarantee future results.
+    """
+
+
+class ReportBuilder:
+    """Builds stock analysis PDFs.
+
+    reportlab is imported on first construction, and all styles, table styles
+    and static flowables (headings, disclaimer, footer) are created once and
+    reused for every report, so generating thousands of reports only pays for
+    the per-ticker content. Create one builder and call ``build`` repeatedly.
+    """
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_CENTER, TA_LEFT
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+        self._colors = colors
+        self._letter = letter
+        self._inch = inch
+        self._SimpleDocTemplate = SimpleDocTemplate
+        self._Table = Table
+        self._Paragraph = Paragraph
+        self._Spacer = Spacer
+
+        styles = getSampleStyleSheet()
+
+        # Custom styles
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#1e3c72'),
+            spaceAfter=30,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        )
+
+        self.heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=16,
+            textColor=colors.HexColor('#2a5298'),
+            spaceAfter=12,
+            spaceBefore=12,
+            fontName='Helvetica-Bold'
+        )
+
+        # Own copy instead of mutating the shared sample stylesheet's 'Normal'
+        self.normal_style = ParagraphStyle('ReportNormal', parent=styles['Normal'], fontSize=11, leading=14)
+
+        self.rec_style = ParagraphStyle('rec', parent=self.normal_style,
+                                        fontSize=18, textColor=colors.white,
+                                        alignment=TA_CENTER)
+
+        self.potential_styles = {
+            color_name: ParagraphStyle(f'potential-{color_name}', parent=self.normal_style,
+                                       fontSize=14, textColor=getattr(colors, color_name))
+            for color_name in ("green", "blue", "orange", "red")
+        }
+
+        # Recommendation box, one table style per verdict
+        self.rec_table_styles = {}
+        for verdict, hex_color in (("BUY", '#4caf50'), ("SELL", '#f44336'), ("HOLD", '#ff9800')):
+            self.rec_table_styles[verdict] = TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor(hex_color)),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('TOPPADDING', (0, 0), (-1, -1), 15),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
+            ])
+
+        self.metrics_table_style = TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2a5298')),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
             ('FONTSIZE', (0, 0), (-1, 0), 12),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
             ('GRID', (0, 0), (-1, -1), 1, colors.black),
             ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-        ]))
-        elements.append(extra_table)
-        elements.append(Spacer(1, 20))
-    
-    # Investment Potential Assessment
-    elements.append(Paragraph("<b>INVESTMENT POTENTIAL ASSESSMENT</b>", heading_style))
-    
-    if price_diff_pct > 20:
-        potential = "🔥 HIGH GROWTH POTENTIAL (20%+)"
-        potential_color = colors.green
-    elif price_diff_pct > 10:
-        potential = "📈 MODERATE GROWTH POTENTIAL (10-20%)"
-        potential_color = colors.blue
-    elif price_diff_pct > 0:
-        potential = "⚖️ LOW GROWTH POTENTIAL (0-10%)"
-        potential_color = colors.orange
-    else:
-        potential = "📉 STOCK ABOVE TARGET PRICE"
-        potential_color = colors.red
-    
-    potential_para = Paragraph(f"<b>{potential}</b>", 
-                              ParagraphStyle('potential', parent=styles['Normal'],
-                                           fontSize=14, textColor=potential_color))
-    elements.append(potential_para)
-    elements.append(Spacer(1, 20))
-    
-    # Disclaimer
-    elements.append(Paragraph("<b>DISCLAIMER</b>", heading_style))
-    disclaimer_text = """
-    This recommendation is for informational purposes only and does not constitute financial advice. 
-    Investing in stocks carries risk. The information provided is based on current market data and AI analysis, 
-    which may not account for all factors affecting stock performance. Always consult with a qualified financial 
-    advisor before making investment decisions. Past performance does not guarantee future results.
-    """
-    disclaimer_para = Paragraph(disclaimer_text, 
-                               ParagraphStyle('disclaimer', parent=styles['Normal'],
-                                            fontSize=9, textColor=colors.grey,
-                                            alignment=TA_LEFT))
-    elements.append(disclaimer_para)
-    elements.append(Spacer(1, 20))
-    
-    # Footer
-    footer_text = Paragraph(
-        "<i>Powered by Claude AI & Yahoo Finance | © 2025 Trader 2.0 Club</i>",
-        ParagraphStyle('footer', parent=styles['Normal'], 
-                      fontSize=9, textColor=colors.grey,
-                      alignment=TA_CENTER)
+        ])
+
+        self.extra_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2a5298')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+        ])
+
+        # Static flowables, parsed once. reportlab keeps layout state on flowable
+        # instances, so each report gets shallow copies.
+        self.spacer = Spacer(1, 20)
+        self.header = Paragraph("<b>AI STOCK ADVISOR REPORT</b>", self.title_style)
+        self.headings = {
+            title: Paragraph(f"<b>{title}</b>", self.heading_style)
+            for title in ("KEY METRICS", "AI ANALYSIS & RATIONALE", "ADDITIONAL FINANCIAL METRICS",
+                          "INVESTMENT POTENTIAL ASSESSMENT", "DISCLAIMER")
+        }
+        self.disclaimer = Paragraph(DISCLAIMER_TEXT,
+                                    ParagraphStyle('disclaimer', parent=self.normal_style,
+                                                   fontSize=9, textColor=colors.grey,
+                                                   alignment=TA_LEFT))
+        self.footer = Paragraph(
+            "<i>Powered by Claude AI & Yahoo Finance | © 2025 Trader 2.0 Club</i>",
+            ParagraphStyle('footer', parent=self.normal_style,
+                           fontSize=9, textColor=colors.grey,
+                           alignment=TA_CENTER)
+        )
+
+    def build(self, ticker, company_name, sector, industry, current_price, target_price,
+              recommendation, recommendation_text, ticker_info, price_diff_pct):
+        """Generate a professional PDF report for stock analysis"""
+        Paragraph, Table, inch = self._Paragraph, self._Table, self._inch
+
+        buffer = io.BytesIO()
+        doc = self._SimpleDocTemplate(buffer, pagesize=self._letter, rightMargin=72, leftMargin=72,
+                                      topMargin=72, bottomMargin=18)
+
+        # Container for the 'Flowable' objects
+        elements = [copy(self.header)]
+
+        # Company header
+        elements.append(Paragraph(f"<b>{company_name} ({ticker})</b>", self.heading_style))
+
+        # Date and time
+        date_text = Paragraph(f"<i>Report Generated: {datetime.now().strftime('%B %d, %Y at %H:%M:%S')}</i>",
+                              self.normal_style)
+        elements.append(date_text)
+        elements.append(copy(self.spacer))
+
+        # Recommendation Box
+        if "BUY" in recommendation.upper():
+            verdict, rec_text = "BUY", "🟢 BUY"
+        elif "SELL" in recommendation.upper():
+            verdict, rec_text = "SELL", "🔴 SELL"
+        else:
+            verdict, rec_text = "HOLD", "🟡 HOLD"
+
+        rec_table = Table([[Paragraph(f"<b>RECOMMENDATION: {rec_text}</b>", self.rec_style)]],
+                          colWidths=[6.5*inch])
+        rec_table.setStyle(self.rec_table_styles[verdict])
+        elements.append(rec_table)
+        elements.append(copy(self.spacer))
+
+        # Key Metrics Section
+        elements.append(copy(self.headings["KEY METRICS"]))
+
+        price_diff = target_price - current_price
+
+        metrics_data = [
+            ['Metric', 'Value'],
+            ['Current Price', f'${current_price:.2f}'],
+            ['Target Price (Analysts)', f'${target_price:.2f}'],
+            ['Price Difference', f'${price_diff:+.2f}'],
+            ['Potential Growth', f'{price_diff_pct:+.2f}%'],
+            ['Sector', sector],
+            ['Industry', industry],
+        ]
+
+        # Add Market Cap if available
+        market_cap = ticker_info.get('marketCap')
+        if market_cap:
+            market_cap_b = market_cap / 1e9
+            metrics_data.append(['Market Cap', f'${market_cap_b:.2f}B'])
+
+        metrics_table = Table(metrics_data, colWidths=[3*inch, 3.5*inch])
+        metrics_table.setStyle(self.metrics_table_style)
+        elements.append(metrics_table)
+        elements.append(copy(self.spacer))
+
+        # AI Analysis Section
+        elements.append(copy(self.headings["AI ANALYSIS & RATIONALE"]))
+
+        # Clean and format recommendation text
+        analysis_text = recommendation_text.replace('\n\n', '<br/><br/>')
+        elements.append(Paragraph(analysis_text, self.normal_style))
+        elements.append(copy(self.spacer))
+
+        # Additional Financial Metrics
+        elements.append(copy(self.headings["ADDITIONAL FINANCIAL METRICS"]))
+
+        extra_metrics_data = [
+            ['Metric', 'Value'],
+        ]
+
+        pe_ratio = ticker_info.get('trailingPE')
+        if pe_ratio:
+            extra_metrics_data.append(['P/E Ratio', f'{pe_ratio:.2f}'])
+
+        pb_ratio = ticker_info.get('priceToBook')
+        if pb_ratio:
+            extra_metrics_data.append(['P/B Ratio', f'{pb_ratio:.2f}'])
+
+        div_yield = ticker_info.get('dividendYield')
+        if div_yield:
+            extra_metrics_data.append(['Dividend Yield', f'{div_yield*100:.2f}%'])
+
+        beta = ticker_info.get('beta')
+        if beta:
+            extra_metrics_data.append(['Beta (Volatility)', f'{beta:.2f}'])
+
+        volume = ticker_info.get('volume')
+        if volume:
+            extra_metrics_data.append(['Trading Volume', f'{volume:,.0f}'])
+
+        if len(extra_metrics_data) > 1:
+            extra_table = Table(extra_metrics_data, colWidths=[3*inch, 3.5*inch])
+            extra_table.setStyle(self.extra_table_style)
+            elements.append(extra_table)
+            elements.append(copy(self.spacer))
+
+        # Investment Potential Assessment
+        elements.append(copy(self.headings["INVESTMENT POTENTIAL ASSESSMENT"]))
+
+        if price_diff_pct > 20:
+            potential = "🔥 HIGH GROWTH POTENTIAL (20%+)"
+            potential_color = "green"
+        elif price_diff_pct > 10:
+            potential = "📈 MODERATE GROWTH POTENTIAL (10-20%)"
+            potential_color = "blue"
+        elif price_diff_pct > 0:
+            potential = "⚖️ LOW GROWTH POTENTIAL (0-10%)"
+            potential_color = "orange"
+        else:
+            potential = "📉 STOCK ABOVE TARGET PRICE"
+            potential_color = "red"
+
+        elements.append(Paragraph(f"<b>{potential}</b>", self.potential_styles[potential_color]))
+        elements.append(copy(self.spacer))
+
+        # Disclaimer
+        elements.append(copy(self.headings["DISCLAIMER"]))
+        elements.append(copy(self.disclaimer))
+        elements.append(copy(self.spacer))
+
+        # Footer
+        elements.append(copy(self.footer))
+
+        # Build PDF
+        doc.build(elements)
+
+        # Get the value of the BytesIO buffer
+        pdf = buffer.getvalue()
+        buffer.close()
+
+        return pdf
+
+
+_default_builder = None
+
+
+def get_report_builder():
+    """Shared ReportBuilder, created on first use."""
+    global _default_builder
+    if _default_builder is None:
+        _default_builder = ReportBuilder()
+    return _default_builder
+
+
+def create_pdf_report(ticker, company_name, sector, industry, current_price, target_price,
+                      recommendation, recommendation_text, ticker_info, price_diff_pct):
+    """Generate a professional PDF report for stock analysis"""
+    return get_report_builder().build(
+        ticker, company_name, sector, industry, current_price, target_price,
+        recommendation, recommendation_text, ticker_info, price_diff_pct
     )
-    elements.append(footer_text)
-    
-    # Build PDF
-    doc.build(elements)
-    
-    # Get the value of the BytesIO buffer
-    pdf = buffer.getvalue()
-    buffer.close()
-    
-    return pdf
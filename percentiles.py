@@ -0,0 +1,22 @@
+"""Nearest-rank percentiles for latency and usage samples.
+
+The one definition shared by the probes, the benchmarks and the runtime
+stats (``symbol_index``, ``llm_metering``, ``recommendation_router``,
+``pipeline.Tracer``, ``prefetch``), so every p50/p95/p99 in the project
+means the same thing.
+"""
+import math
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of a non-empty iterable, in any order.
+
+    The smallest sample with at least ``q``% of the samples at or below it:
+    index ``ceil(q / 100 * n) - 1`` of the sorted values (``q * n`` is
+    multiplied first so that e.g. p7 of 100 samples is not pushed up a rank
+    by float rounding).
+    """
+    ordered = sorted(values)
+    if not ordered:
+        raise ValueError("percentile of no samples")
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered) / 100) - 1))]
@@ -0,0 +1,396 @@
+"""The stock analysis pipeline shared by main.py, main_demo.py, app.py and prefetch.py.
+
+resolve ticker -> quote -> technicals / history -> recommendation -> PDF.
+``AnalysisPipeline`` holds the one copy of every stage (the ticker prompt,
+the quote fetch with its ``history(period="1d")`` fallback, the
+recommendation request) on top of the shared caches: ``quote_cache``,
+``symbol_index``, ``price_history``, and for the recommendation either the
+coalescing ``RecommendationService`` (app) or the persistent ``llm_cache``
+(CLI).
+
+Every stage runs in a ``Tracer`` span. The tracer keeps recent durations per
+stage for p50/p95 summaries, calls registered hooks with each finished span
+(for an exporter) and, with ``PIPELINE_TRACE_FILE`` set, appends every span
+to that file as a JSON line.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from indicators import bars_technicals, format_technicals
+from llm_cache import get_default_response_cache, quantize_price
+from percentiles import percentile
+from quote_cache import fetch_error_message, get_ticker_info
+from recommendation_service import (RECOMMENDATION_MODEL, RECOMMENDATION_SYSTEM, create_message, parse_structured,
+                                    recommendation_prompt, stream_recommendation, verdict_request)
+
+TRACE_FILE = os.environ.get("PIPELINE_TRACE_FILE", "")
+
+TICKER_SYSTEM = "You are a financial assistant. Given a company name, return ONLY its exact stock ticker symbol. Return only the ticker text (e.g., 'NVDA'). No extra explanation."
+RECOMMENDATION_MAX_TOKENS = 500
+HISTORY_DAYS = 400   # enough bars for the 200-day average
+CHART_DAYS = 365
+
+
+def looks_like_ticker(text: str) -> bool:
+    """Input that is all uppercase and 1-5 characters long is treated as a ticker."""
+    return text.isupper() and 1 <= len(text) <= 5
+
+
+# --- Tracing ---
+
+class Span:
+    __slots__ = ("name", "start", "duration_s", "attributes", "error")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.start = time.time()
+        self.duration_s = None
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "start": self.start, "duration_s": self.duration_s,
+                "error": self.error, **self.attributes}
+
+
+class Tracer:
+    """Minimal span tracer: per-stage latency samples, hooks and an optional JSON-lines file."""
+
+    def __init__(self, max_samples: int = 1000, trace_file: str = TRACE_FILE):
+        self.max_samples = max_samples
+        self.trace_file = trace_file
+        self.hooks = []
+        self._samples = {}   # span name -> deque of durations
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """Call ``hook(span)`` for every finished span."""
+        self.hooks.append(hook)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time the block as stage ``name``; yields the ``Span`` so the block can add attributes."""
+        span = Span(name, attributes)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.duration_s = time.perf_counter() - start
+            self._finish(span)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            samples = self._samples.get(span.name)
+            if samples is None:
+                samples = self._samples[span.name] = deque(maxlen=self.max_samples)
+            samples.append(span.duration_s)
+            if span.error:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+            if self.trace_file:
+                with open(self.trace_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span.to_dict(), default=str) + "\n")
+        for hook in self.hooks:
+            hook(span)
+
+    def summary(self) -> dict:
+        """``{stage: {"count", "errors", "p50_ms", "p95_ms", "max_ms"}}`` over the recent samples."""
+        with self._lock:
+            result = {}
+            for name, samples in self._samples.items():
+                result[name] = {
+                    "count": len(samples),
+                    "errors": self._errors.get(name, 0),
+                    "p50_ms": 1000 * percentile(samples, 50),
+                    "p95_ms": 1000 * percentile(samples, 95),
+                    "max_ms": 1000 * max(samples),
+                }
+            return result
+
+    def format_summary(self) -> str:
+        stages = self.summary()
+        if not stages:
+            return "no stages timed yet"
+        return ", ".join(f"{name} p50={s['p50_ms']:.0f}ms p95={s['p95_ms']:.0f}ms (n={s['count']})"
+                         for name, s in stages.items())
+
+
+_default_tracer = None
+_default_tracer_lock = threading.Lock()
+
+
+def get_default_tracer() -> Tracer:
+    """Process-wide tracer shared by every pipeline."""
+    global _default_tracer
+    with _default_tracer_lock:
+        if _default_tracer is None:
+            _default_tracer = Tracer()
+        return _default_tracer
+
+
+def _cached_message(record: dict):
+    """A response object (SDK shape) for an ``llm_cache`` record."""
+    from anthropic_simple import Message, TextBlock, ToolUseBlock, Usage
+
+    if "tool_use" in record:
+        content, stop_reason = [ToolUseBlock(None, record["tool_use"]["name"], record["tool_use"]["input"])], "tool_use"
+    else:
+        content, stop_reason = [TextBlock(record["text"])], "end_turn"
+    return Message(id=None, model=RECOMMENDATION_MODEL, content=content, stop_reason=stop_reason,
+                   usage=Usage(record["input_tokens"], record["output_tokens"]))
+
+
+# --- Pipeline ---
+
+class AnalysisPipeline:
+    """One stock analysis, stage by stage, each stage traced.
+
+    ``client`` (metered Anthropic client) is needed only for the LLM stages.
+    With a ``service`` recommendations go through the coalescing
+    ``RecommendationService``; without one they are looked up in, and stored
+    to, the persistent ``llm_cache`` with quantized prices.
+    """
+
+    def __init__(self, client=None, service=None, tracer: Tracer | None = None, index=None, store=None,
+                 response_cache=None):
+        self.client = client
+        self.service = service
+        self.tracer = tracer or get_default_tracer()
+        self._index = index
+        self._store = store
+        self._response_cache = response_cache
+
+    @property
+    def index(self):
+        if self._index is None:
+            from symbol_index import get_default_index
+            self._index = get_default_index()
+        return self._index
+
+    @property
+    def store(self):
+        if self._store is None:
+            from price_history import get_default_store
+            self._store = get_default_store()
+        return self._store
+
+    @property
+    def response_cache(self):
+        if self._response_cache is None:
+            self._response_cache = get_default_response_cache()
+        return self._response_cache
+
+    # --- Ticker ---
+
+    def ask_ticker(self, company_name: str):
+        """Ask the LLM for the ticker of ``company_name``; returns the response."""
+        with self.tracer.span("llm_ticker", company=company_name) as span:
+            response = create_message(
+                self.client,
+                model=RECOMMENDATION_MODEL,
+                max_tokens=100,
+                system=TICKER_SYSTEM,
+                messages=[{"role": "user", "content": f"What is the stock ticker symbol for {company_name}?"}],
+            )
+            span.set(input_tokens=response.usage.input_tokens, output_tokens=response.usage.output_tokens)
+            return response
+
+    def resolve(self, text: str, ask=None) -> dict:
+        """``{"ticker", "source"}`` for user input: a ticker as typed, else the symbol index
+        with ``ask(name) -> ticker`` (default: ``ask_ticker``) on a miss."""
+        with self.tracer.span("resolve", query=text) as span:
+            if looks_like_ticker(text):
+                result = {"ticker": text, "source": "input"}
+            else:
+                ask = ask or (lambda name: self.ask_ticker(name).content[0].text.strip().upper())
+                result = self.index.resolve(text, ask, validate=self._known_symbol)
+            span.set(**result)
+            return result
+
+    def _known_symbol(self, ticker: str) -> bool:
+        """Whether the quote provider has a price for ``ticker`` (the quote is cached for the next stage)."""
+        try:
+            return self.quote(ticker)["current_price"] is not None
+        except Exception:
+            return False
+
+    # --- Market data ---
+
+    def quote(self, ticker: str) -> dict:
+        """``{"ticker", "info", "current_price", "target_price"}``; provider errors propagate."""
+        with self.tracer.span("quote", ticker=ticker):
+            ticker_info, current_price = get_ticker_info(ticker)
+            return {"ticker": ticker, "info": ticker_info, "current_price": current_price,
+                    "target_price": ticker_info.get("targetMeanPrice")}
+
+    def stock_data(self, ticker: str) -> dict:
+        """``quote`` as the CLI tool result: ``{"ticker", "current_price", "target_price", "error"}``."""
+        try:
+            quote = self.quote(ticker)
+        except Exception as e:
+            # Handle rate limiting and other errors
+            return {"ticker": ticker, "current_price": None, "target_price": None,
+                    "error": fetch_error_message(ticker, e)}
+        error = None
+        if quote["current_price"] is None or quote["target_price"] is None:
+            error = "Price data unavailable or ticker not supported."
+        return {"ticker": ticker, "current_price": quote["current_price"], "target_price": quote["target_price"],
+                "error": error}
+
+    def technicals(self, ticker: str) -> dict | None:
+        """Latest indicators from the local price history, or None if unavailable."""
+        with self.tracer.span("technicals", ticker=ticker):
+            try:
+                bars = self.store.history(ticker, start=datetime.now() - timedelta(days=HISTORY_DAYS))
+            except Exception:
+                return None
+            return bars_technicals(bars)
+
+    def history(self, ticker: str, chart_days: int = CHART_DAYS):
+        """``(technicals, bars)``: indicators plus the last ``chart_days`` of bars for a chart."""
+        with self.tracer.span("history", ticker=ticker):
+            now = datetime.now()
+            technicals = bars_technicals(self.store.history(ticker, start=now - timedelta(days=HISTORY_DAYS)))
+            return technicals, self.store.bars(ticker, start=now - timedelta(days=chart_days))
+
+    # --- Recommendation ---
+
+    def recommend(self, ticker: str, current_price: float, target_price: float, technicals: dict | None = None,
+                  stream: bool = False, on_text=None, on_verdict=None):
+        """``(response, source, timings)``; ``timings`` (see ``stream_recommendation``) only for
+        streamed LLM calls, ``source`` is ``"llm"``, ``"cache"`` or ``"coalesced"``."""
+        with self.tracer.span("recommend", ticker=ticker, stream=stream) as span:
+            if self.service is not None:
+                technicals_line = format_technicals(technicals)
+                if stream:
+                    result = self.service.stream(ticker, current_price, target_price, on_text=on_text,
+                                                 on_verdict=on_verdict, technicals=technicals_line)
+                else:
+                    result = self.service.recommend(ticker, current_price, target_price,
+                                                    technicals=technicals_line) + (None,)
+            else:
+                result = self._recommend_cached(ticker, current_price, target_price, technicals, stream,
+                                                on_text, on_verdict)
+            response, source, timings = result
+            span.set(source=source, input_tokens=response.usage.input_tokens,
+                     output_tokens=response.usage.output_tokens)
+            if timings:
+                span.set(ttft_s=timings["ttft_s"], ttv_s=timings["ttv_s"])
+            return result
+
+    def verdict(self, ticker: str, current_price: float, target_price: float, technicals: dict | None = None):
+        """``(structured, response, source)``: the ``{"verdict", "confidence", "short_rationale"}`` tool
+        answer only, without the prose rationale (``recommend`` fetches that)."""
+        with self.tracer.span("verdict", ticker=ticker) as span:
+            if self.service is not None:
+                structured, response, source = self.service.verdict(ticker, current_price, target_price,
+                                                                    technicals=format_technicals(technicals))
+            else:
+                request = verdict_request(ticker, quantize_price(current_price), quantize_price(target_price),
+                                          format_technicals(technicals))
+                record = self.response_cache.get(**request)
+                if record is not None:
+                    response, source = _cached_message(record), "cache"
+                else:
+                    response, source = create_message(self.client, **request), "llm"
+                    self.response_cache.put(response=response, **request)
+                structured = parse_structured(response)
+            span.set(source=source, verdict=structured["verdict"], input_tokens=response.usage.input_tokens,
+                     output_tokens=response.usage.output_tokens)
+            return structured, response, source
+
+    @staticmethod
+    def recommendation_request(ticker: str, current_price: float, target_price: float,
+                               technicals: dict | None = None) -> dict:
+        """The Messages API parameters of a recommendation, as cached in ``llm_cache``.
+
+        Quantized prices keep the prompt (and its cache key) stable across small ticks.
+        """
+        return {
+            "model": RECOMMENDATION_MODEL,
+            "max_tokens": RECOMMENDATION_MAX_TOKENS,
+            "system": RECOMMENDATION_SYSTEM,
+            "messages": [{
+                "role": "user",
+                "content": recommendation_prompt(ticker, quantize_price(current_price), quantize_price(target_price),
+                                                 format_technicals(technicals)),
+            }],
+        }
+
+    def _recommend_cached(self, ticker, current_price, target_price, technicals, stream, on_text, on_verdict):
+        request = self.recommendation_request(ticker, current_price, target_price, technicals)
+        record = self.response_cache.get(**request)
+        if record is not None:
+            return _cached_message(record), "cache", None
+        if stream:
+            timings = stream_recommendation(self.client, on_text=on_text, on_verdict=on_verdict, **request)
+            response = timings["response"]
+        else:
+            timings = None
+            response = create_message(self.client, **request)
+        self.response_cache.put(response=response, **request)
+        return response, "llm", timings
+
+    def recommend_packed(self, rows: list[tuple], recommender=None) -> dict:
+        """Verdicts for many ``(ticker, current_price, target_price, technicals)`` rows in packed
+        calls (see ``packed_recommendations``); ``{ticker: {"verdict", "reason", "attempts", "error"}}``."""
+        from packed_recommendations import PackedRecommender
+
+        with self.tracer.span("recommend_packed", symbols=len(rows)) as span:
+            recommender = recommender or PackedRecommender(self.client)
+            results = recommender.recommend_many([
+                (ticker, quantize_price(current_price), quantize_price(target_price), format_technicals(technicals))
+                for ticker, current_price, target_price, technicals in rows
+            ])
+            stats = recommender.stats
+            span.set(calls=stats["calls"], input_tokens=stats["input_tokens"], output_tokens=stats["output_tokens"],
+                     retries=stats["retries"], malformed=stats["malformed"])
+            return results
+
+    def rule_recommendation(self, ticker: str, current_price: float, target_price: float,
+                            technicals: dict | None = None) -> dict:
+        """Offline verdict from ``rule_engine``: ``{"verdict", "template_id", "reasoning", "price_diff_pct"}``."""
+        from rule_engine import TEMPLATE_VERDICT, VERDICTS, classify, render_reasoning
+
+        with self.tracer.span("rules", ticker=ticker):
+            price_diff_pct = (target_price - current_price) / current_price * 100
+            template_id = classify(price_diff_pct, technicals)
+            extra = {"rsi": technicals["rsi"], "drawdown": technicals["drawdown"]} if technicals else {}
+            return {
+                "verdict": VERDICTS[TEMPLATE_VERDICT[template_id]],
+                "template_id": template_id,
+                "reasoning": render_reasoning(template_id, ticker, current_price, target_price, price_diff_pct,
+                                              **extra),
+                "price_diff_pct": price_diff_pct,
+            }
+
+    # --- Report ---
+
+    def report_pdf(self, ticker: str, ticker_info: dict, current_price: float, target_price: float,
+                   recommendation: str, recommendation_text: str) -> bytes:
+        from pdf_generator import create_pdf_report
+
+        with self.tracer.span("pdf", ticker=ticker):
+            return create_pdf_report(
+                ticker=ticker,
+                company_name=ticker_info.get("longName", ticker),
+                sector=ticker_info.get("sector", "N/A"),
+                industry=ticker_info.get("industry", "N/A"),
+                current_price=current_price,
+                target_price=target_price,
+                recommendation=recommendation,
+                recommendation_text=recommendation_text,
+                ticker_info=ticker_info,
+                price_diff_pct=(target_price - current_price) / current_price * 100,
+            )
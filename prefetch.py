@@ -0,0 +1,243 @@
+"""Background prefetch of the hot tickers (the app's quick-action buttons).
+
+A ``Prefetcher`` thread refreshes every ``PREFETCH_TICKERS`` entry each
+``PREFETCH_INTERVAL`` seconds by running the ``pipeline.AnalysisPipeline``
+stages the app runs on a click: the quote, the price history and technicals,
+the recommendation and the rendered PDF report. The recommendation is routed
+like a click (``recommendation_router``): clear-cut cases are answered by the
+rule engine, only escalated ones ask Claude (through the pipeline's shared
+``RecommendationService``), for the structured verdict when ``structured``
+is set, as in the app's default mode. The results are kept in memory as one
+``Snapshot`` per ticker, with the routing decision, so a click on a hot
+ticker renders without any network call.
+
+An escalated recommendation is only requested again when its inputs
+(quantized prices, technicals, model) changed since the last cycle. A snapshot older than
+``PREFETCH_MAX_AGE`` is not served and the app takes the normal live path.
+A failed refresh keeps the previous snapshot and is listed in ``errors``.
+
+Nothing runs until something asks for it: ``get_default_prefetcher`` builds
+and starts the process-wide instance on the first call that passes a
+factory (the app does this when a hot ticker is first analyzed), so
+importing this module or rendering a page costs no thread, client or data.
+
+Instrumentation: refresh-cycle durations, per-ticker refresh time, and the
+hit/miss counts and hit latencies the app reports through ``record_hit``.
+"""
+import importlib.util
+import os
+import threading
+import time
+from collections import deque
+
+from indicators import format_technicals
+from percentiles import percentile
+from recommendation_service import parse_verdict
+
+DEFAULT_TICKERS = [t.strip().upper() for t in os.environ.get("PREFETCH_TICKERS", "NVDA,MSFT,TSLA,AAPL").split(",")
+                   if t.strip()]
+DEFAULT_INTERVAL = float(os.environ.get("PREFETCH_INTERVAL", 120))   # seconds
+DEFAULT_MAX_AGE = float(os.environ.get("PREFETCH_MAX_AGE", 600))     # seconds
+PDF_AVAILABLE = importlib.util.find_spec("reportlab") is not None
+
+
+class Snapshot:
+    """Everything the app renders for one ticker, as of ``refreshed_at``."""
+
+    __slots__ = ("ticker", "ticker_info", "current_price", "target_price", "technicals", "bars", "decision",
+                 "response", "structured", "text", "recommendation_key", "verdict", "pdf", "refreshed_at",
+                 "refresh_s")
+
+    def __init__(self, ticker, ticker_info, current_price, target_price, technicals, bars, decision, response,
+                 structured, text, recommendation_key, verdict, pdf, refreshed_at, refresh_s):
+        self.ticker = ticker
+        self.ticker_info = ticker_info
+        self.current_price = current_price
+        self.target_price = target_price
+        self.technicals = technicals
+        self.bars = bars
+        self.decision = decision                      # RecommendationRouter.route
+        self.response = response                      # None when the rules answered
+        self.structured = structured                  # parse_structured result, or None for prose
+        self.text = text                              # rules reasoning, prose answer or short rationale
+        self.recommendation_key = recommendation_key  # None when the rules answered
+        self.verdict = verdict
+        self.pdf = pdf
+        self.refreshed_at = refreshed_at    # time.time()
+        self.refresh_s = refresh_s
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.refreshed_at
+
+
+def format_age(seconds: float) -> str:
+    if seconds < 90:
+        return f"{seconds:.0f} s"
+    return f"{seconds / 60:.0f} min"
+
+
+class Prefetcher:
+    """Keeps a ``Snapshot`` per hot ticker fresh on a background thread."""
+
+    def __init__(self, router, tickers: list[str] | None = None, interval: float = DEFAULT_INTERVAL,
+                 max_age: float = DEFAULT_MAX_AGE, render_pdf: bool = PDF_AVAILABLE, structured: bool = False):
+        self.router = router            # a RecommendationRouter
+        self.pipeline = router.pipeline  # its AnalysisPipeline, with a RecommendationService
+        self.structured = structured
+        self.tickers = list(DEFAULT_TICKERS if tickers is None else tickers)
+        self.interval = interval
+        self.max_age = max_age
+        self.render_pdf = render_pdf
+        self.errors = {}
+        self.stats = {"cycles": 0, "hits": 0, "misses": 0, "stale": 0, "llm_calls": 0}
+        self._snapshots = {}
+        self._cycle_s = deque(maxlen=100)
+        self._hit_s = deque(maxlen=500)
+        self._last_cycle_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Refresh ---
+
+    def start(self):
+        """Start the refresh thread (once); the first cycle begins immediately."""
+        if self._thread is None and self.tickers:
+            self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh_all()
+            self._stop.wait(self.interval)
+
+    def refresh_all(self) -> float:
+        """Refresh every hot ticker once; returns the cycle duration in seconds."""
+        start = time.perf_counter()
+        for ticker in self.tickers:
+            try:
+                snapshot = self.refresh(ticker)
+            except Exception as e:
+                with self._lock:
+                    self.errors[ticker] = str(e)
+                continue
+            with self._lock:
+                self._snapshots[ticker] = snapshot
+                self.errors.pop(ticker, None)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats["cycles"] += 1
+            self._cycle_s.append(elapsed)
+            self._last_cycle_at = time.time()
+        return elapsed
+
+    def refresh(self, ticker: str) -> Snapshot:
+        """Build a fresh snapshot for ticker (does not store it)."""
+        start = time.perf_counter()
+        pipeline = self.pipeline
+        quote = pipeline.quote(ticker)
+        ticker_info, current_price, target_price = quote["info"], quote["current_price"], quote["target_price"]
+        if current_price is None or target_price is None:
+            raise ValueError(f"No price data for {ticker}")
+        technicals, bars = pipeline.history(ticker)
+
+        decision = self.router.route(ticker, current_price, target_price, technicals)
+        response = structured = key = None
+        if decision["route"] == "rules":
+            rule = pipeline.rule_recommendation(ticker, current_price, target_price, technicals)
+            verdict, text = rule["verdict"], rule["reasoning"]
+        else:
+            key = pipeline.service.key(ticker, current_price, target_price, format_technicals(technicals),
+                                       self.structured)
+            with self._lock:
+                previous = self._snapshots.get(ticker)
+            if previous is not None and previous.recommendation_key == key:
+                response, structured, verdict, text = (previous.response, previous.structured, previous.verdict,
+                                                       previous.text)
+            else:
+                if self.structured:
+                    structured, response, source = pipeline.verdict(ticker, current_price, target_price, technicals)
+                    verdict, text = structured["verdict"], structured["short_rationale"]
+                else:
+                    response, source, _ = pipeline.recommend(ticker, current_price, target_price, technicals)
+                    text = response.content[0].text.strip()
+                    verdict = parse_verdict(text, final=True)
+                if source == "llm":
+                    with self._lock:
+                        self.stats["llm_calls"] += 1
+
+        # A structured verdict has no prose for the report; the app fetches that only when asked
+        pdf = None
+        if self.render_pdf and structured is None:
+            pdf = pipeline.report_pdf(ticker, ticker_info, current_price, target_price, verdict, text)
+        return Snapshot(ticker, ticker_info, current_price, target_price, technicals, bars, decision, response,
+                        structured, text, key, verdict, pdf, time.time(), time.perf_counter() - start)
+
+    # --- Serving ---
+
+    def get(self, ticker: str) -> Snapshot | None:
+        """The snapshot for ticker if it is fresh enough to serve, else None (counted as a miss)."""
+        with self._lock:
+            snapshot = self._snapshots.get(ticker.upper())
+            if snapshot is None:
+                if ticker.upper() in self.tickers:
+                    self.stats["misses"] += 1
+                return None
+            if snapshot.age > self.max_age:
+                self.stats["stale"] += 1
+                return None
+            self.stats["hits"] += 1
+            return snapshot
+
+    def record_hit(self, seconds: float):
+        """Time the caller took to serve a snapshot (click to rendered page)."""
+        with self._lock:
+            self._hit_s.append(seconds)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "ready": len(self._snapshots),
+                "tickers": len(self.tickers),
+                "last_cycle_s": self._cycle_s[-1] if self._cycle_s else None,
+                "p50_cycle_s": percentile(self._cycle_s, 50) if self._cycle_s else None,
+                "last_cycle_age_s": time.time() - self._last_cycle_at if self._last_cycle_at else None,
+                "p50_hit_ms": 1000 * percentile(self._hit_s, 50) if self._hit_s else None,
+                "max_hit_ms": 1000 * max(self._hit_s) if self._hit_s else None,
+                "errors": dict(self.errors),
+            }
+
+    def format_summary(self) -> str:
+        s = self.summary()
+        if s["last_cycle_s"] is None:
+            return f"prefetch: first cycle running ({len(self.tickers)} tickers)"
+        text = (f"prefetch: {s['ready']}/{s['tickers']} ready, cycle {s['last_cycle_s']:.1f}s "
+                f"({format_age(s['last_cycle_age_s'])} ago), hits {s['hits']} / misses {s['misses'] + s['stale']}")
+        if s["p50_hit_ms"] is not None:
+            text += f", hit p50 {s['p50_hit_ms']:.0f} ms"
+        if s["errors"]:
+            text += f", errors: {', '.join(s['errors'])}"
+        return text
+
+
+_default_prefetcher = None
+_default_prefetcher_lock = threading.Lock()
+
+
+def get_default_prefetcher(factory=None) -> Prefetcher | None:
+    """The process-wide prefetcher, or None while none was started.
+
+    With ``factory`` (a callable returning a ``Prefetcher``), the first call
+    builds it and starts the refresh thread.
+    """
+    global _default_prefetcher
+    with _default_prefetcher_lock:
+        if _default_prefetcher is None and factory is not None:
+            _default_prefetcher = factory()
+            _default_prefetcher.start()
+        return _default_prefetcher
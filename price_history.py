@@ -0,0 +1,304 @@
+"""Local daily OHLCV history with incremental, append-only updates.
+
+Each ticker is a directory of raw little-endian column files (``ts.i8``,
+``open.f8``, ``high.f8``, ``low.f8``, ``close.f8``, ``volume.f8``) under
+``PRICE_HISTORY_DIR``. The first ``update`` downloads the full history once;
+later updates fetch only the bars from the last stored day onwards, rewrite
+that (possibly still forming) last bar in place and append the rest.
+
+Reads memory-map the columns, so ``bars()`` range queries return NumPy views
+into the page cache without copying or parsing anything. ``ts.i8`` is written
+last on every append and its length is the committed row count, so a reader
+never sees a half-written row and a crash mid-append is repaired on the next
+write.
+
+Usage:
+    python price_history.py update NVDA MSFT AAPL
+    python price_history.py show NVDA --start 2024-01-01
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from market_data import get_default_provider
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+DEFAULT_HISTORY_DIR = os.environ.get("PRICE_HISTORY_DIR", os.path.join(".cache", "history"))
+
+COLUMNS = {
+    "ts": np.dtype("<i8"),        # bar date, UTC midnight, epoch seconds
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+# Written before ts, so the ts length always marks fully written rows
+VALUE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+def to_timestamp(value) -> int | None:
+    """Epoch seconds (UTC midnight) for a date, datetime, ISO string or epoch int."""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        value = value.date()
+    return int(datetime(value.year, value.month, value.day, tzinfo=timezone.utc).timestamp())
+
+
+def _file_name(column: str) -> str:
+    return f"{column}.{COLUMNS[column].kind}{COLUMNS[column].itemsize}"
+
+
+# --- Query result ---
+
+class PriceBars:
+    """Column views for one ticker's bars, oldest first.
+
+    The arrays are read-only views into the memory-mapped files; copy them
+    before modifying or keeping them past the next ``update`` of the ticker.
+    """
+
+    __slots__ = ("ticker", "ts", "open", "high", "low", "close", "volume")
+
+    def __init__(self, ticker: str, columns: dict):
+        self.ticker = ticker
+        for column in COLUMNS:
+            setattr(self, column, columns[column])
+
+    def __len__(self):
+        return len(self.ts)
+
+    def dates(self) -> np.ndarray:
+        return self.ts.astype("datetime64[s]").astype("datetime64[D]")
+
+    def to_frame(self):
+        """pandas DataFrame (copies) indexed by date, for display."""
+        import pandas as pd
+
+        return pd.DataFrame(
+            {column.capitalize(): np.array(getattr(self, column)) for column in VALUE_COLUMNS},
+            index=pd.DatetimeIndex(self.dates(), name="Date"),
+        )
+
+
+# --- Store ---
+
+class PriceHistoryStore:
+    """Append-only columnar OHLCV store, one directory of column files per ticker.
+
+    ``fetch_history(ticker, start)`` is injectable (default: the
+    ``market_data`` provider's ``history``) and must return column arrays for
+    the bars with ``ts >= start``, or the full history when ``start`` is None. ``requests`` and
+    ``bars_fetched`` count what went over the network.
+    """
+
+    def __init__(self, root: str = DEFAULT_HISTORY_DIR, fetch_history=None):
+        self.root = root
+        self._fetch_history = fetch_history or get_default_provider().history
+        os.makedirs(root, exist_ok=True)
+        self._maps = {}       # ticker -> (rows, {column: memmap})
+        self._lock = threading.Lock()
+        self._ticker_locks = {}
+        self.requests = 0
+        self.bars_fetched = 0
+
+    def _dir(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker.upper())
+
+    def _path(self, ticker: str, column: str) -> str:
+        return os.path.join(self._dir(ticker), _file_name(column))
+
+    def _ticker_lock(self, ticker: str) -> threading.Lock:
+        with self._lock:
+            return self._ticker_locks.setdefault(ticker.upper(), threading.Lock())
+
+    def rows(self, ticker: str) -> int:
+        try:
+            return os.path.getsize(self._path(ticker, "ts")) // COLUMNS["ts"].itemsize
+        except FileNotFoundError:
+            return 0
+
+    def last_timestamp(self, ticker: str) -> int | None:
+        rows = self.rows(ticker)
+        if not rows:
+            return None
+        with open(self._path(ticker, "ts"), "rb") as f:
+            f.seek((rows - 1) * COLUMNS["ts"].itemsize)
+            return int(np.frombuffer(f.read(COLUMNS["ts"].itemsize), COLUMNS["ts"])[0])
+
+    # --- Reads ---
+
+    def _columns(self, ticker: str) -> dict:
+        rows = self.rows(ticker)
+        with self._lock:
+            cached = self._maps.get(ticker)
+            if cached is not None and cached[0] == rows:
+                return cached[1]
+        if rows:
+            columns = {
+                column: np.memmap(self._path(ticker, column), dtype=dtype, mode="r", shape=(rows,))
+                for column, dtype in COLUMNS.items()
+            }
+        else:
+            columns = {column: np.empty(0, dtype) for column, dtype in COLUMNS.items()}
+        with self._lock:
+            self._maps[ticker] = (rows, columns)
+        return columns
+
+    def bars(self, ticker: str, start=None, end=None) -> PriceBars:
+        """Bars with ``start <= date <= end`` (either bound optional), as zero-copy views."""
+        ticker = ticker.upper()
+        columns = self._columns(ticker)
+        ts = columns["ts"]
+        lo = 0 if start is None else int(np.searchsorted(ts, to_timestamp(start), side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, to_timestamp(end), side="right"))
+        return PriceBars(ticker, {column: values[lo:hi] for column, values in columns.items()})
+
+    # --- Writes ---
+
+    def append(self, ticker: str, new: dict) -> int:
+        """Write fetched bars; returns how many rows were added.
+
+        Bars older than the last stored one are ignored, a bar for the last
+        stored day replaces it (the day may have been stored mid-session), and
+        newer bars are appended.
+        """
+        ticker = ticker.upper()
+        ts = np.asarray(new["ts"], dtype=COLUMNS["ts"])
+        order = np.argsort(ts, kind="stable")
+        values = {column: np.asarray(new[column], dtype=COLUMNS[column])[order] for column in COLUMNS}
+
+        with self._ticker_lock(ticker):
+            os.makedirs(self._dir(ticker), exist_ok=True)
+            with open(self._path(ticker, "ts"), "ab") as ts_file:
+                if fcntl is not None:
+                    fcntl.flock(ts_file, fcntl.LOCK_EX)
+                try:
+                    return self._append_locked(ticker, values)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(ts_file, fcntl.LOCK_UN)
+
+    def _append_locked(self, ticker: str, values: dict) -> int:
+        rows = self.rows(ticker)
+        last = self.last_timestamp(ticker)
+
+        replacement = None
+        if last is not None:
+            ts = values["ts"]
+            same_day = np.flatnonzero(ts == last)
+            if same_day.size:
+                replacement = {column: array[same_day[-1]] for column, array in values.items()}
+            keep = ts > last
+            values = {column: array[keep] for column, array in values.items()}
+
+        for column in VALUE_COLUMNS:
+            path = self._path(ticker, column)
+            itemsize = COLUMNS[column].itemsize
+            with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+                # Drop anything past the committed rows (an interrupted append)
+                f.truncate(rows * itemsize)
+                if replacement is not None:
+                    f.seek((rows - 1) * itemsize)
+                    f.write(replacement[column].tobytes())
+                f.seek(rows * itemsize)
+                f.write(values[column].tobytes())
+        with open(self._path(ticker, "ts"), "ab") as f:
+            f.write(values["ts"].tobytes())
+        return len(values["ts"])
+
+    def update(self, ticker: str) -> int:
+        """Fetch what is missing for ticker (everything on first use); returns rows added."""
+        ticker = ticker.upper()
+        with self._lock:
+            self.requests += 1
+        new = self._fetch_history(ticker, self.last_timestamp(ticker))
+        with self._lock:
+            self.bars_fetched += len(new["ts"])
+        added = self.append(ticker, new)
+        # Mark the ticker as checked even when no new bar exists yet (weekends)
+        ts_path = self._path(ticker, "ts")
+        if os.path.exists(ts_path):
+            os.utime(ts_path)
+        return added
+
+    def update_many(self, tickers: list[str], workers: int = 8) -> dict:
+        """Update tickers concurrently; returns ``{ticker: rows added or error string}``."""
+        def run(ticker):
+            try:
+                return self.update(ticker)
+            except Exception as e:
+                return f"Error updating {ticker}: {e}"
+
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            return dict(zip(tickers, pool.map(run, tickers)))
+
+    def history(self, ticker: str, start=None, end=None, max_age: float = 12 * 3600) -> PriceBars:
+        """``bars`` after an ``update`` if the ticker was last checked over ``max_age`` seconds ago."""
+        try:
+            written_at = os.path.getmtime(self._path(ticker, "ts"))
+        except FileNotFoundError:
+            written_at = 0.0
+        if time.time() - written_at > max_age:
+            self.update(ticker)
+        return self.bars(ticker, start, end)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store() -> PriceHistoryStore:
+    """Process-wide store at ``PRICE_HISTORY_DIR``."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = PriceHistoryStore()
+        return _default_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local daily OHLCV history store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update = commands.add_parser("update", help="Download missing bars (full history on first use)")
+    update.add_argument("tickers", nargs="+")
+    update.add_argument("--workers", type=int, default=8)
+    show = commands.add_parser("show", help="Print stored bars")
+    show.add_argument("ticker")
+    show.add_argument("--start", help="YYYY-MM-DD")
+    show.add_argument("--end", help="YYYY-MM-DD")
+    show.add_argument("--tail", type=int, default=20, help="Rows to print (0 = all)")
+    args = parser.parse_args(argv)
+
+    store = get_default_store()
+    if args.command == "update":
+        start = time.perf_counter()
+        results = store.update_many(args.tickers, workers=args.workers)
+        for ticker, result in results.items():
+            if isinstance(result, str):
+                print(f"❌ {result}")
+            else:
+                print(f"✅ {ticker}: +{result} bars ({store.rows(ticker)} stored)")
+        print(f"⏱️  {store.requests} requests, {store.bars_fetched} bars fetched in {time.perf_counter() - start:.2f}s")
+    else:
+        frame = store.bars(args.ticker, args.start, args.end).to_frame()
+        print(frame.tail(args.tail) if args.tail else frame.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""Persistent quote cache shared by main.py, main_demo.py and app.py.
+
+Quotes are stored in a SQLite file so they survive restarts and can be read
+and written by several processes at once (WAL mode + busy timeout). Each
+ticker keeps two independently expiring parts:
+
+- the current price, which moves every tick (short TTL), and
+- the ``.info`` dict with ``targetMeanPrice`` and the fundamentals (long TTL).
+
+With a warm cache ``get_ticker_info`` makes no Yahoo requests at all; when
+only the price is stale it refreshes just the price. Misses are fetched from
+the ``market_data`` provider (Yahoo through the shared ``rate_limiter``, or a
+replay); while the source keeps rate limiting, the stale cached quote is
+served instead of an error.
+
+Cache hits stay reads: the LRU timestamp is refreshed only once it is
+``QUOTE_CACHE_TOUCH_INTERVAL`` old, and the hit/miss counters are written to
+the shared file in batches. Every write evicts down to ``max_entries``.
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+
+from market_data import MarketDataProvider, get_default_provider
+from rate_limiter import is_rate_limit
+
+DEFAULT_CACHE_PATH = os.environ.get("QUOTE_CACHE_PATH", os.path.join(".cache", "quotes.sqlite3"))
+PRICE_TTL = float(os.environ.get("QUOTE_CACHE_PRICE_TTL", 60))                    # seconds
+FUNDAMENTALS_TTL = float(os.environ.get("QUOTE_CACHE_FUNDAMENTALS_TTL", 6 * 3600))  # seconds
+MAX_ENTRIES = int(os.environ.get("QUOTE_CACHE_MAX_ENTRIES", 5000))
+# A read refreshes an entry's LRU timestamp only when it is older than this, and hit/miss
+# counters reach the shared file at most this often: cache hits normally take no write lock
+TOUCH_INTERVAL = float(os.environ.get("QUOTE_CACHE_TOUCH_INTERVAL", 60))    # seconds
+COUNTER_FLUSH_INTERVAL = 5.0                                                 # seconds
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    ticker      TEXT PRIMARY KEY,
+    info        TEXT,
+    info_at     REAL,
+    price       REAL,
+    price_at    REAL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotes_accessed_at ON quotes (accessed_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+COUNTERS = ("hits", "price_refreshes", "misses", "evictions", "stale")
+
+
+class QuoteCache:
+    """SQLite-backed, size-bounded LRU cache of Yahoo Finance quotes."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, price_ttl: float = PRICE_TTL,
+                 fundamentals_ttl: float = FUNDAMENTALS_TTL, max_entries: int = MAX_ENTRIES,
+                 touch_interval: float = TOUCH_INTERVAL):
+        self.path = path
+        self.price_ttl = price_ttl
+        self.fundamentals_ttl = fundamentals_ttl
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._counts = dict.fromkeys(COUNTERS, 0)
+        self._unflushed = dict.fromkeys(COUNTERS, 0)   # counted here, not yet in the shared file
+        self._flushed_at = time.monotonic()
+        self._counts_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+        atexit.register(_flush_at_exit, weakref.ref(self))
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads; keep one per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def count(self, name: str, amount: int = 1):
+        """Bump a hit/miss counter in this process; the shared file is updated in batches."""
+        with self._counts_lock:
+            self._counts[name] += amount
+            self._unflushed[name] += amount
+            due = time.monotonic() - self._flushed_at >= COUNTER_FLUSH_INTERVAL
+        if due:
+            self.flush_counts()
+
+    def flush_counts(self):
+        """Add the counts not yet written to the shared file, in one transaction."""
+        with self._counts_lock:
+            pending = [(name, value) for name, value in self._unflushed.items() if value]
+            self._unflushed = dict.fromkeys(COUNTERS, 0)
+            self._flushed_at = time.monotonic()
+        if pending:
+            self._conn().executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                pending,
+            )
+
+    def get(self, ticker: str) -> dict | None:
+        """Return the cached entry for ticker (possibly stale), or None.
+
+        The entry has ``info``, ``current_price`` and the ``info_fresh`` /
+        ``price_fresh`` flags. Reading an entry marks it as recently used,
+        to within ``touch_interval``.
+        """
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT info, info_at, price, price_at, accessed_at FROM quotes WHERE ticker = ?", (ticker,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        now = time.time()
+        info, info_at, price, price_at, accessed_at = row
+        if now - accessed_at >= self.touch_interval:
+            conn.execute("UPDATE quotes SET accessed_at = ? WHERE ticker = ?", (now, ticker))
+        return {
+            "info": json.loads(info) if info is not None else None,
+            "current_price": price,
+            "info_fresh": info is not None and now - info_at < self.fundamentals_ttl,
+            "price_fresh": price is not None and now - price_at < self.price_ttl,
+        }
+
+    def put_info(self, ticker: str, info: dict, current_price: float | None = None):
+        """Store a full ``.info`` dict (and the price derived from it)."""
+        now = time.time()
+        price_at = now if current_price is not None else None
+        self._upsert(
+            "INSERT INTO quotes (ticker, info, info_at, price, price_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(ticker) DO UPDATE SET info = excluded.info, info_at = excluded.info_at, "
+            "price = excluded.price, price_at = excluded.price_at, accessed_at = excluded.accessed_at",
+            (ticker, json.dumps(info, default=str), now, current_price, price_at, now),
+        )
+
+    def put_price(self, ticker: str, current_price: float):
+        """Refresh only the fast-moving price of an entry (inserting it if missing)."""
+        now = time.time()
+        self._upsert(
+            "INSERT INTO quotes (ticker, price, price_at, accessed_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(ticker) DO UPDATE SET price = excluded.price, price_at = excluded.price_at, "
+            "accessed_at = excluded.accessed_at",
+            (ticker, current_price, now, now),
+        )
+
+    def _upsert(self, sql: str, params: tuple):
+        """Write one entry and evict in the same transaction, so no insert path grows the file."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(sql, params)
+            evicted = self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if evicted:
+            self.count("evictions", evicted)
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        """Drop least recently used entries above ``max_entries``."""
+        cursor = conn.execute(
+            "DELETE FROM quotes WHERE ticker IN ("
+            "SELECT ticker FROM quotes ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process and summed over all processes using the file."""
+        self.flush_counts()
+        with self._counts_lock:
+            process = dict(self._counts)
+        rows = dict(self._conn().execute("SELECT name, value FROM counters").fetchall())
+        total = {name: rows.get(name, 0) for name in COUNTERS}
+        entries = self._conn().execute("SELECT COUNT(*) FROM quotes").fetchone()[0]
+        return {"process": process, "total": total, "entries": entries}
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM quotes")
+        conn.execute("DELETE FROM counters")
+        with self._counts_lock:
+            self._counts = dict.fromkeys(COUNTERS, 0)
+            self._unflushed = dict.fromkeys(COUNTERS, 0)
+
+
+def _flush_at_exit(ref):
+    cache = ref()
+    if cache is not None:
+        try:
+            cache.flush_counts()
+        except sqlite3.Error:
+            pass
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> QuoteCache:
+    """Process-wide cache instance backed by ``DEFAULT_CACHE_PATH``."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = QuoteCache()
+        return _default_cache
+
+
+def fetch_error_message(ticker: str, error: Exception) -> str:
+    """Turn a yfinance exception into the user-facing error string."""
+    error_msg = str(error)
+    if is_rate_limit(error):
+        return "Yahoo Finance rate limit exceeded. Please try again in a few minutes."
+    if "Invalid ticker" in error_msg:
+        return f"Invalid ticker symbol: {ticker}"
+    return f"Error fetching data for {ticker}: {error_msg}"
+
+
+def get_ticker_info(ticker: str, cache: QuoteCache | None = None,
+                    provider: MarketDataProvider | None = None) -> tuple[dict, float | None]:
+    """Return ``(info, current_price)`` for ticker, fetching only what is stale.
+
+    - price and fundamentals fresh: served from the cache, no request
+    - only the price stale: one ``history(period="1d")`` request
+    - fundamentals stale or missing: full ``.info`` request (plus the history
+      fallback when ``currentPrice`` is missing)
+
+    ``provider`` defaults to ``market_data.get_default_provider()``; Yahoo
+    requests are rate limited and retried by ``rate_limiter``. If they still
+    fail with a rate limit (or the circuit is open) and an older entry exists,
+    that stale entry is returned. Other exceptions from the provider (invalid
+    tickers) propagate to the caller.
+    """
+    cache = cache or get_default_cache()
+    entry = cache.get(ticker)
+
+    if entry and entry["info_fresh"] and entry["price_fresh"]:
+        cache.count("hits")
+        return entry["info"], entry["current_price"]
+
+    try:
+        return _fetch_ticker_info(ticker, cache, entry, provider or get_default_provider())
+    except Exception as e:
+        if not (is_rate_limit(e) and entry and entry["info"] is not None):
+            raise
+        cache.count("stale")
+        return entry["info"], entry["current_price"]
+
+
+def _fetch_ticker_info(ticker: str, cache: QuoteCache, entry: dict | None,
+                       provider: MarketDataProvider) -> tuple[dict, float | None]:
+    if entry and entry["info_fresh"]:
+        current_price = provider.last_close(ticker)
+        if current_price is not None:
+            cache.count("price_refreshes")
+            cache.put_price(ticker, current_price)
+            return entry["info"], current_price
+
+    cache.count("misses")
+    ticker_info = provider.info(ticker)
+    current_price = ticker_info.get("currentPrice")
+
+    # Fallback: try to get last close price if current price missing
+    if current_price is None:
+        current_price = provider.last_close(ticker)
+
+    cache.put_info(ticker, ticker_info, current_price)
+    return ticker_info, current_price
@@ -0,0 +1,268 @@
+"""Adaptive rate limiting, retries and a circuit breaker for Yahoo Finance requests.
+
+Every Yahoo call made by this repo (``quote_cache``, ``bulk_quotes``,
+``price_history``) goes through the process-wide ``RateLimiter``:
+
+- a token bucket spaces requests at the current rate; waits are reservations,
+  so threads and asyncio tasks share one bucket without holding a lock;
+- the rate adapts AIMD-style: it grows additively while requests succeed and
+  backs off multiplicatively (x0.7) on a 429, at most once per
+  ``decrease_cooldown``;
+- rate-limited calls are retried with full-jitter exponential backoff;
+- after ``breaker_threshold`` consecutive 429s the circuit opens and calls fail
+  fast with ``CircuitOpenError`` for ``breaker_reset`` seconds, so callers can
+  serve stale cached data instead of queueing behind a ban. One probe call is
+  let through afterwards (half-open) and closes the circuit if it succeeds; a
+  probe that ends without an answer (cancelled, interrupted) frees the slot
+  for the next one.
+
+Defaults come from the ``YF_*`` environment variables below.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+
+DEFAULT_RATE = float(os.environ.get("YF_RATE", 5.0))             # requests per second
+DEFAULT_BURST = float(os.environ.get("YF_BURST", 10))
+DEFAULT_MIN_RATE = float(os.environ.get("YF_MIN_RATE", 0.2))
+DEFAULT_MAX_RATE = float(os.environ.get("YF_MAX_RATE", 20.0))
+DEFAULT_MAX_ATTEMPTS = int(os.environ.get("YF_MAX_ATTEMPTS", 4))
+DEFAULT_RETRY_BASE = float(os.environ.get("YF_RETRY_BASE", 1.0))  # seconds
+DEFAULT_RETRY_MAX = float(os.environ.get("YF_RETRY_MAX", 16.0))   # seconds
+DEFAULT_BREAKER_THRESHOLD = int(os.environ.get("YF_BREAKER_THRESHOLD", 5))
+DEFAULT_BREAKER_RESET = float(os.environ.get("YF_BREAKER_RESET", 60.0))  # seconds
+
+
+class CircuitOpenError(RuntimeError):
+    """Yahoo is rate limiting us; the circuit is open and the call was not made."""
+
+
+def is_rate_limit(error: Exception) -> bool:
+    """True for yfinance's rate-limit errors (and an open circuit)."""
+    if isinstance(error, CircuitOpenError) or type(error).__name__ == "YFRateLimitError":
+        return True
+    if getattr(error, "status_code", None) == 429:
+        return True
+    error_msg = str(error)
+    return "Rate limited" in error_msg or "Too Many Requests" in error_msg
+
+
+class TokenBucket:
+    """Token bucket with reservations: ``reserve()`` returns how long to wait."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Take one token (possibly going into debt); seconds until it is available."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def set_rate(self, rate: float, drain: bool = False):
+        """Change the refill rate; ``drain`` also drops any saved-up burst."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+            if drain:
+                self._tokens = min(self._tokens, 0.0)
+
+
+class CircuitBreaker:
+    """Closed -> open after ``threshold`` consecutive failures -> half-open after ``reset_timeout``."""
+
+    def __init__(self, threshold: int = DEFAULT_BREAKER_THRESHOLD, reset_timeout: float = DEFAULT_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in half-open state only one probe at a time."""
+        return self.admit() is not None
+
+    def admit(self) -> str | None:
+        """``"call"`` (closed), ``"probe"`` (the one half-open trial call) or None (open)."""
+        with self._lock:
+            if self.opened_at is None:
+                return "call"
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._probing:
+                return None
+            self._probing = True
+            return "probe"
+
+    def release_probe(self):
+        """The probe ended without an answer: keep the state and let the next call probe."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class RateLimiter:
+    """Token bucket + AIMD rate + jittered retries + circuit breaker, for sync and async callers."""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST,
+                 min_rate: float = DEFAULT_MIN_RATE, max_rate: float = DEFAULT_MAX_RATE,
+                 increase: float = 1.0, decrease: float = 0.7, decrease_cooldown: float = 1.0,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, retry_base: float = DEFAULT_RETRY_BASE,
+                 retry_max: float = DEFAULT_RETRY_MAX, breaker: CircuitBreaker | None = None):
+        self.bucket = TokenBucket(rate, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase            # requests/s added per second of success
+        self.decrease = decrease            # multiplicative factor on a 429
+        self.decrease_cooldown = decrease_cooldown
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._last_decrease = 0.0
+        self.stats = {"calls": 0, "rate_limited": 0, "retries": 0, "rejected": 0, "waited_s": 0.0}
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    # --- Adaptation ---
+
+    def _count(self, name: str, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _on_success(self):
+        self.breaker.record_success()
+        with self._lock:
+            rate = self.bucket.rate
+            if rate < self.max_rate:
+                self.bucket.set_rate(min(self.max_rate, rate + self.increase / rate))
+
+    def _on_rate_limit(self):
+        self.breaker.record_failure()
+        now = time.monotonic()
+        with self._lock:
+            self.stats["rate_limited"] += 1
+            # One decrease per burst: the other in-flight calls were sent at the old rate
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self._last_decrease = now
+                self.bucket.set_rate(max(self.min_rate, self.bucket.rate * self.decrease), drain=True)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number ``attempt`` (0-based)."""
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+
+    def _admit(self) -> tuple[float, bool]:
+        """``(seconds to wait, whether this call is the half-open probe)``."""
+        admission = self.breaker.admit()
+        if admission is None:
+            self._count("rejected")
+            raise CircuitOpenError(f"Yahoo Finance rate limited; circuit open for up to "
+                                   f"{self.breaker.reset_timeout:.0f}s (Too Many Requests)")
+        self._count("calls")
+        wait = self.bucket.reserve()
+        if wait:
+            self._count("waited_s", wait)
+        return wait, admission == "probe"
+
+    def _failed(self, error: Exception, attempt: int) -> float | None:
+        """Backoff before retrying ``error``, or None when it should propagate."""
+        if not is_rate_limit(error):
+            # Yahoo answered (invalid ticker etc.): not a reason to back off
+            self.breaker.record_success()
+            return None
+        self._on_rate_limit()
+        if attempt == self.max_attempts - 1:
+            return None
+        self._count("retries")
+        return self.backoff(attempt)
+
+    # --- Calls ---
+
+    def call(self, fn, *args, **kwargs):
+        """Run ``fn`` under the limiter, retrying rate-limit errors; blocks while waiting."""
+        for attempt in range(self.max_attempts):
+            wait, probe = self._admit()
+            try:
+                time.sleep(wait)
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            self._on_success()
+            return result
+
+    async def acall(self, fn, *args, **kwargs):
+        """asyncio version of ``call``; a plain function runs in a worker thread."""
+        for attempt in range(self.max_attempts):
+            wait, probe = self._admit()
+            try:
+                await asyncio.sleep(wait)
+                if asyncio.iscoroutinefunction(fn):
+                    result = await fn(*args, **kwargs)
+                else:
+                    result = await asyncio.to_thread(fn, *args, **kwargs)
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # CancelledError (task cancel, wait_for timeout) or an interrupt
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            self._on_success()
+            return result
+
+
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_default_limiter() -> RateLimiter:
+    """Process-wide limiter shared by every Yahoo Finance call."""
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
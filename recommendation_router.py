@@ -0,0 +1,191 @@
+"""Tiered recommendations: the rule engine first, Claude only for borderline cases.
+
+Every request is scored locally (``rule_engine.classify`` plus
+``rule_engine.confidence``). A verdict at least ``min_confidence`` away from
+flipping (``ROUTER_MIN_CONFIDENCE``, default 0.5: 5 points of upside, RSI or
+trend margin) is served from the rules in microseconds; the rest are
+escalated to Claude through the pipeline as before.
+
+Each decision runs in a ``route`` span of the pipeline tracer and is appended,
+with the route taken, the final verdict and how long serving it took, as a
+JSON line to ``ROUTER_LOG_FILE`` (default ``.cache/routing.jsonl``; empty
+disables). The file is opened once per router and line-buffered; when it
+passes ``ROUTER_LOG_MAX_BYTES`` (default 10 MB, 0 = unbounded) it is renamed
+to ``<log>.1``, replacing the previous one, and a new log is started, so at
+most about twice that is kept on disk. ``python recommendation_router.py
+[log]`` summarizes a log: the escalation rate and the latency per route.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from percentiles import percentile
+from recommendation_service import parse_verdict
+from rule_engine import TEMPLATE_VERDICT, VERDICTS, classify, confidence, confidence_band
+
+DEFAULT_MIN_CONFIDENCE = float(os.environ.get("ROUTER_MIN_CONFIDENCE", 0.5))
+DEFAULT_LOG_FILE = os.environ.get("ROUTER_LOG_FILE", os.path.join(".cache", "routing.jsonl"))
+DEFAULT_LOG_MAX_BYTES = int(os.environ.get("ROUTER_LOG_MAX_BYTES", 10_000_000))
+
+ROUTES = ("rules", "llm")
+
+
+class RecommendationRouter:
+    """Routes each recommendation to the rule engine or to Claude and logs the decision."""
+
+    def __init__(self, pipeline, min_confidence: float = DEFAULT_MIN_CONFIDENCE, log_file: str = DEFAULT_LOG_FILE,
+                 max_samples: int = 1000, log_max_bytes: int = DEFAULT_LOG_MAX_BYTES):
+        self.pipeline = pipeline
+        self.min_confidence = min_confidence
+        self.log_file = log_file
+        self.log_max_bytes = log_max_bytes
+        self.counts = dict.fromkeys(ROUTES, 0)
+        self._latency = {route: deque(maxlen=max_samples) for route in ROUTES}
+        self._log = None
+        self._log_bytes = 0
+        self._lock = threading.Lock()
+
+    def route(self, ticker: str, current_price: float, target_price: float, technicals: dict | None = None) -> dict:
+        """The routing decision alone: ``{"ticker", "upside_pct", "rule_verdict", "template_id",
+        "confidence", "band", "route"}``, ``route`` being ``"rules"`` or ``"llm"``."""
+        with self.pipeline.tracer.span("route", ticker=ticker) as span:
+            upside = (target_price - current_price) / current_price * 100
+            template_id = classify(upside, technicals)
+            score = confidence(upside, technicals)
+            decision = {
+                "ticker": ticker,
+                "upside_pct": round(upside, 2),
+                "rule_verdict": VERDICTS[TEMPLATE_VERDICT[template_id]],
+                "template_id": int(template_id),
+                "confidence": round(score, 3),
+                "band": confidence_band(score),
+                "route": "rules" if score >= self.min_confidence else "llm",
+            }
+            span.set(route=decision["route"], confidence=decision["confidence"], band=decision["band"])
+            return decision
+
+    def record(self, decision: dict, seconds: float, verdict: str | None = None, source: str | None = None):
+        """Count a served decision and append it to the routing log.
+
+        ``seconds`` is how long serving it took after the decision, ``verdict``
+        the one shown, ``source`` where it came from (``"rules"``, ``"llm"``,
+        ``"cache"``, ...).
+        """
+        line = json.dumps({"time": time.time(), **decision, "verdict": verdict, "source": source,
+                           "latency_ms": round(1000 * seconds, 2)}) + "\n"
+        with self._lock:
+            self.counts[decision["route"]] += 1
+            self._latency[decision["route"]].append(seconds)
+            if self.log_file:
+                self._write_log(line)
+
+    def _write_log(self, line: str):
+        """Append a line to the open log, rotating it first when it is full (lock held)."""
+        if self._log is not None and self.log_max_bytes and self._log_bytes + len(line) > self.log_max_bytes:
+            self._log.close()
+            os.replace(self.log_file, self.log_file + ".1")
+            self._log = None
+        if self._log is None:
+            os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+            self._log = open(self.log_file, "a", encoding="utf-8", buffering=1)
+            self._log_bytes = self._log.tell()
+        self._log.write(line)
+        self._log_bytes += len(line)
+
+    def close(self):
+        """Close the routing log (the next ``record`` reopens it)."""
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def serve(self, decision: dict, current_price: float, target_price: float, technicals: dict | None = None,
+              stream: bool = False, on_text=None, on_verdict=None) -> dict:
+        """Answer a ``route`` decision from the rules or from Claude, and record it.
+
+        Returns ``{"decision", "verdict", "text", "response", "source", "timings"}``;
+        ``response`` and ``timings`` are the pipeline's (see
+        ``AnalysisPipeline.recommend``) and None when the rules answered.
+        """
+        ticker = decision["ticker"]
+        start = time.perf_counter()
+        if decision["route"] == "rules":
+            rule = self.pipeline.rule_recommendation(ticker, current_price, target_price, technicals)
+            result = {"verdict": rule["verdict"], "text": rule["reasoning"], "response": None, "source": "rules",
+                      "timings": None}
+        else:
+            response, source, timings = self.pipeline.recommend(ticker, current_price, target_price, technicals,
+                                                                stream=stream, on_text=on_text,
+                                                                on_verdict=on_verdict)
+            text = response.content[0].text.strip()
+            result = {"verdict": timings["verdict"] if timings else parse_verdict(text, final=True), "text": text,
+                      "response": response, "source": source, "timings": timings}
+        self.record(decision, time.perf_counter() - start, result["verdict"], result["source"])
+        return dict(result, decision=decision)
+
+    def recommend(self, ticker: str, current_price: float, target_price: float, technicals: dict | None = None,
+                  **kwargs) -> dict:
+        """``route`` then ``serve``; ``kwargs`` (``stream``, ``on_text``, ...) go to ``serve``."""
+        decision = self.route(ticker, current_price, target_price, technicals)
+        return self.serve(decision, current_price, target_price, technicals, **kwargs)
+
+    def summary(self) -> dict:
+        """``{"decisions", "escalated", "escalation_rate", "<route>_p50_ms", "<route>_p95_ms"}``."""
+        with self._lock:
+            return _summarize({route: list(samples) for route, samples in self._latency.items()}, self.counts)
+
+    def format_summary(self) -> str:
+        return format_summary(self.summary())
+
+
+def _summarize(latency: dict[str, list[float]], counts: dict[str, int] | None = None) -> dict:
+    counts = counts or {route: len(samples) for route, samples in latency.items()}
+    decisions = sum(counts.values())
+    result = {"decisions": decisions, "escalated": counts["llm"],
+              "escalation_rate": counts["llm"] / decisions if decisions else 0.0}
+    for route, samples in latency.items():
+        result[f"{route}_p50_ms"] = 1000 * percentile(samples, 50) if samples else None
+        result[f"{route}_p95_ms"] = 1000 * percentile(samples, 95) if samples else None
+    return result
+
+
+def format_summary(summary: dict) -> str:
+    if not summary["decisions"]:
+        return "no routing decisions yet"
+    latency = ", ".join(f"{route} p50={summary[f'{route}_p50_ms']:.1f}ms"
+                        for route in ROUTES if summary[f"{route}_p50_ms"] is not None)
+    return (f"{summary['escalated']}/{summary['decisions']} escalated to Claude "
+            f"({summary['escalation_rate']:.0%}); {latency}")
+
+
+def summarize_log(path: str = DEFAULT_LOG_FILE) -> dict:
+    """``RecommendationRouter.summary`` over a routing log, plus ``"bands"``: decisions per
+    confidence band, and ``"agreement"``: the share of escalated decisions where Claude
+    gave the rules' verdict."""
+    latency = {route: [] for route in ROUTES}
+    bands = {}
+    agree = checked = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            latency[entry["route"]].append(entry["latency_ms"] / 1000)
+            bands[entry["band"]] = bands.get(entry["band"], 0) + 1
+            if entry["route"] == "llm" and entry["verdict"]:
+                checked += 1
+                agree += entry["verdict"] == entry["rule_verdict"]
+    return dict(_summarize(latency), bands=bands, agreement=agree / checked if checked else None)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_LOG_FILE
+    summary = summarize_log(path)
+    print(format_summary(summary))
+    if summary["decisions"]:
+        print("bands: " + ", ".join(f"{band}={count}" for band, count in sorted(summary["bands"].items())))
+        if summary["agreement"] is not None:
+            print(f"Claude agreed with the rules on {summary['agreement']:.0%} of the escalated cases")
@@ -0,0 +1,324 @@
+"""Shared recommendation service with request coalescing.
+
+One instance is shared by all Streamlit sessions (via ``st.cache_resource``).
+Identical requests, keyed on ticker + quantized prices
+(``llm_cache.quantize_price``, the same grid as the response cache) + the
+technicals line + model + prompt version, are single-flighted: while one Claude call is in
+flight every other session asking the same question gets the same ``Future``,
+and finished answers are kept for a short TTL so a burst of clicks right after
+also costs nothing.
+
+``stream`` runs the call as a streamed message in the caller's thread, so a
+UI can render tokens and the BUY/HOLD/SELL verdict as soon as they arrive.
+
+``verdict`` asks for the structured answer only: the model has to call the
+``record_verdict`` tool with ``{verdict, confidence, short_rationale}``
+(``VERDICT_TOOL``), capped at ``VERDICT_MAX_TOKENS`` output tokens, so a UI
+that needs just the verdict does not pay for the prose rationale.
+"""
+import asyncio
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from llm_cache import PRICE_BUCKET, quantize_price
+from model_probe import select_model
+
+# Fastest/cheapest model from the last test_all_claude_models.py run (or CLAUDE_MODEL)
+RECOMMENDATION_MODEL = select_model()
+RECOMMENDATION_SYSTEM = "You are a financial assistant. Make a BUY/HOLD/SELL recommendation: BUY if current price much lower than target price, HOLD if close, SELL if higher. When technicals are given, temper a BUY if the stock is overbought (RSI above 70) or in a downtrend below its 200-day average."
+# Bump whenever the system prompt or user message format changes
+PROMPT_VERSION = "reco-v2"
+
+VERDICTS = ("BUY", "HOLD", "SELL")
+VERDICT_MAX_TOKENS = 150
+VERDICT_TOOL = {
+    "name": "record_verdict",
+    "description": "Record the recommendation for the stock.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "verdict": {"type": "string", "enum": list(VERDICTS)},
+            "confidence": {"type": "number", "minimum": 0, "maximum": 1,
+                           "description": "How clear-cut the verdict is, 0 to 1."},
+            "short_rationale": {"type": "string", "description": "One sentence, at most 25 words."},
+        },
+        "required": ["verdict", "confidence", "short_rationale"],
+    },
+}
+
+# The verdict is the first BUY/HOLD/SELL word within this many characters of
+# the answer; if none appears there, the answer counts as HOLD.
+VERDICT_WINDOW = 50
+_VERDICT_RE = re.compile(r"\b(BUY|HOLD|SELL)\b")
+
+
+def create_message(client, **kwargs):
+    """Call either the anthropic SDK client or ``anthropic_simple.AnthropicClient``."""
+    if hasattr(client, "messages"):
+        return client.messages.create(**kwargs)
+    return client.create_message(**kwargs)
+
+
+def stream_message(client, **kwargs):
+    """Streaming counterpart of ``create_message``: a context manager yielding a stream
+    with ``text_stream`` and ``get_final_message()``."""
+    if hasattr(client, "messages"):
+        return client.messages.stream(**kwargs)
+    return client.stream_message(**kwargs)
+
+
+def parse_verdict(text: str, final: bool = False) -> str | None:
+    """BUY/HOLD/SELL from the start of an answer, or None while it is still undecided.
+
+    Works on partial text: returns as soon as a verdict word is complete, and
+    falls back to HOLD once ``VERDICT_WINDOW`` characters (or, with ``final``,
+    the whole answer) have arrived without one.
+    """
+    head = text[:VERDICT_WINDOW].upper()
+    match = _VERDICT_RE.search(head)
+    # A match touching the end of partial text may still grow ("BUYBACK")
+    if match and (final or match.end() < len(head) or len(text) > len(head)):
+        return match.group(1)
+    if final or len(text) >= VERDICT_WINDOW:
+        return "HOLD"
+    return None
+
+
+def stream_recommendation(client, on_text=None, on_verdict=None, **kwargs) -> dict:
+    """Run a streamed message and time it.
+
+    ``on_text(text_so_far)`` is called for every delta and ``on_verdict(verdict)``
+    once, as soon as ``parse_verdict`` can decide. Returns ``{"response",
+    "verdict", "ttft_s", "ttv_s", "total_s"}``; ``response`` is the final
+    message, with the same shape as ``create_message``'s.
+    """
+    start = time.perf_counter()
+    ttft = ttv = None
+    verdict = None
+    text = ""
+    with stream_message(client, **kwargs) as stream:
+        for delta in stream.text_stream:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            text += delta
+            if on_text is not None:
+                on_text(text)
+            if verdict is None:
+                verdict = parse_verdict(text.lstrip())
+                if verdict is not None:
+                    ttv = time.perf_counter() - start
+                    if on_verdict is not None:
+                        on_verdict(verdict)
+        response = stream.get_final_message()
+    total = time.perf_counter() - start
+    if verdict is None:
+        verdict = parse_verdict(text.lstrip(), final=True)
+        ttv = total
+        if on_verdict is not None:
+            on_verdict(verdict)
+    return {"response": response, "verdict": verdict, "ttft_s": ttft, "ttv_s": ttv, "total_s": total}
+
+
+def recommendation_prompt(ticker: str, current_price: float, target_price: float, technicals: str = "") -> str:
+    """User message for a recommendation; ``technicals`` is ``indicators.format_technicals`` output."""
+    prompt = f"Ticker: {ticker}, Current price: {current_price}, Target price: {target_price}."
+    return f"{prompt} {technicals}" if technicals else prompt
+
+
+def verdict_request(ticker: str, current_price: float, target_price: float, technicals: str = "") -> dict:
+    """Messages API parameters forcing a ``record_verdict`` tool call."""
+    return {
+        "model": RECOMMENDATION_MODEL,
+        "max_tokens": VERDICT_MAX_TOKENS,
+        "system": RECOMMENDATION_SYSTEM,
+        "messages": [{"role": "user", "content": recommendation_prompt(ticker, current_price, target_price, technicals)}],
+        "tools": [VERDICT_TOOL],
+        "tool_choice": {"type": "tool", "name": VERDICT_TOOL["name"]},
+    }
+
+
+def parse_structured(response) -> dict:
+    """``{"verdict", "confidence", "short_rationale"}`` from a ``verdict_request`` response.
+
+    An answer without a valid tool call falls back to ``parse_verdict`` on its
+    text, with ``confidence`` None.
+    """
+    for block in response.content:
+        if getattr(block, "type", None) != "tool_use":
+            continue
+        data = block.input or {}
+        verdict = str(data.get("verdict", "")).upper()
+        if verdict not in VERDICTS:
+            break
+        try:
+            confidence = min(1.0, max(0.0, float(data.get("confidence"))))
+        except (TypeError, ValueError):
+            confidence = None
+        return {"verdict": verdict, "confidence": confidence,
+                "short_rationale": str(data.get("short_rationale") or "").strip()}
+    text = "".join(getattr(block, "text", "") or "" for block in response.content).strip()
+    return {"verdict": parse_verdict(text, final=True), "confidence": None, "short_rationale": text[:200]}
+
+
+def format_stream_timings(result: dict) -> str:
+    """``TTFT=…ms, verdict=…ms, total=…ms`` for the token usage log line."""
+    ttft = f"{result['ttft_s'] * 1000:.0f}ms" if result["ttft_s"] is not None else "n/a"
+    return f"TTFT={ttft}, verdict={result['ttv_s'] * 1000:.0f}ms, total={result['total_s'] * 1000:.0f}ms"
+
+
+class RecommendationService:
+    """Single-flight + short-TTL cache in front of the recommendation LLM call."""
+
+    def __init__(self, client, max_workers: int = 8, result_ttl: float = 30.0, price_bucket: float = PRICE_BUCKET):
+        self.client = client
+        self.result_ttl = result_ttl
+        self.price_bucket = price_bucket
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recommendation")
+        self._inflight = {}   # key -> Future
+        self._results = {}    # key -> (expires_at, Future)
+        # Re-entrant: a done-callback may run inline in the submitting thread
+        self._lock = threading.RLock()
+        self.stats = {"llm_calls": 0, "coalesced": 0, "cache_hits": 0}
+
+    def key(self, ticker: str, current_price: float, target_price: float, technicals: str = "",
+            structured: bool = False) -> tuple:
+        return (
+            ticker.upper(),
+            quantize_price(float(current_price), self.price_bucket),
+            quantize_price(float(target_price), self.price_bucket),
+            technicals,
+            RECOMMENDATION_MODEL,
+            PROMPT_VERSION,
+            "verdict" if structured else "text",
+        )
+
+    def submit(self, ticker: str, current_price: float, target_price: float,
+               technicals: str = "", structured: bool = False) -> tuple[Future, str]:
+        """Return ``(future, source)``; source is ``"llm"``, ``"coalesced"`` or ``"cache"``.
+
+        ``technicals`` is an optional ``indicators.format_technicals`` line
+        appended to the prompt; ``structured`` asks for the ``verdict_request``
+        tool call instead of the prose answer.
+        """
+        key = self.key(ticker, current_price, target_price, technicals, structured)
+        # The prompt carries the key's prices: everyone sharing the key gets the answer to one question
+        current_price, target_price = key[1], key[2]
+        with self._lock:
+            cached = self._results.get(key)
+            if cached and cached[0] > time.monotonic():
+                self.stats["cache_hits"] += 1
+                return cached[1], "cache"
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future, "coalesced"
+
+            self.stats["llm_calls"] += 1
+            future = self._pool.submit(self._call, ticker, current_price, target_price, technicals, structured)
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+            return future, "llm"
+
+    def recommend(self, ticker: str, current_price: float, target_price: float, timeout: float | None = None,
+                  technicals: str = ""):
+        """Blocking helper: ``(response, source)``."""
+        future, source = self.submit(ticker, current_price, target_price, technicals)
+        return future.result(timeout), source
+
+    def verdict(self, ticker: str, current_price: float, target_price: float, timeout: float | None = None,
+                technicals: str = ""):
+        """Blocking helper for the structured answer: ``(parse_structured result, response, source)``."""
+        future, source = self.submit(ticker, current_price, target_price, technicals, structured=True)
+        response = future.result(timeout)
+        return parse_structured(response), response, source
+
+    async def arecommend(self, ticker: str, current_price: float, target_price: float, technicals: str = ""):
+        """asyncio helper: ``(response, source)``."""
+        future, source = self.submit(ticker, current_price, target_price, technicals)
+        return await asyncio.wrap_future(future), source
+
+    def stream(self, ticker: str, current_price: float, target_price: float, on_text=None, on_verdict=None,
+               technicals: str = ""):
+        """Streaming helper: ``(response, source, timings)``.
+
+        When this call has to go to the LLM it is streamed on the service's
+        pool and relayed to the calling thread (``on_text``/``on_verdict`` fire
+        there as tokens arrive, see ``stream_recommendation``) while other
+        sessions asking the same question coalesce onto it as usual. The call
+        finishes even if the caller stops listening (a Streamlit rerun raised
+        from ``on_text``), so the waiters always get the answer. Cached or
+        coalesced answers are returned whole, with ``timings`` None.
+        """
+        key = self.key(ticker, current_price, target_price, technicals)
+        current_price, target_price = key[1], key[2]
+        with self._lock:
+            cached = self._results.get(key)
+            if cached and cached[0] > time.monotonic():
+                self.stats["cache_hits"] += 1
+                return cached[1].result(), "cache", None
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                self.stats["llm_calls"] += 1
+                events = queue.SimpleQueue()
+                future = self._pool.submit(self._stream_call, events, ticker, current_price, target_price,
+                                           technicals)
+                self._inflight[key] = future
+                future.add_done_callback(lambda done: self._finish(key, done))
+                future.add_done_callback(lambda done: events.put(None))
+                leader = True
+
+        if not leader:
+            return future.result(), "coalesced", None
+        timings = None
+        while (event := events.get()) is not None:
+            kind, value = event
+            if kind == "text" and on_text is not None:
+                on_text(value)
+            elif kind == "verdict" and on_verdict is not None:
+                on_verdict(value)
+            elif kind == "timings":
+                timings = value
+        return future.result(), "llm", timings
+
+    def _stream_call(self, events, ticker: str, current_price: float, target_price: float, technicals: str = ""):
+        """Pool side of ``stream``: every delta, the verdict and the timings go to ``events``."""
+        timings = stream_recommendation(self.client, on_text=lambda text: events.put(("text", text)),
+                                        on_verdict=lambda verdict: events.put(("verdict", verdict)),
+                                        **self._request(ticker, current_price, target_price, technicals))
+        events.put(("timings", timings))
+        return timings["response"]
+
+    @staticmethod
+    def _request(ticker: str, current_price: float, target_price: float, technicals: str = "") -> dict:
+        return {
+            "model": RECOMMENDATION_MODEL,
+            "max_tokens": 500,
+            "system": RECOMMENDATION_SYSTEM,
+            "messages": [{
+                "role": "user",
+                "content": recommendation_prompt(ticker, current_price, target_price, technicals)
+            }],
+        }
+
+    def _call(self, ticker: str, current_price: float, target_price: float, technicals: str = "",
+              structured: bool = False):
+        request = (verdict_request if structured else self._request)(ticker, current_price, target_price, technicals)
+        return create_message(self.client, **request)
+
+    def _finish(self, key: tuple, future: Future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            now = time.monotonic()
+            for expired in [k for k, (expires_at, _) in self._results.items() if expires_at <= now]:
+                del self._results[expired]
+            # Failed calls are not cached; the next request retries
+            if future.exception() is None:
+                self._results[key] = (now + self.result_ttl, future)
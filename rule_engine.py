@@ -0,0 +1,223 @@
+"""Vectorized rule-based recommendation engine.
+
+The thresholds are the ones ``main_demo.get_recommendation`` has always used
+(upside > 15% BUY, > 5% HOLD below target, > -5% HOLD near target, else
+SELL), applied to whole arrays of prices in one NumPy pass. Scoring returns
+numeric codes only; the Slovak reasoning text is rendered lazily, per row,
+when a result is actually displayed.
+
+When technical indicators (``indicators.IndicatorState.snapshot``) are passed
+in, a BUY is capped at HOLD if RSI shows the stock overbought, or if it is in
+a downtrend below its 200-day average and well off its high. Without them
+the verdicts are exactly the upside-only ones.
+
+``confidence`` scores how clear-cut a single verdict is: how far its inputs
+sit from the nearest threshold that would flip it. Verdicts in the
+``borderline`` band are the ones worth a second opinion (see
+``recommendation_router``).
+"""
+import math
+
+import numpy as np
+
+BUY_THRESHOLD = 15.0
+HOLD_BELOW_TARGET_THRESHOLD = 5.0
+SELL_THRESHOLD = -5.0
+RSI_OVERBOUGHT = 70.0
+DOWNTREND_DRAWDOWN = -0.20
+
+# Margin to the nearest flipping threshold, in points (upside and distance to the
+# 200-day average in %, RSI, drawdown in %), that counts as full confidence
+CONFIDENCE_SCALE = 10.0
+# (lower bound, band) from the most confident down
+CONFIDENCE_BANDS = ((0.8, "clear"), (0.5, "likely"), (0.0, "borderline"))
+
+VERDICTS = ("BUY", "HOLD", "SELL")
+BUY, HOLD, SELL = 0, 1, 2
+
+# Reasoning template IDs
+TEMPLATE_INVALID = -1
+TEMPLATE_BUY = 0
+TEMPLATE_HOLD_BELOW_TARGET = 1
+TEMPLATE_HOLD_NEAR_TARGET = 2
+TEMPLATE_SELL = 3
+TEMPLATE_BUY_OVERBOUGHT = 4
+TEMPLATE_BUY_DOWNTREND = 5
+
+TEMPLATE_VERDICT = np.array([BUY, HOLD, HOLD, SELL, HOLD, HOLD], dtype=np.int8)
+
+REASONING_TEMPLATES = {
+    TEMPLATE_BUY: "Akcia {ticker} je výrazne pod cieľovou cenou analytikov. Aktuálna cena je ${current_price:.2f}, zatiaľ čo analytici očakávajú ${target_price:.2f} (potenciálny rast {price_diff_pct:.1f}%). To naznačuje významnú príležitosť na zhodnotenie.",
+    TEMPLATE_HOLD_BELOW_TARGET: "Akcia {ticker} je mierne pod cieľovou cenou analytikov. Aktuálna cena ${current_price:.2f} má potenciál rastu na ${target_price:.2f} (približne {price_diff_pct:.1f}%), čo naznačuje miernu príležitosť. Odporúčame držať a monitorovať.",
+    TEMPLATE_HOLD_NEAR_TARGET: "Akcia {ticker} je blízko cieľovej ceny analytikov. Aktuálna cena ${current_price:.2f} je v rovnováhe s cieľom ${target_price:.2f} ({price_diff_pct:+.1f}%). Držte pozíciu a sledujte vývoj.",
+    TEMPLATE_SELL: "Akcia {ticker} je nad cieľovou cenou analytikov. Aktuálna cena ${current_price:.2f} presahuje cieľ ${target_price:.2f} o {abs_price_diff_pct:.1f}%, čo môže naznačovať prekúpenosť. Zvážte realizáciu zisku.",
+    TEMPLATE_BUY_OVERBOUGHT: "Akcia {ticker} je výrazne pod cieľovou cenou analytikov (${current_price:.2f} oproti ${target_price:.2f}, potenciálny rast {price_diff_pct:.1f}%), ale RSI {rsi:.0f} signalizuje prekúpenosť po nedávnom raste. Odporúčame držať a počkať na lepší vstupný bod.",
+    TEMPLATE_BUY_DOWNTREND: "Akcia {ticker} je výrazne pod cieľovou cenou analytikov (${current_price:.2f} oproti ${target_price:.2f}, potenciálny rast {price_diff_pct:.1f}%), no je v klesajúcom trende pod 200-dňovým priemerom a {abs_drawdown_pct:.0f}% pod svojím maximom. Odporúčame držať, kým sa trend neobráti.",
+}
+
+
+def _technical_cap(technicals):
+    """Masks (overbought, downtrend) for scalars or arrays; NaN inputs count as False.
+
+    The trend compares the indicators' own last close with their 200-day
+    average (same bars), on the scalar and the vectorized path alike.
+    """
+    with np.errstate(invalid="ignore"):
+        overbought = np.asarray(technicals["rsi"]) >= RSI_OVERBOUGHT
+        downtrend = ((np.asarray(technicals["close"]) < np.asarray(technicals["sma_slow"]))
+                     & (np.asarray(technicals["drawdown"]) <= DOWNTREND_DRAWDOWN))
+    return overbought, downtrend
+
+
+def classify(price_diff_pct: float, technicals: dict | None = None) -> int:
+    """Reasoning template ID for a single upside value (scalar path).
+
+    ``technicals`` is one ticker's indicator snapshot (``IndicatorState.row``).
+    """
+    if price_diff_pct > BUY_THRESHOLD:
+        if technicals:
+            overbought, downtrend = _technical_cap(technicals)
+            if overbought:
+                return TEMPLATE_BUY_OVERBOUGHT
+            if downtrend:
+                return TEMPLATE_BUY_DOWNTREND
+        return TEMPLATE_BUY
+    if price_diff_pct > HOLD_BELOW_TARGET_THRESHOLD:
+        return TEMPLATE_HOLD_BELOW_TARGET
+    if price_diff_pct > SELL_THRESHOLD:
+        return TEMPLATE_HOLD_NEAR_TARGET
+    return TEMPLATE_SELL
+
+
+def confidence(price_diff_pct: float, technicals: dict | None = None) -> float:
+    """How clear-cut ``classify``'s verdict is, from 0 (on a threshold) to 1.
+
+    The margin is the distance to the nearest threshold that changes the
+    verdict: the BUY and SELL upside thresholds (the 5% one only switches
+    between the two HOLD texts), and for an upside above the BUY threshold
+    also the RSI and downtrend caps. Missing (NaN) indicators add no margin.
+    """
+    if not math.isfinite(price_diff_pct):
+        return 0.0
+    margins = [abs(price_diff_pct - BUY_THRESHOLD), abs(price_diff_pct - SELL_THRESHOLD)]
+    if technicals and price_diff_pct > BUY_THRESHOLD:
+        rsi, close, sma_slow, drawdown = (technicals["rsi"], technicals["close"], technicals["sma_slow"],
+                                          technicals["drawdown"])
+        if math.isfinite(rsi):
+            margins.append(abs(rsi - RSI_OVERBOUGHT))
+        if math.isfinite(close) and math.isfinite(sma_slow) and sma_slow > 0 and math.isfinite(drawdown):
+            # Both conditions make a downtrend: breaking either ends one, starting one needs both
+            below_sma = (1 - close / sma_slow) * 100
+            off_high = (DOWNTREND_DRAWDOWN - drawdown) * 100
+            if below_sma > 0 and off_high >= 0:
+                margins.append(min(below_sma, off_high))
+            else:
+                margins.append(max(-below_sma, -off_high, 0.0))
+    return min(1.0, min(margins) / CONFIDENCE_SCALE)
+
+
+def confidence_band(score: float) -> str:
+    return next(band for bound, band in CONFIDENCE_BANDS if score >= bound)
+
+
+def render_reasoning(template_id: int, ticker: str, current_price: float, target_price: float,
+                     price_diff_pct: float, rsi: float = float("nan"), drawdown: float = float("nan")) -> str:
+    return REASONING_TEMPLATES[template_id].format(
+        ticker=ticker,
+        current_price=current_price,
+        target_price=target_price,
+        price_diff_pct=price_diff_pct,
+        abs_price_diff_pct=abs(price_diff_pct),
+        rsi=rsi,
+        abs_drawdown_pct=abs(drawdown) * 100,
+    )
+
+
+class UniverseScores:
+    """Result of ``score_universe``: parallel NumPy arrays, one row per symbol."""
+
+    __slots__ = ("tickers", "current_price", "target_price", "upside_pct", "template_id", "verdict_code",
+                 "technicals")
+
+    def __init__(self, tickers, current_price, target_price, upside_pct, template_id, verdict_code,
+                 technicals=None):
+        self.tickers = tickers
+        self.current_price = current_price
+        self.target_price = target_price
+        self.upside_pct = upside_pct
+        self.template_id = template_id
+        self.verdict_code = verdict_code
+        self.technicals = technicals
+
+    def __len__(self):
+        return len(self.upside_pct)
+
+    def verdict(self, i: int) -> str | None:
+        code = self.verdict_code[i]
+        return VERDICTS[code] if code >= 0 else None
+
+    def counts(self) -> dict:
+        codes = self.verdict_code[self.verdict_code >= 0]
+        counts = np.bincount(codes, minlength=len(VERDICTS))
+        return {name: int(counts[i]) for i, name in enumerate(VERDICTS)}
+
+    def render(self, i: int) -> str | None:
+        """Reasoning text for row ``i``; only call this for rows that are shown."""
+        template_id = int(self.template_id[i])
+        if template_id == TEMPLATE_INVALID:
+            return None
+        extra = {}
+        if self.technicals is not None:
+            extra = {"rsi": float(self.technicals["rsi"][i]), "drawdown": float(self.technicals["drawdown"][i])}
+        return render_reasoning(template_id, str(self.tickers[i]), float(self.current_price[i]),
+                                float(self.target_price[i]), float(self.upside_pct[i]), **extra)
+
+    def to_frame(self):
+        """pandas DataFrame view (verdict as strings) for display/export."""
+        import pandas as pd
+
+        verdict = np.array(VERDICTS + (None,), dtype=object)[self.verdict_code]
+        frame = pd.DataFrame({
+            "ticker": self.tickers,
+            "current_price": self.current_price,
+            "target_price": self.target_price,
+            "upside_pct": self.upside_pct,
+            "verdict": verdict,
+            "template_id": self.template_id,
+        })
+        if self.technicals is not None:
+            for name in ("rsi", "sma_slow", "volatility", "drawdown"):
+                frame[name] = self.technicals[name]
+        return frame
+
+
+def score_universe(tickers, current_prices, target_prices, technicals: dict | None = None) -> UniverseScores:
+    """Classify every symbol in one vectorized pass.
+
+    Rows with a missing (NaN) or non-positive current price, or a missing
+    target, get template ID -1 and verdict code -1. ``technicals`` is an
+    ``IndicatorState.snapshot()`` with rows aligned to ``tickers``.
+    """
+    current = np.asarray(current_prices, dtype=np.float64)
+    target = np.asarray(target_prices, dtype=np.float64)
+    valid = np.isfinite(current) & np.isfinite(target) & (current > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        upside = np.where(valid, (target - current) / current * 100, np.nan)
+
+    template_id = np.select(
+        [upside > BUY_THRESHOLD, upside > HOLD_BELOW_TARGET_THRESHOLD, upside > SELL_THRESHOLD],
+        [TEMPLATE_BUY, TEMPLATE_HOLD_BELOW_TARGET, TEMPLATE_HOLD_NEAR_TARGET],
+        default=TEMPLATE_SELL,
+    ).astype(np.int8)
+    if technicals is not None:
+        overbought, downtrend = _technical_cap(technicals)
+        buy = template_id == TEMPLATE_BUY
+        template_id[buy & overbought] = TEMPLATE_BUY_OVERBOUGHT
+        template_id[buy & ~overbought & downtrend] = TEMPLATE_BUY_DOWNTREND
+    template_id[~valid] = TEMPLATE_INVALID
+
+    verdict_code = np.full(template_id.shape, -1, dtype=np.int8)
+    verdict_code[valid] = TEMPLATE_VERDICT[template_id[valid]]
+
+    return UniverseScores(np.asarray(tickers), current, target, upside, template_id, verdict_code, technicals)
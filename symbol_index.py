@@ -0,0 +1,238 @@
+"""Local company-name -> ticker index.
+
+Resolving "Microsoft" to "MSFT" through Claude costs a full request. The
+index answers most lookups locally from the bundled ``data/listings.csv``
+(symbol, name, aliases) using, in order:
+
+1. exact match on a normalized name, alias or symbol,
+2. unique prefix match in a trie ("nvid" -> NVDA),
+3. fuzzy trigram match for typos ("facebok" -> META).
+
+Only when none of these is confident does the caller's LLM fallback run;
+its answer is written back so the same name never reaches the LLM twice,
+unless it is a refusal ("UNKNOWN", "NONE", ...) or the caller's ``validate``
+check (does the quote provider know the symbol?) rejects it.
+"""
+import csv
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import deque
+
+from percentiles import percentile
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+LISTINGS_PATH = os.path.join(DATA_DIR, "listings.csv")
+LEARNED_PATH = os.environ.get("SYMBOL_INDEX_LEARNED_PATH", os.path.join(".cache", "learned_symbols.csv"))
+
+MIN_PREFIX_LENGTH = 3
+FUZZY_MIN_SCORE = 0.6
+FUZZY_MIN_MARGIN = 0.1
+
+# Legal-form and filler words that do not help identify a company
+_STOP_WORDS = {
+    "the", "inc", "incorporated", "corp", "corporation", "co", "company", "companies",
+    "ltd", "limited", "plc", "llc", "lp", "sa", "nv", "ag", "se", "as",
+    "holding", "holdings", "group",
+}
+_SYMBOL_RE = re.compile(r"^[A-Z][A-Z0-9.\-]{0,9}$")
+# Symbol-shaped LLM answers that mean "no ticker"; never learned
+_REFUSALS = {"UNKNOWN", "NONE", "NULL", "NA", "N.A.", "NAN", "ERROR", "INVALID", "NOT", "NO", "SORRY", "TICKER",
+             "SYMBOL", "UNAVAILABLE", "PRIVATE", "TBD"}
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents/punctuation and legal-form words."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    text = re.sub(r"['&]", "", text)
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    words = [word for word in text.split() if word not in _STOP_WORDS]
+    return " ".join(words)
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ("children", "symbols")
+
+    def __init__(self):
+        self.children = {}
+        self.symbols = set()
+
+
+class SymbolIndex:
+    """In-memory name/alias/prefix/fuzzy index of ticker symbols."""
+
+    def __init__(self, listings_path: str = LISTINGS_PATH, learned_path: str | None = LEARNED_PATH,
+                 max_samples: int = 1000):
+        self.learned_path = learned_path
+        self._exact = {}        # normalized key -> symbol
+        self._trie = _TrieNode()
+        self._grams = {}        # trigram -> set of keys
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = {"exact": 0, "prefix": 0, "fuzzy": 0}
+        self.llm_fallbacks = 0
+        self._latencies_ms = deque(maxlen=max_samples)
+        self._llm_latencies_ms = deque(maxlen=max_samples)
+
+        self._load(listings_path)
+        if learned_path and os.path.exists(learned_path):
+            self._load(learned_path)
+
+    def _load(self, path: str):
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                names = [row["name"], row["symbol"]] + [a for a in (row.get("aliases") or "").split("|") if a]
+                for name in names:
+                    self._add_key(normalize(name), row["symbol"])
+
+    def _add_key(self, key: str, symbol: str):
+        if not key:
+            return
+        self._exact.setdefault(key, symbol)
+        node = self._trie
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            node.symbols.add(symbol)
+        for gram in _trigrams(key):
+            self._grams.setdefault(gram, set()).add(key)
+
+    def __len__(self):
+        return len(set(self._exact.values()))
+
+    # --- Lookup ---
+
+    def lookup(self, query: str) -> tuple[str, str] | None:
+        """Return ``(symbol, method)`` for a confident local match, else None."""
+        key = normalize(query)
+        if not key:
+            return None
+
+        symbol = self._exact.get(key)
+        if symbol:
+            return symbol, "exact"
+
+        if len(key) >= MIN_PREFIX_LENGTH:
+            node = self._trie
+            for char in key:
+                node = node.children.get(char)
+                if node is None:
+                    break
+            else:
+                if len(node.symbols) == 1:
+                    return next(iter(node.symbols)), "prefix"
+                # A prefix of several names ("micro") is ambiguous, not a typo
+                return None
+
+        return self._fuzzy(key)
+
+    def _fuzzy(self, key: str) -> tuple[str, str] | None:
+        query_grams = _trigrams(key)
+        shared = {}
+        for gram in query_grams:
+            for candidate in self._grams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        if not shared:
+            return None
+
+        # Dice coefficient, best score per symbol
+        best = {}
+        for candidate, count in shared.items():
+            score = 2 * count / (len(query_grams) + len(_trigrams(candidate)))
+            symbol = self._exact[candidate]
+            if score > best.get(symbol, 0):
+                best[symbol] = score
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        symbol, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if score >= FUZZY_MIN_SCORE and score - runner_up >= FUZZY_MIN_MARGIN:
+            return symbol, "fuzzy"
+        return None
+
+    # --- Resolution with LLM fallback ---
+
+    def resolve(self, query: str, llm_fallback, validate=None) -> dict:
+        """Resolve a company name, asking ``llm_fallback(query) -> ticker`` only on a local miss.
+
+        The LLM's answer is learned only if it looks like a symbol, is not a
+        refusal and ``validate(ticker) -> bool`` (when given) accepts it.
+        Returns ``{"ticker": ..., "source": "exact" | "prefix" | "fuzzy" | "llm"}``.
+        """
+        start = time.perf_counter()
+        match = self.lookup(query)
+        if match:
+            symbol, method = match
+            self._record(start, method)
+            return {"ticker": symbol, "source": method}
+
+        ticker = llm_fallback(query)
+        self._record(start, "llm")
+        if (ticker and _SYMBOL_RE.match(ticker) and ticker not in _REFUSALS
+                and (validate is None or validate(ticker))):
+            self.learn(query, ticker)
+        return {"ticker": ticker, "source": "llm"}
+
+    def learn(self, name: str, symbol: str):
+        """Add a name -> symbol mapping and persist it to the learned file."""
+        key = normalize(name)
+        if not key:
+            return
+        with self._lock:
+            if key in self._exact:
+                return
+            self._add_key(key, symbol)
+            if self.learned_path:
+                directory = os.path.dirname(self.learned_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                new_file = not os.path.exists(self.learned_path)
+                with open(self.learned_path, "a", encoding="utf-8", newline="") as f:
+                    writer = csv.writer(f)
+                    if new_file:
+                        writer.writerow(["symbol", "name", "aliases"])
+                    writer.writerow([symbol, name, ""])
+
+    def _record(self, start: float, method: str):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.lookups += 1
+            if method == "llm":
+                self.llm_fallbacks += 1
+                self._llm_latencies_ms.append(elapsed_ms)
+            else:
+                self.hits[method] += 1
+            self._latencies_ms.append(elapsed_ms)
+
+    def stats(self) -> dict:
+        """Hit rate over all ``resolve`` calls and latency percentiles (ms) over the recent ones."""
+        with self._lock:
+            index_hits = sum(self.hits.values())
+            latencies, llm_latencies = self._latencies_ms, self._llm_latencies_ms
+            return {
+                "lookups": self.lookups,
+                "index_hits": dict(self.hits),
+                "llm_fallbacks": self.llm_fallbacks,
+                "hit_rate": round(index_hits / self.lookups, 4) if self.lookups else None,
+                "p50_ms": percentile(latencies, 50) if latencies else None,
+                "p99_ms": percentile(latencies, 99) if latencies else None,
+                "llm_p50_ms": percentile(llm_latencies, 50) if llm_latencies else None,
+            }
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_default_index() -> SymbolIndex:
+    """Process-wide index built from the bundled listings plus learned names."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = SymbolIndex()
+        return _default_index
@@ -0,0 +1,57 @@
+"""``SQLiteBackend``: hits stay reads, expired entries are misses, inserts evict to ``max_entries``."""
+import os
+import tempfile
+import time
+import unittest
+
+from llm_cache import SQLiteBackend
+
+
+class SQLiteBackendTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "llm.sqlite3")
+
+    def backend(self, **kwargs) -> SQLiteBackend:
+        backend = SQLiteBackend(self.path, **kwargs)
+        self.addCleanup(backend._conn().close)
+        return backend
+
+    def test_hits_within_touch_interval_write_nothing(self):
+        backend = self.backend(touch_interval=60)
+        backend.set("k", {"text": "BUY"}, ttl=60)
+        conn = backend._conn()
+        writes = conn.total_changes
+        for _ in range(20):
+            self.assertEqual(backend.get("k"), {"text": "BUY"})
+        self.assertEqual(conn.total_changes, writes)
+
+    def test_stale_access_time_is_touched(self):
+        backend = self.backend(touch_interval=0)
+        backend.set("k", {"text": "BUY"}, ttl=60)
+        before = backend._conn().execute("SELECT accessed_at FROM responses").fetchone()[0]
+        time.sleep(0.01)
+        backend.get("k")
+        self.assertGreater(backend._conn().execute("SELECT accessed_at FROM responses").fetchone()[0], before)
+
+    def test_expired_entry_is_a_miss_until_replaced(self):
+        backend = self.backend()
+        backend.set("k", {"text": "BUY"}, ttl=0)
+        self.assertIsNone(backend.get("k"))
+        backend.set("k", {"text": "HOLD"}, ttl=60)
+        self.assertEqual(backend.get("k"), {"text": "HOLD"})
+
+    def test_inserts_evict_least_recently_used(self):
+        backend = self.backend(max_entries=3, touch_interval=0)
+        for key in "abc":
+            backend.set(key, {"text": key}, ttl=60)
+            time.sleep(0.01)
+        backend.get("a")
+        backend.set("d", {"text": "d"}, ttl=60)
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual([backend.get(key)["text"] for key in "acd"], ["a", "c", "d"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+"""``LLMMeter.prometheus_text``: every metric is one family, the latency one a histogram."""
+import unittest
+
+from llm_metering import LATENCY_BUCKETS, LLMMeter
+
+MODEL = "claude-3-5-haiku-latest"
+
+
+class PrometheusTextTest(unittest.TestCase):
+    def setUp(self):
+        self.meter = LLMMeter(input_tpm=0, output_tpm=0, metrics_file="")
+        for latency_s in (0.1, 0.4, 3.0):
+            self.meter.record(MODEL, 100, 20, latency_s)
+        self.lines = self.meter.prometheus_text().splitlines()
+
+    def test_latency_is_one_histogram_family(self):
+        types = [line.split()[2:] for line in self.lines if line.startswith("# TYPE")]
+        self.assertIn(["llm_request_latency_seconds", "histogram"], types)
+        names = [name for name, _ in types]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertFalse([name for name in names if name.startswith("llm_request_latency_seconds_")])
+
+    def test_histogram_samples(self):
+        samples = dict(line.rsplit(" ", 1) for line in self.lines
+                       if line.startswith("llm_request_latency_seconds"))
+        buckets = [int(value) for name, value in samples.items() if name.startswith("llm_request_latency_seconds_bucket")]
+        self.assertEqual(len(buckets), len(LATENCY_BUCKETS))
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(samples[f'llm_request_latency_seconds_bucket{{model="{MODEL}",le="+Inf"}}'], "3")
+        self.assertEqual(samples[f'llm_request_latency_seconds_count{{model="{MODEL}"}}'], "3")
+        self.assertAlmostEqual(float(samples[f'llm_request_latency_seconds_sum{{model="{MODEL}"}}']), 3.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
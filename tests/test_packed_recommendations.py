@@ -0,0 +1,81 @@
+"""``parse_packed`` and ``PackSizer.feedback`` on hand-written replies and pack outcomes."""
+import unittest
+
+from packed_recommendations import PackSizer, parse_packed
+
+TICKERS = ["AAPL", "MSFT", "NVDA"]
+
+
+class ParsePackedTest(unittest.TestCase):
+    # (name, reply, expected verdicts, expected malformed)
+    CASES = [
+        ("clean",
+         "AAPL|BUY|cheap\nMSFT|HOLD|fair\nNVDA|SELL|rich",
+         {"AAPL": "BUY", "MSFT": "HOLD", "NVDA": "SELL"}, []),
+        ("spacing and case",
+         "  aapl | buy | cheap \nMSFT|Hold|fair\nNVDA |SELL|",
+         {"AAPL": "BUY", "MSFT": "HOLD", "NVDA": "SELL"}, []),
+        ("missing row",
+         "AAPL|BUY|cheap\nNVDA|SELL|rich",
+         {"AAPL": "BUY", "NVDA": "SELL"}, ["MSFT"]),
+        ("conflicting rows",
+         "AAPL|BUY|cheap\nMSFT|HOLD|fair\nAAPL|SELL|changed my mind\nNVDA|SELL|rich",
+         {"MSFT": "HOLD", "NVDA": "SELL"}, ["AAPL"]),
+        ("repeated agreeing row",
+         "AAPL|BUY|cheap\nAAPL|BUY|still cheap\nMSFT|HOLD|fair\nNVDA|SELL|rich",
+         {"AAPL": "BUY", "MSFT": "HOLD", "NVDA": "SELL"}, []),
+        ("bad verdict and prose",
+         "Here are the verdicts:\nAAPL|STRONG BUY|cheap\nMSFT|HOLD|fair\nNVDA: SELL",
+         {"MSFT": "HOLD"}, ["AAPL", "NVDA"]),
+        ("truncated reply",
+         "AAPL|BUY|cheap\nMSFT|HO",
+         {"AAPL": "BUY"}, ["MSFT", "NVDA"]),
+        ("ticker not asked",
+         "TSLA|BUY|not asked\nAAPL|BUY|cheap\nMSFT|HOLD|fair\nNVDA|SELL|rich",
+         {"AAPL": "BUY", "MSFT": "HOLD", "NVDA": "SELL"}, []),
+        ("empty reply", "", {}, TICKERS),
+    ]
+
+    def test_cases(self):
+        for name, reply, verdicts, malformed in self.CASES:
+            with self.subTest(name):
+                parsed, bad = parse_packed(reply, TICKERS)
+                self.assertEqual({ticker: row["verdict"] for ticker, row in parsed.items()}, verdicts)
+                self.assertEqual(bad, malformed)
+
+    def test_reason_is_kept(self):
+        parsed, _ = parse_packed("AAPL|BUY| 20% below target |", ["AAPL"])
+        self.assertEqual(parsed["AAPL"]["reason"], "20% below target |")
+
+
+class PackSizerFeedbackTest(unittest.TestCase):
+    # (name, size before, [(rows, malformed, truncated), ...], size after); limit 8
+    CASES = [
+        ("truncation halves", 8, [(8, 0, True)], 4),
+        ("truncation never below one", 1, [(1, 0, True)], 1),
+        ("repeated truncation", 8, [(8, 0, True), (4, 0, True), (2, 0, True)], 1),
+        ("too many malformed halves", 8, [(8, 2, False)], 4),
+        ("malformed share at the threshold keeps size", 5, [(5, 1, False)], 6),
+        ("single malformed row does not shrink", 1, [(1, 1, False)], 2),
+        ("clean full pack grows by one", 4, [(4, 0, False)], 5),
+        ("growth stops at the limit", 7, [(7, 0, False), (8, 0, False), (8, 0, False)], 8),
+        ("short last pack does not grow", 4, [(2, 0, False)], 4),
+        ("shrink then grow back", 8, [(8, 0, True), (4, 0, False), (5, 0, False)], 6),
+    ]
+
+    def test_cases(self):
+        for name, size, outcomes, expected in self.CASES:
+            with self.subTest(name):
+                sizer = PackSizer(max_pack=8, max_output_tokens=4096)
+                sizer.size = size
+                for rows, malformed, truncated in outcomes:
+                    sizer.feedback(rows, malformed, truncated)
+                self.assertEqual(sizer.size, expected)
+
+    def test_limit_follows_output_cap(self):
+        self.assertEqual(PackSizer(max_pack=25, max_output_tokens=400, output_tokens_per_row=40).limit, 10)
+        self.assertEqual(PackSizer(max_pack=25, max_output_tokens=10, output_tokens_per_row=40).limit, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
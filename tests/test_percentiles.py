@@ -0,0 +1,30 @@
+import unittest
+
+from percentiles import percentile
+
+
+class PercentileTest(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 21))             # 1..20, shuffled below
+        cases = [(0, 1), (5, 1), (50, 10), (51, 11), (95, 19), (99, 20), (100, 20)]
+        for q, expected in cases:
+            with self.subTest(q=q):
+                self.assertEqual(percentile(values[::-1], q), expected)
+
+    def test_no_float_rounding_up_a_rank(self):
+        values = list(range(1, 101))
+        for q in range(1, 101):
+            with self.subTest(q=q):
+                self.assertEqual(percentile(values, q), q)
+
+    def test_single_sample_and_iterables(self):
+        self.assertEqual(percentile([3.5], 99), 3.5)
+        self.assertEqual(percentile(iter([3, 1, 2]), 50), 2)
+
+    def test_no_samples(self):
+        with self.assertRaises(ValueError):
+            percentile([], 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
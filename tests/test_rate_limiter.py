@@ -0,0 +1,222 @@
+"""Circuit breaker state machine, AIMD rate adaptation and retries of ``rate_limiter``.
+
+The clock is faked (``time.monotonic``, which also freezes asyncio's timers)
+and backoff sleeps are zero, so every test is deterministic and instant.
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+import rate_limiter
+from rate_limiter import CircuitBreaker, CircuitOpenError, RateLimiter
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class ClockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(rate_limiter.time, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class CircuitBreakerTest(ClockTestCase):
+    def open_breaker(self) -> CircuitBreaker:
+        breaker = CircuitBreaker(threshold=3, reset_timeout=60)
+        for _ in range(3):
+            breaker.record_failure()
+        return breaker
+
+    def test_opens_after_threshold_consecutive_failures(self):
+        breaker = CircuitBreaker(threshold=3, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_success()            # resets the streak
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertIsNone(breaker.admit())
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = self.open_breaker()
+        self.clock.advance(59.9)
+        self.assertIsNone(breaker.admit())
+        self.clock.advance(0.1)
+        self.assertEqual(breaker.state, "half-open")
+        self.assertEqual(breaker.admit(), "probe")
+        self.assertIsNone(breaker.admit())  # a second caller while the probe is out
+
+    def test_probe_success_closes(self):
+        breaker = self.open_breaker()
+        self.clock.advance(60)
+        breaker.admit()
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(breaker.admit(), "call")
+
+    def test_probe_failure_reopens_for_a_full_timeout(self):
+        breaker = self.open_breaker()
+        self.clock.advance(60)
+        breaker.admit()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.clock.advance(59)
+        self.assertIsNone(breaker.admit())
+        self.clock.advance(1)
+        self.assertEqual(breaker.admit(), "probe")
+
+    def test_released_probe_frees_the_slot(self):
+        breaker = self.open_breaker()
+        self.clock.advance(60)
+        breaker.admit()
+        breaker.release_probe()
+        self.assertEqual(breaker.state, "half-open")
+        self.assertEqual(breaker.admit(), "probe")
+
+
+class ProbeCancellationTest(ClockTestCase):
+    def half_open_limiter(self) -> RateLimiter:
+        limiter = RateLimiter(burst=100, max_attempts=1, retry_base=0,
+                              breaker=CircuitBreaker(threshold=1, reset_timeout=60))
+        limiter.breaker.record_failure()
+        self.clock.advance(60)
+        return limiter
+
+    def test_interrupted_probe_in_call(self):
+        limiter = self.half_open_limiter()
+
+        def interrupted():
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            limiter.call(interrupted)
+        self.assertEqual(limiter.call(lambda: "ok"), "ok")
+        self.assertEqual(limiter.breaker.state, "closed")
+
+    def test_cancelled_probe_in_acall(self):
+        limiter = self.half_open_limiter()
+
+        async def hang():
+            await asyncio.Event().wait()
+
+        async def scenario():
+            # What wait_for does on timeout (the faked clock also stops the loop's timers)
+            task = asyncio.create_task(limiter.acall(hang))
+            for _ in range(3):
+                await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            async def ok():
+                return "ok"
+            return await limiter.acall(ok)
+
+        self.assertEqual(asyncio.run(scenario()), "ok")
+        self.assertEqual(limiter.breaker.state, "closed")
+
+    def test_cancelled_ordinary_call_keeps_a_probe_in_flight(self):
+        limiter = RateLimiter(burst=100, max_attempts=1, breaker=CircuitBreaker(threshold=1, reset_timeout=60))
+
+        def interrupted():
+            # Meanwhile the circuit opened and another caller took the probe
+            limiter.breaker.record_failure()
+            self.clock.advance(60)
+            self.assertEqual(limiter.breaker.admit(), "probe")
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            limiter.call(interrupted)
+        self.assertIsNone(limiter.breaker.admit())
+
+
+class AdaptiveRateTest(ClockTestCase):
+    def limiter(self, **kwargs) -> RateLimiter:
+        options = dict(rate=5.0, burst=100, min_rate=0.5, max_rate=8.0, increase=1.0, decrease=0.5,
+                       decrease_cooldown=1.0, max_attempts=3, retry_base=0,
+                       breaker=CircuitBreaker(threshold=100, reset_timeout=60))
+        options.update(kwargs)
+        return RateLimiter(**options)
+
+    def test_additive_increase_up_to_max_rate(self):
+        limiter = self.limiter()
+        limiter.call(lambda: None)
+        self.assertAlmostEqual(limiter.rate, 5.2)
+        for _ in range(100):
+            self.clock.advance(1.0)         # keeps the bucket full: no real sleeps
+            limiter.call(lambda: None)
+        self.assertEqual(limiter.rate, 8.0)
+
+    def test_multiplicative_decrease_once_per_cooldown(self):
+        limiter = self.limiter()
+        limiter._on_rate_limit()
+        self.assertAlmostEqual(limiter.rate, 2.5)
+        limiter._on_rate_limit()            # same burst: no second decrease
+        self.assertAlmostEqual(limiter.rate, 2.5)
+        self.clock.advance(1.0)
+        limiter._on_rate_limit()
+        self.assertAlmostEqual(limiter.rate, 1.25)
+        for _ in range(5):
+            self.clock.advance(1.0)
+            limiter._on_rate_limit()
+        self.assertEqual(limiter.rate, 0.5)
+
+    def test_retries_rate_limits_then_succeeds(self):
+        limiter = self.limiter()
+        outcomes = [RateLimited("Too Many Requests"), RateLimited("Too Many Requests"), "ok"]
+
+        def flaky():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        self.assertEqual(limiter.call(flaky), "ok")
+        self.assertEqual(limiter.stats["retries"], 2)
+        self.assertEqual(limiter.stats["rate_limited"], 2)
+
+    def test_other_errors_propagate_without_retry(self):
+        limiter = self.limiter()
+        calls = []
+
+        def invalid():
+            calls.append(1)
+            raise ValueError("Invalid ticker")
+
+        with self.assertRaises(ValueError):
+            limiter.call(invalid)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(limiter.stats["retries"], 0)
+
+    def test_open_circuit_fails_fast(self):
+        limiter = self.limiter(breaker=CircuitBreaker(threshold=2, reset_timeout=60), max_attempts=2)
+
+        def limited():
+            raise RateLimited("Too Many Requests")
+
+        with self.assertRaises(RateLimited):
+            limiter.call(limited)
+        with self.assertRaises(CircuitOpenError):
+            limiter.call(lambda: "never")
+        self.assertEqual(limiter.stats["rejected"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Routing log of ``RecommendationRouter.record``: one open file, size-bounded by rotation."""
+import builtins
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from recommendation_router import RecommendationRouter, summarize_log
+
+DECISION = {"ticker": "PFE", "upside_pct": 14.53, "rule_verdict": "HOLD", "template_id": 1, "confidence": 0.047,
+            "band": "borderline", "route": "llm"}
+
+
+class RoutingLogTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "logs", "routing.jsonl")
+
+    def router(self, **kwargs) -> RecommendationRouter:
+        router = RecommendationRouter(pipeline=None, log_file=self.path, **kwargs)
+        self.addCleanup(router.close)
+        return router
+
+    def test_opens_the_log_once(self):
+        router = self.router()
+        with mock.patch.object(builtins, "open", wraps=builtins.open) as opened:
+            for _ in range(20):
+                router.record(DECISION, 0.2, "HOLD", "llm")
+        self.assertEqual(opened.call_count, 1)
+        summary = summarize_log(self.path)
+        self.assertEqual((summary["decisions"], summary["escalated"], summary["agreement"]), (20, 20, 1.0))
+
+    def test_rotates_at_max_bytes(self):
+        router = self.router(log_max_bytes=1000)
+        for _ in range(40):
+            router.record(DECISION, 0.2, "HOLD", "llm")
+        router.close()
+        sizes = [os.path.getsize(self.path), os.path.getsize(self.path + ".1")]
+        self.assertTrue(all(0 < size <= 1000 for size in sizes), sizes)
+        self.assertFalse(os.path.exists(self.path + ".2"))
+        kept = summarize_log(self.path)["decisions"] + summarize_log(self.path + ".1")["decisions"]
+        self.assertLess(kept, 40)
+
+    def test_appends_to_an_existing_log(self):
+        self.router().record(DECISION, 0.2, "HOLD", "llm")
+        self.router().record(DECISION, 0.2, "HOLD", "llm")
+        self.assertEqual(summarize_log(self.path)["decisions"], 2)
+
+    def test_empty_log_file_disables_logging(self):
+        router = RecommendationRouter(pipeline=None, log_file="")
+        router.record(DECISION, 0.2, "HOLD", "llm")
+        self.assertEqual(router.summary()["decisions"], 1)
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""Coalescing of ``RecommendationService.stream`` around a leader that streams the answer."""
+import threading
+import unittest
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from recommendation_service import RecommendationService
+
+
+class Rerun(BaseException):
+    """Stands in for Streamlit's RerunException raised from a session's ``on_text``."""
+
+
+class GatedClient:
+    """``stream_message`` client: yields ``first``, then waits for ``release`` before the rest."""
+
+    def __init__(self, first="BUY", rest=" - well below target.", error=None):
+        self.first, self.rest, self.error = first, rest, error
+        self.release = threading.Event()
+        self.calls = 0
+
+    @contextmanager
+    def stream_message(self, **kwargs):
+        self.calls += 1
+        client = self
+
+        def text_stream():
+            yield client.first
+            client.release.wait(5)
+            if client.error is not None:
+                raise client.error
+            yield client.rest
+
+        text = self.first + self.rest
+        final = SimpleNamespace(content=[SimpleNamespace(text=text)],
+                                usage=SimpleNamespace(input_tokens=40, output_tokens=8))
+        yield SimpleNamespace(text_stream=text_stream(), get_final_message=lambda: final)
+
+
+class StreamCoalescingTest(unittest.TestCase):
+    def setUp(self):
+        self.client = GatedClient()
+        self.service = RecommendationService(self.client)
+        self.args = ("NVDA", 131.4, 168.3)
+
+    def start(self, target) -> tuple[threading.Thread, dict]:
+        outcome = {}
+
+        def run():
+            try:
+                outcome["result"] = target()
+            except BaseException as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread, outcome
+
+    def wait_coalesced(self, count: int = 1):
+        for _ in range(500):
+            if self.service.stats["coalesced"] >= count:
+                return
+            threading.Event().wait(0.01)
+        self.fail("waiter never coalesced")
+
+    def test_callbacks_run_in_the_callers_thread(self):
+        self.client.release.set()
+        threads, verdicts = set(), []
+        response, source, timings = self.service.stream(
+            *self.args, on_text=lambda text: threads.add(threading.current_thread()), on_verdict=verdicts.append)
+        self.assertEqual((source, verdicts), ("llm", ["BUY"]))
+        self.assertEqual(threads, {threading.current_thread()})
+        self.assertEqual(timings["response"], response)
+
+    def test_aborted_leader_still_answers_its_waiters(self):
+        def abort(text):
+            raise Rerun
+
+        leader, led = self.start(lambda: self.service.stream(*self.args, on_text=abort))
+        leader.join(5)
+        self.assertIsInstance(led["error"], Rerun)
+
+        waiter, waited = self.start(lambda: self.service.stream(*self.args))
+        self.wait_coalesced()
+        self.client.release.set()
+        waiter.join(5)
+        response, source, timings = waited["result"]
+        self.assertEqual((source, timings), ("coalesced", None))
+        self.assertEqual(response.content[0].text, "BUY - well below target.")
+        self.assertEqual(self.client.calls, 1)
+        # ... and the finished answer is served from the short-TTL cache afterwards
+        self.assertEqual(self.service.stream(*self.args)[1], "cache")
+
+    def test_llm_errors_reach_leader_and_waiters(self):
+        self.client.error = ConnectionError("overloaded")
+        leader, led = self.start(lambda: self.service.stream(*self.args))
+        waiter, waited = self.start(lambda: self.service.stream(*self.args))
+        self.wait_coalesced()
+        self.client.release.set()
+        leader.join(5)
+        waiter.join(5)
+        self.assertIsInstance(led["error"], ConnectionError)
+        self.assertIsInstance(waited["error"], ConnectionError)
+        self.assertNotIn(self.service.key(*self.args), self.service._results)
+
+
+if __name__ == "__main__":
+    unittest.main()